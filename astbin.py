@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+Formato binário do AST
+
+Uso: python astbin.py arquivo.txt [saida.ast]
+
+O arquivo guarda a árvore em vetores planos, em pré-ordem (a raiz é o nó 0
+e os filhos de um nó vêm depois dele):
+
+    cabeçalho   'LXAST', versão e a quantidade de itens de cada seção
+    strings     deslocamentos (uint32) e os textos em UTF-8, sem repetições:
+                tipos de nó, folhas, identificadores e textos
+    nós         tipo (índice de string), linha (int32, -1 para None), primeiro
+                filho (uint32), tipo e valor da folha
+    filhos      tipo (uint8) e valor (int32) de cada filho
+    reais       valores float64 referenciados pelos filhos e folhas
+
+Cada valor (folha ou filho) é um par (tipo, valor): um nó é o índice dele,
+uma string é o índice na tabela, um inteiro de 32 bits é o próprio número
+(os maiores vão como texto) e um real é o índice na seção de reais. Os filhos
+de um nó ocupam posições seguidas, e as do nó seguinte começam logo depois,
+então o vetor de primeiros filhos tem um item a mais, com o total de filhos.
+Os números ficam em little-endian e cada seção começa alinhada em 8 bytes.
+
+load() não cria os nós: devolve um Tree com memoryviews sobre o buffer (bytes,
+bytearray ou mmap), e os nós (NodeView) são lidos conforme são acessados.
+Tree.materialize() converte tudo para parser.Node.
+"""
+
+from array import array
+import mmap
+import struct
+import sys
+
+from parser import Node
+
+MAGIC = b'LXAST'
+VERSION = 1
+
+# Cabeçalho: magic, versão, e o tamanho de cada seção (strings, bytes dos
+# textos, nós, filhos, reais)
+header = struct.Struct('<5sH5I')
+
+# Tipos de valor
+NONE, NODE, STR, INT, FLOAT, TRUE, FALSE, BIGINT = range(8)
+
+INT32 = 1 << 31
+
+
+class Writer:
+    def __init__(self):
+        self.strings = {}
+        self.floats = array('d')
+        self.node_type = array('I')
+        self.node_line = array('i')
+        self.node_first = array('I')
+        self.leaf_kind = array('B')
+        self.leaf_value = array('i')
+        self.child_kind = array('B')
+        self.child_value = array('i')
+
+    def string(self, text):
+        # Índice da string na tabela, incluindo na primeira vez
+        index = self.strings.get(text)
+        if index is None:
+            index = self.strings[text] = len(self.strings)
+        return index
+
+    def value(self, value):
+        # Par (tipo, valor) de uma folha ou filho que não é nó
+        if value is None:
+            return NONE, 0
+        if value is True:
+            return TRUE, 0
+        if value is False:
+            return FALSE, 0
+        if type(value) is str:
+            return STR, self.string(value)
+        if type(value) is int:
+            if -INT32 <= value < INT32:
+                return INT, value
+            return BIGINT, self.string(str(value))
+        if type(value) is float:
+            self.floats.append(value)
+            return FLOAT, len(self.floats) - 1
+        raise TypeError('Valor sem representação no formato binário: {!r}'.format(value))
+
+    def add(self, root):
+        # Percorre a árvore em pré-ordem sem recursão. Os filhos de cada nó
+        # ocupam posições consecutivas no vetor de filhos; a posição de um
+        # filho que é nó só é conhecida quando ele é visitado.
+        pending = [(root, -1)]
+        while pending:
+            node, slot = pending.pop()
+            index = len(self.node_type)
+            if slot >= 0:
+                self.child_value[slot] = index
+            self.node_type.append(self.string(node.type))
+            self.node_line.append(-1 if node.line is None else node.line)
+            kind, value = self.value(node.leaf)
+            self.leaf_kind.append(kind)
+            self.leaf_value.append(value)
+            self.node_first.append(len(self.child_kind))
+            nodes = []
+            for child in node.children:
+                if isinstance(child, Node):
+                    nodes.append((child, len(self.child_kind)))
+                    self.child_kind.append(NODE)
+                    self.child_value.append(0)
+                else:
+                    kind, value = self.value(child)
+                    self.child_kind.append(kind)
+                    self.child_value.append(value)
+            # Pilha: o primeiro filho sai primeiro e mantém a pré-ordem
+            pending.extend(reversed(nodes))
+
+    def tobytes(self):
+        texts = [text.encode() for text in self.strings]
+        offsets = array('I', [0])
+        for text in texts:
+            offsets.append(offsets[-1] + len(text))
+        blob = b''.join(texts)
+        node_first = array('I', self.node_first)
+        node_first.append(len(self.child_kind))
+        sections = [offsets, blob, self.node_type, self.node_line, node_first,
+                    self.leaf_kind, self.leaf_value, self.child_kind,
+                    self.child_value, self.floats]
+        parts = [header.pack(MAGIC, VERSION, len(texts), len(blob), len(self.node_type),
+                             len(self.child_kind), len(self.floats))]
+        size = header.size
+        for section in sections:
+            if isinstance(section, array) and sys.byteorder != 'little':
+                section = array(section.typecode, section)
+                section.byteswap()
+            data = section if isinstance(section, bytes) else section.tobytes()
+            padding = -size % 8
+            parts.append(b'\0' * padding)
+            parts.append(data)
+            size += padding + len(data)
+        return b''.join(parts)
+
+
+def dumps(root):
+    writer = Writer()
+    writer.add(root)
+    return writer.tobytes()
+
+
+def dump(root, file):
+    file.write(dumps(root))
+
+
+class Tree:
+    # Árvore lida de um buffer, sem copiar os dados
+    def __init__(self, buffer):
+        view = memoryview(buffer)
+        if view.nbytes < header.size:
+            raise ValueError('Arquivo de AST truncado')
+        magic, version, n_strings, n_bytes, n_nodes, n_children, n_floats = header.unpack_from(view)
+        if magic != MAGIC:
+            raise ValueError('Não é um arquivo de AST')
+        if version != VERSION:
+            raise ValueError('Versão {} do formato de AST não suportada'.format(version))
+        self.buffer = buffer
+        self.view = view
+        self.position = header.size
+        self.offsets = self.section('I', n_strings + 1)
+        self.blob = self.section('B', n_bytes)
+        self.node_type = self.section('I', n_nodes)
+        self.node_line = self.section('i', n_nodes)
+        self.node_first = self.section('I', n_nodes + 1)
+        self.leaf_kind = self.section('B', n_nodes)
+        self.leaf_value = self.section('i', n_nodes)
+        self.child_kind = self.section('B', n_children)
+        self.child_value = self.section('i', n_children)
+        self.floats = self.section('d', n_floats)
+        # Strings já decodificadas, por índice
+        self.strings = {}
+        # Tipos das expressões (NodeView.inferred), por índice do nó. O
+        # arquivo não os guarda; a lista só é criada quando a verificação
+        # semântica anota a árvore.
+        self.inferred = None
+
+    def section(self, typecode, count):
+        start = self.position + (-self.position % 8)
+        size = array(typecode).itemsize * count
+        if start + size > self.view.nbytes:
+            raise ValueError('Arquivo de AST truncado')
+        self.position = start + size
+        data = self.view[start:start + size]
+        if sys.byteorder != 'little' and typecode != 'B':
+            # Sem leitura direta em máquinas big-endian: copia e inverte
+            data = array(typecode, data.tobytes())
+            data.byteswap()
+            return data
+        return data.cast(typecode)
+
+    def __len__(self):
+        return len(self.node_type)
+
+    def span(self, index):
+        # Posições dos filhos do nó no vetor de filhos
+        return range(self.node_first[index], self.node_first[index + 1])
+
+    def string(self, index):
+        text = self.strings.get(index)
+        if text is None:
+            text = self.strings[index] = sys.intern(str(self.blob[self.offsets[index]:self.offsets[index + 1]], 'utf-8'))
+        return text
+
+    def value(self, kind, value):
+        if kind == STR:
+            return self.string(value)
+        if kind == INT:
+            return value
+        if kind == NODE:
+            return NodeView(self, value)
+        if kind == FLOAT:
+            return self.floats[value]
+        if kind == NONE:
+            return None
+        if kind == TRUE:
+            return True
+        if kind == FALSE:
+            return False
+        if kind == BIGINT:
+            return int(self.string(value))
+        raise ValueError('Tipo de valor desconhecido: {}'.format(kind))
+
+    @property
+    def root(self):
+        return NodeView(self, 0)
+
+    def materialize(self):
+        # Converte a árvore inteira para parser.Node. Em pré-ordem os filhos
+        # vêm depois do pai, então percorrendo de trás para frente cada nó já
+        # encontra os filhos prontos.
+        count = len(self)
+        nodes = [None] * count
+        node_type, node_line = self.node_type, self.node_line
+        node_first = self.node_first
+        leaf_kind, leaf_value = self.leaf_kind, self.leaf_value
+        child_kind, child_value = self.child_kind, self.child_value
+        string, value = self.string, self.value
+        for index in range(count - 1, -1, -1):
+            children = []
+            for slot in range(node_first[index], node_first[index + 1]):
+                kind = child_kind[slot]
+                if kind == NODE:
+                    children.append(nodes[child_value[slot]])
+                elif kind == STR:
+                    children.append(string(child_value[slot]))
+                else:
+                    children.append(value(kind, child_value[slot]))
+            line = node_line[index]
+            nodes[index] = Node(string(node_type[index]), tuple(children),
+                                value(leaf_kind[index], leaf_value[index]),
+                                None if line < 0 else line)
+        if self.inferred is not None:
+            for node, inferred in zip(nodes, self.inferred):
+                node.inferred = inferred
+        return nodes[0] if nodes else None
+
+    def close(self):
+        # Libera as memoryviews e fecha o mmap aberto por load(). Os NodeView
+        # do Tree não podem mais ser usados.
+        for name in ('offsets', 'blob', 'node_type', 'node_line', 'node_first',
+                     'leaf_kind', 'leaf_value', 'child_kind', 'child_value', 'floats'):
+            section = getattr(self, name)
+            if isinstance(section, memoryview):
+                section.release()
+        self.view.release()
+        if isinstance(self.buffer, mmap.mmap):
+            self.buffer.close()
+
+
+class NodeView:
+    # Nó lido sob demanda de um Tree, com os mesmos atributos de parser.Node
+    __slots__ = ('tree', 'index')
+
+    def __init__(self, tree, index):
+        self.tree = tree
+        self.index = index
+
+    @property
+    def type(self):
+        return self.tree.string(self.tree.node_type[self.index])
+
+    @property
+    def line(self):
+        line = self.tree.node_line[self.index]
+        return None if line < 0 else line
+
+    @property
+    def leaf(self):
+        return self.tree.value(self.tree.leaf_kind[self.index], self.tree.leaf_value[self.index])
+
+    @property
+    def children(self):
+        tree = self.tree
+        return tuple(tree.value(tree.child_kind[slot], tree.child_value[slot]) for slot in tree.span(self.index))
+
+    @property
+    def inferred(self):
+        inferred = self.tree.inferred
+        return None if inferred is None else inferred[self.index]
+
+    @inferred.setter
+    def inferred(self, type):
+        tree = self.tree
+        if tree.inferred is None:
+            tree.inferred = [None] * len(tree)
+        tree.inferred[self.index] = type
+
+    def materialize(self):
+        # Subárvore como parser.Node
+        pending = [self]
+        built = {}
+        while pending:
+            view = pending[-1]
+            children = view.children
+            missing = [child for child in children if isinstance(child, NodeView) and child.index not in built]
+            if missing:
+                pending.extend(missing)
+                continue
+            pending.pop()
+            built[view.index] = node = Node(view.type, tuple(built[child.index] if isinstance(child, NodeView)
+                                                             else child for child in children), view.leaf, view.line)
+            node.inferred = view.inferred
+        return built[self.index]
+
+    def __repr__(self):
+        return 'NodeView({!r}, {})'.format(self.type, self.index)
+
+
+def loads(data):
+    return Tree(data)
+
+
+def load(path):
+    # Mapeia o arquivo na memória; os nós são lidos direto do mmap
+    with open(path, 'rb') as file:
+        return Tree(mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ))
+
+
+if __name__ == '__main__':
+    from parser import parse_file, syntax_errors
+
+    ast = parse_file(sys.argv[1])
+    if ast is None or syntax_errors():
+        # Arquivo vazio ou com erros de sintaxe, já mostrados pelo parser
+        raise SystemExit(1)
+    data = dumps(ast)
+    if len(sys.argv) > 2:
+        with open(sys.argv[2], 'wb') as file:
+            file.write(data)
+    tree = loads(data)
+    print('{} nós, {} strings, {} bytes'.format(len(tree), len(tree.offsets) - 1, len(data)))
+    print(tree.materialize().pretty() == ast.pretty())
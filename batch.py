@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+Verificação de vários arquivos em paralelo
+
+Uso: python batch.py [--json] [--workers N] [--no-cache] arquivo_ou_glob ...
+
+Cada processo do pool carrega o lexer e o parser uma única vez e verifica
+(análise léxica, sintática e semântica) os arquivos que receber. O relatório
+sai na ordem dos argumentos, com os globs expandidos em ordem alfabética,
+independente da ordem em que os processos terminam.
+
+Os erros de sintaxe e semânticos de cada arquivo são todos listados, até 100
+de cada tipo; avisos semânticos (não fatais) aparecem no relatório sem marcar
+o arquivo com erro. O AST de arquivos sem erros vem do cache em disco
+(parser.parse_file_cached), a não ser com --no-cache.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+import contextlib
+import glob
+import io
+import json
+import os
+import sys
+
+from parser import get_parser, parse_file, parse_file_cached
+import semantic
+
+
+def expand(patterns):
+    # Arquivos dos argumentos, sem repetições
+    paths = []
+    seen = set()
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern, recursive=True)) or [pattern]
+        for path in matches:
+            if path not in seen and not os.path.isdir(path):
+                seen.add(path)
+                paths.append(path)
+    return paths
+
+
+def init_worker(use_cache=True):
+    # Carrega as tabelas do parser antes do primeiro arquivo
+    global parse_path
+    get_parser()
+    parse_path = parse_file_cached if use_cache else parse_file
+
+parse_path = parse_file_cached
+
+
+def check_file(path):
+    # Verifica um arquivo e devolve o resultado como dicionário. As mensagens
+    # são as que a linha de comando imprimiria.
+    output = io.StringIO()
+    status = 'ok'
+    ast = None
+    parse_messages = []
+    diagnostics = []
+    try:
+        # Erros léxicos e de sintaxe ainda são impressos pelo parser
+        with contextlib.redirect_stdout(output):
+            ast = parse_path(path)
+        parse_messages = output.getvalue().splitlines()
+        if ast is not None:
+            diagnostics = semantic.check(ast, collect=True)
+        messages = parse_messages + [str(diagnostic) for diagnostic in diagnostics]
+    except Exception as error:
+        messages = output.getvalue().splitlines()
+        messages.append('{}: {}'.format(type(error).__name__, error))
+        status = 'falha'
+    # Como em semantic.py, os avisos não fatais não contam como erro.
+    # syntax_errors() não serve aqui: não é limpo quando o AST vem do cache.
+    if status == 'ok' and (ast is None or parse_messages or any(d.fatal for d in diagnostics)):
+        status = 'erro'
+    return {'arquivo': path, 'status': status, 'mensagens': messages}
+
+
+def run(paths, workers=None, use_cache=True):
+    # Resultados na mesma ordem de paths
+    workers = workers or os.cpu_count() or 1
+    chunksize = max(1, len(paths) // (workers * 4))
+    with ProcessPoolExecutor(workers, initializer=init_worker, initargs=(use_cache,)) as pool:
+        return list(pool.map(check_file, paths, chunksize=chunksize))
+
+
+def summary(results):
+    total = {'arquivos': len(results), 'ok': 0, 'erro': 0, 'falha': 0}
+    for result in results:
+        total[result['status']] += 1
+    return total
+
+
+def report_text(results, file=sys.stdout):
+    for result in results:
+        print('{:<5} {}'.format(result['status'], result['arquivo']), file=file)
+        for message in result['mensagens']:
+            print('      {}'.format(message), file=file)
+    total = summary(results)
+    print('{arquivos} arquivo(s): {ok} ok, {erro} com erros, {falha} com falha interna'.format(**total),
+          file=file)
+
+
+def report_json(results, file=sys.stdout):
+    json.dump({'resumo': summary(results), 'arquivos': results}, file, ensure_ascii=False, indent=2)
+    print(file=file)
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    as_json = '--json' in args
+    if as_json:
+        args.remove('--json')
+    use_cache = '--no-cache' not in args
+    if not use_cache:
+        args.remove('--no-cache')
+    workers = None
+    if '--workers' in args:
+        index = args.index('--workers')
+        workers = int(args[index + 1])
+        del args[index:index + 2]
+    paths = expand(args)
+    if not paths:
+        print(__doc__.strip().splitlines()[2])
+        raise SystemExit(2)
+    results = run(paths, workers, use_cache)
+    if as_json:
+        report_json(results)
+    else:
+        report_text(results)
+    raise SystemExit(0 if all(result['status'] == 'ok' for result in results) else 1)
@@ -0,0 +1,724 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+Benchmarks do analisador
+
+Uso: python benchmark.py check [n_variaveis ...]
+     python benchmark.py visit [n_blocos] [profundidade]
+     python benchmark.py memory [n_blocos]
+     python benchmark.py stress [n_statements]
+     python benchmark.py startup [repeticoes]
+     python benchmark.py lex [megabytes]
+     python benchmark.py stream [megabytes]
+     python benchmark.py batch [n_arquivos]
+     python benchmark.py incremental [n_blocos] [edicoes]
+     python benchmark.py cache [n_arquivos]
+     python benchmark.py astbin [n_blocos]
+     python benchmark.py vm [n_voltas] [n_fib]
+     python benchmark.py optimize [n_blocos]
+     python benchmark.py transpile [n_voltas] [n_fib]
+     python benchmark.py tokens [megabytes]
+     python benchmark.py dump [profundidade]
+     python benchmark.py server [n_pedidos]
+     python benchmark.py parallel [megabytes] [processos ...]
+     python benchmark.py suite [escala] [--baseline base.json] [--save base.json] [--limite 0.25]
+"""
+
+import gc
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+from programas import (conta_nos, formas, interpreta, programa_aninhado, programa_blocos, programa_constantes,
+                       programa_fib, programa_laco, programa_sequencia, programa_sintetico, programa_variaveis)
+
+
+def cronometra(func, *args, repeticoes=5):
+    # Melhor tempo entre as repetições, sem o coletor de lixo interferindo
+    melhor = float('inf')
+    gc.disable()
+    try:
+        for _ in range(repeticoes):
+            inicio = time.perf_counter()
+            func(*args)
+            melhor = min(melhor, time.perf_counter() - inicio)
+    finally:
+        gc.enable()
+    return melhor
+
+
+def em_pilha_grande(func, *args):
+    # As passagens recursivas sobre o AST precisam de mais pilha que o padrão
+    resultado = []
+    limite = sys.getrecursionlimit()
+    tamanho = threading.stack_size(512 * 1024 * 1024)
+    sys.setrecursionlimit(10 ** 6)
+    try:
+        thread = threading.Thread(target=lambda: resultado.append(func(*args)))
+        thread.start()
+        thread.join()
+    finally:
+        threading.stack_size(tamanho)
+        sys.setrecursionlimit(limite)
+    return resultado[0]
+
+
+def bench_check(n):
+    from parser import parse
+    from semantic import check
+
+    ast = em_pilha_grande(parse, programa_variaveis(n))
+    inicio = time.perf_counter()
+    em_pilha_grande(check, ast)
+    return time.perf_counter() - inicio
+
+
+def bench_visit(n, profundidade):
+    from parser import parse
+    from semantic import check
+
+    ast = em_pilha_grande(parse, programa_blocos(n))
+    tempo = cronometra(check, ast)
+    # O verificador não usa a pilha do Python, então roda no limite padrão
+    aninhado = parse(programa_aninhado(profundidade))
+    return conta_nos(ast), tempo, cronometra(check, aninhado)
+
+
+def bench_memory(n):
+    from parser import parse, get_parser
+    from lexer import get_lexer
+
+    fonte = programa_blocos(n)
+    # As tabelas não entram na conta
+    get_parser()
+    get_lexer()
+    tracemalloc.start()
+    try:
+        antes = tracemalloc.get_traced_memory()[0]
+        ast = em_pilha_grande(parse, fonte)
+        # Só o que continua vivo depois do parse: os nós e seus valores
+        memoria = tracemalloc.get_traced_memory()[0] - antes
+    finally:
+        tracemalloc.stop()
+    return conta_nos(ast), memoria, len(fonte.encode())
+
+
+def bench_stress(n):
+    # Roda na thread principal, com o limite de recursão padrão: a lista de
+    # statements é plana, então a profundidade não depende de n
+    from parser import parse
+    from semantic import check
+
+    fonte = programa_sequencia(n)
+    inicio = time.perf_counter()
+    ast = parse(fonte)
+    meio = time.perf_counter()
+    check(ast)
+    return len(ast.children), meio - inicio, time.perf_counter() - meio
+
+
+def bench_startup(repeticoes):
+    # Tempo de um processo novo: só o import, e o import seguido do primeiro
+    # parse com o cache de tabelas vazio e já preenchido
+    diretorio = os.path.dirname(os.path.abspath(__file__))
+    comandos = [
+        ('import parser', 'import parser', False),
+        ('primeiro parse, cache frio', 'import parser; parser.parse("int x é 1.")', True),
+        ('primeiro parse, cache quente', 'import parser; parser.parse("int x é 1.")', False),
+    ]
+    resultados = []
+    with tempfile.TemporaryDirectory() as cache:
+        ambiente = dict(os.environ, LEXICO_CACHE_DIR=cache)
+        for nome, codigo, frio in comandos:
+            tempos = []
+            for _ in range(repeticoes):
+                if frio:
+                    for arquivo in os.listdir(cache):
+                        os.remove(os.path.join(cache, arquivo))
+                inicio = time.perf_counter()
+                subprocess.run([sys.executable, '-c', codigo], cwd=diretorio, env=ambiente,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+                tempos.append(time.perf_counter() - inicio)
+            resultados.append((nome, sorted(tempos)[len(tempos) // 2]))
+    return resultados
+
+
+def bench_lex(megabytes):
+    from lexer import build_lexer
+    from scanner import scan
+
+    bloco = programa_blocos(100)
+    fonte = bloco * max(1, int(megabytes * 1024 * 1024 / len(bloco.encode())))
+
+    def conta(lexer):
+        lexer.input(fonte)
+        total = 0
+        token = lexer.token()
+        while token:
+            total += 1
+            token = lexer.token()
+        return total
+
+    resultados = []
+    for nome, func in [
+        ('ply', lambda: conta(build_lexer('ply'))),
+        ('fast', lambda: conta(build_lexer('fast'))),
+        ('fast, tuplas', lambda: sum(1 for _ in scan(fonte))),
+    ]:
+        inicio = time.perf_counter()
+        total = func()
+        resultados.append((nome, total, time.perf_counter() - inicio))
+    return len(fonte.encode()), resultados
+
+
+def bench_tokens(megabytes):
+    # Memória por token e velocidade de uma lista de tokens (FastLexer, um
+    # objeto por token) e de um TokenArray, para montar e para o parser. Os
+    # tempos incluem o coletor de lixo, que é parte do custo dos objetos.
+    import parser
+    from scanner import FastLexer, TokenArray
+
+    bloco = programa_blocos(100)
+    fonte = bloco * max(1, int(megabytes * 1024 * 1024 / len(bloco.encode())))
+
+    def lista():
+        lexer = FastLexer()
+        lexer.input(fonte)
+        return list(lexer)
+
+    def memoria(func):
+        gc.collect()
+        tracemalloc.start()
+        try:
+            resultado = func()
+            return resultado, tracemalloc.get_traced_memory()[0]
+        finally:
+            tracemalloc.stop()
+
+    def tempo(func):
+        inicio = time.perf_counter()
+        func()
+        return time.perf_counter() - inicio
+
+    tokens, memoria_lista = memoria(lista)
+    total = len(tokens)
+    del tokens
+    vetores, memoria_vetores = memoria(lambda: TokenArray.scan(fonte))
+    lexer = FastLexer()
+    resultados = [
+        ('objetos', memoria_lista, tempo(lista),
+         tempo(lambda: parser.parse(fonte, lexer=lexer))),
+        ('TokenArray', memoria_vetores, tempo(lambda: TokenArray.scan(fonte)),
+         tempo(lambda: parser.parse_tokens(vetores))),
+    ]
+    if parser.parse(fonte, lexer=FastLexer()).pretty() != parser.parse_tokens(vetores).pretty():
+        raise AssertionError('ASTs diferentes com TokenArray')
+    return total, resultados
+
+
+def bench_stream(megabytes):
+    # Pico de memória (RSS) de um processo novo que conta os tokens de um
+    # arquivo, lendo tudo de uma vez e lendo aos poucos com tokenize
+    diretorio = os.path.dirname(os.path.abspath(__file__))
+    bloco = programa_blocos(100)
+    comandos = [
+        ('arquivo inteiro', 'sum(1 for _ in scanner.scan(open(caminho).read()))'),
+        ('tokenize', 'sum(1 for _ in scanner.tokenize(caminho))'),
+    ]
+    resultados = []
+    with tempfile.NamedTemporaryFile('w', suffix='.txt') as arquivo:
+        for _ in range(max(1, int(megabytes * 1024 * 1024 / len(bloco.encode())))):
+            arquivo.write(bloco)
+        arquivo.flush()
+        tamanho = os.path.getsize(arquivo.name)
+        for nome, expressao in comandos:
+            codigo = ('import resource, sys, time, scanner; caminho = sys.argv[1]; '
+                      'inicio = time.perf_counter(); total = {}; '
+                      'print(total, time.perf_counter() - inicio, '
+                      'resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)').format(expressao)
+            saida = subprocess.run([sys.executable, '-c', codigo, arquivo.name], cwd=diretorio,
+                                   stdout=subprocess.PIPE, check=True, universal_newlines=True)
+            total, tempo, memoria = saida.stdout.split()
+            resultados.append((nome, int(total), float(tempo), int(memoria) * 1024))
+    return tamanho, resultados
+
+
+def bench_batch(n):
+    # Arquivos por segundo: um processo semantic.py por arquivo, como antes,
+    # e batch.py com um processo e com um por núcleo
+    diretorio = os.path.dirname(os.path.abspath(__file__))
+    resultados = []
+    with tempfile.TemporaryDirectory() as pasta:
+        arquivos = []
+        for i in range(n):
+            arquivos.append(os.path.join(pasta, 'programa{}.txt'.format(i)))
+            with open(arquivos[-1], 'w') as arquivo:
+                arquivo.write(programa_blocos(20 + i % 10))
+        # Um processo por arquivo é lento, então mede só uma amostra
+        amostra = arquivos[:20]
+        inicio = time.perf_counter()
+        for caminho in amostra:
+            subprocess.run([sys.executable, 'semantic.py', caminho], cwd=diretorio,
+                           stdout=subprocess.DEVNULL, check=True)
+        resultados.append(('um processo por arquivo', len(amostra) / (time.perf_counter() - inicio)))
+        for workers in sorted({1, os.cpu_count() or 1}):
+            inicio = time.perf_counter()
+            subprocess.run([sys.executable, 'batch.py', '--workers', str(workers), os.path.join(pasta, '*.txt')],
+                           cwd=diretorio, stdout=subprocess.DEVNULL, check=True)
+            resultados.append(('batch.py, {} processo(s)'.format(workers), n / (time.perf_counter() - inicio)))
+    return resultados
+
+
+def bench_incremental(n, edicoes):
+    # Tempo médio por edição: trocar um número do programa e analisar de
+    # novo, por partes e com o parse completo
+    import random
+    from incremental import Document
+    from parser import parse
+
+    documento = Document(programa_blocos(n))
+    rng = random.Random(0)
+    numeros = [i for i, char in enumerate(documento.text) if char.isdigit()]
+    edicoes = [(inicio, inicio + 1, str(rng.randrange(10))) for inicio in rng.sample(numeros, edicoes)]
+    inicio = time.perf_counter()
+    for edicao in edicoes:
+        documento.edit(*edicao)
+    incremental = (time.perf_counter() - inicio) / len(edicoes)
+    inicio = time.perf_counter()
+    for _ in range(3):
+        parse(documento.text)
+    completo = (time.perf_counter() - inicio) / 3
+    return len(documento.segments), documento.partial, incremental, completo
+
+
+def bench_cache(n):
+    # Parse de n arquivos com o cache de resultados vazio e cheio, comparado
+    # com só ler e calcular o hash dos arquivos
+    from cache import ParseCache
+    from parser import parse_file_cached
+
+    resultados = []
+    with tempfile.TemporaryDirectory() as pasta:
+        arquivos = []
+        for i in range(n):
+            arquivos.append(os.path.join(pasta, 'programa{}.txt'.format(i)))
+            with open(arquivos[-1], 'w') as arquivo:
+                arquivo.write('# arquivo {}\n'.format(i) + programa_blocos(20 + i % 10))
+        cache = ParseCache(os.path.join(pasta, 'cache'), version='benchmark')
+        for nome in ['cache frio', 'cache quente']:
+            inicio = time.perf_counter()
+            for caminho in arquivos:
+                parse_file_cached(caminho, cache)
+            resultados.append((nome, time.perf_counter() - inicio))
+        inicio = time.perf_counter()
+        for caminho in arquivos:
+            with open(caminho, 'rb') as arquivo:
+                cache.key(arquivo.read())
+        resultados.append(('só o hash', time.perf_counter() - inicio))
+    return resultados, cache.stats()
+
+
+def bench_suite(escala=1.0, repeticoes=3):
+    # Tempo (melhor de `repeticoes`) e pico de memória de lex, parse e check
+    # em cada forma. A memória é medida numa execução à parte, porque o
+    # tracemalloc deixa tudo mais lento.
+    from parser import parse_tokens, syntax_errors
+    from scanner import TokenArray
+    from semantic import check
+
+    resultados = {}
+    for forma, (gerador, tamanho) in formas.items():
+        n = max(1, int(tamanho * escala))
+        fonte = programa_sintetico(forma, n)
+        tokens = TokenArray.scan(fonte)
+        ast = parse_tokens(tokens)
+        if ast is None or syntax_errors():
+            raise AssertionError('Programa {} inválido: {}'.format(forma, syntax_errors()[:1]))
+        diagnosticos = check(ast)
+        if diagnosticos:
+            raise AssertionError('Programa {} inválido: {}'.format(forma, diagnosticos[0]))
+        fases = [('lex', TokenArray.scan, fonte), ('parse', parse_tokens, tokens), ('check', check, ast)]
+        for fase, func, entrada in fases:
+            tempo = cronometra(func, entrada, repeticoes=repeticoes)
+            gc.collect()
+            tracemalloc.start()
+            try:
+                func(entrada)
+                memoria = tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+            resultados['{}/{}'.format(forma, fase)] = {
+                'tempo': tempo, 'memoria': memoria, 'tokens': len(tokens),
+                # Identifica o programa: bases de outros programas não são comparadas
+                'fonte': hashlib.sha1(fonte.encode()).hexdigest()[:12],
+            }
+    return resultados
+
+
+def compara(resultados, base, limite):
+    # Regressões de tempo ou memória acima de `limite` (0,25 = 25%) em relação
+    # à base, e os resultados que não puderam ser comparados (ausentes da base
+    # ou com outro programa, quando o gerador mudou), como mensagens. Os
+    # tempos só são comparáveis na mesma máquina: a base é gerada com --save
+    # em cada ambiente.
+    regressoes = []
+    sem_base = []
+    for nome, atual in resultados.items():
+        anterior = base.get(nome)
+        if anterior is None:
+            sem_base.append('{}: ausente da base'.format(nome))
+            continue
+        if anterior.get('fonte') != atual['fonte']:
+            sem_base.append('{}: programa diferente do da base'.format(nome))
+            continue
+        for medida in ('tempo', 'memoria'):
+            if anterior[medida] and atual[medida] > anterior[medida] * (1 + limite):
+                regressoes.append('{} {}: {:.4g} -> {:.4g} (+{:.0%})'.format(
+                    nome, medida, anterior[medida], atual[medida], atual[medida] / anterior[medida] - 1))
+    return regressoes, sem_base
+
+
+def bench_astbin(n):
+    # Tamanho e tempos de gravar e ler o AST com pickle e com o formato
+    # binário. Para o formato binário, ler é só abrir as seções; criar os
+    # nós (materialize) e percorrer os NodeView sob demanda são medidos à parte.
+    import pickle
+
+    import astbin
+    from parser import parse
+
+    ast = parse(programa_blocos(n))
+    dados = pickle.dumps(ast, pickle.HIGHEST_PROTOCOL)
+    resultados = [('pickle', len(dados), cronometra(pickle.dumps, ast, pickle.HIGHEST_PROTOCOL),
+                   cronometra(pickle.loads, dados))]
+    dados = astbin.dumps(ast)
+    resultados.append(('astbin', len(dados), cronometra(astbin.dumps, ast), cronometra(astbin.loads, dados)))
+
+    def percorre(tree):
+        total = 0
+        pendentes = [tree.root]
+        while pendentes:
+            node = pendentes.pop()
+            total += 1
+            pendentes.extend(child for child in node.children if isinstance(child, astbin.NodeView))
+        return total
+
+    resultados.append(('astbin materialize', len(dados), None,
+                       cronometra(lambda: astbin.loads(dados).materialize())))
+    resultados.append(('astbin percorrendo', len(dados), None, cronometra(lambda: percorre(astbin.loads(dados)))))
+    return conta_nos(ast), resultados
+
+
+def bench_vm(voltas, n_fib):
+    # Execução pela máquina virtual comparada com o interpretador ingênuo,
+    # num laço numérico e em chamadas recursivas. A compilação é medida à parte.
+    import io
+
+    import vm
+    from parser import parse
+
+    resultados = []
+    for nome, fonte in [('laço de {} voltas'.format(voltas), programa_laco(voltas)),
+                        ('fib {}'.format(n_fib), programa_fib(n_fib))]:
+        ast = parse(fonte)
+        compilacao = cronometra(vm.compile, ast, repeticoes=3)
+        program = vm.compile(ast)
+        saidas = [io.StringIO(), io.StringIO()]
+        tempo_vm = cronometra(lambda: vm.run(program, saidas[0]), repeticoes=3)
+        tempo_ast = cronometra(lambda: em_pilha_grande(interpreta, ast, saidas[1]), repeticoes=3)
+        if saidas[0].getvalue() != saidas[1].getvalue():
+            raise AssertionError('Saídas diferentes em {}'.format(nome))
+        resultados.append((nome, compilacao, tempo_vm, tempo_ast))
+    return resultados
+
+
+def bench_optimize(n):
+    # Tempo da otimização e quantidade de nós, verificação e execução com e
+    # sem a otimização
+    import io
+
+    import optimizer
+    import vm
+    from parser import parse
+    from semantic import check
+
+    ast = parse(programa_constantes(n))
+    otimizado, _ = optimizer.optimize(ast)
+    saidas = [io.StringIO(), io.StringIO()]
+    resultados = []
+    for nome, arvore, saida in [('sem otimização', ast, saidas[0]), ('otimizado', otimizado, saidas[1])]:
+        program = vm.compile(arvore)
+        resultados.append((nome, conta_nos(arvore), cronometra(check, arvore),
+                           cronometra(lambda: vm.run(program, saida), repeticoes=1)))
+    if saidas[0].getvalue() != saidas[1].getvalue():
+        raise AssertionError('Saídas diferentes com a otimização')
+    return cronometra(optimizer.optimize, ast), resultados
+
+
+def bench_transpile(voltas, n_fib):
+    # Execução do código Python gerado por transpiler comparada com a máquina
+    # virtual e com o interpretador ingênuo. A tradução com compile() e a
+    # mesma compilação vinda do cache de code objects são medidas à parte.
+    import io
+
+    import transpiler
+    import vm
+    from parser import parse
+
+    resultados = []
+    for nome, fonte in [('laço de {} voltas'.format(voltas), programa_laco(voltas)),
+                        ('fib {}'.format(n_fib), programa_fib(n_fib))]:
+        ast = parse(fonte)
+        transpiler.codes = transpiler.CodeCache()
+        traducao = cronometra(lambda: transpiler.load(transpiler.translate(ast)), repeticoes=1)
+        do_cache = cronometra(lambda: transpiler.load(transpiler.translate(ast)), repeticoes=3)
+        translation = transpiler.translate(ast)
+        program = vm.compile(ast)
+        saidas = [io.StringIO(), io.StringIO(), io.StringIO()]
+        tempo_python = cronometra(lambda: transpiler.run(translation, saidas[0]), repeticoes=3)
+        tempo_vm = cronometra(lambda: vm.run(program, saidas[1]), repeticoes=3)
+        tempo_ast = cronometra(lambda: em_pilha_grande(interpreta, ast, saidas[2]), repeticoes=3)
+        if not saidas[0].getvalue() == saidas[1].getvalue() == saidas[2].getvalue():
+            raise AssertionError('Saídas diferentes em {}'.format(nome))
+        resultados.append((nome, traducao, do_cache, tempo_python, tempo_vm, tempo_ast))
+    return resultados
+
+
+def pretty_recursivo(node):
+    # Node.pretty antes de Node.dump: cada nível refaz as linhas dos filhos
+    linhas = [node.type if node.leaf is None else '{} ({})'.format(node.type, node.leaf)]
+    for filho in node.children:
+        if type(filho) is type(node):
+            linhas.extend('| ' + linha for linha in pretty_recursivo(filho))
+        else:
+            linhas.append('| {}'.format(filho))
+    return linhas
+
+
+def bench_dump(profundidade):
+    # Tempo e pico de memória da impressão do AST de um programa aninhado:
+    # pretty recursivo, pretty() e dump() num arquivo, em texto e JSON lines
+    from parser import parse
+
+    ast = parse(programa_aninhado(profundidade))
+    esperado = em_pilha_grande(lambda: '\n'.join(pretty_recursivo(ast)))
+    if ast.pretty() != esperado:
+        raise AssertionError('pretty() diferente da versão recursiva')
+    resultados = []
+    with tempfile.TemporaryFile('w') as arquivo:
+        for nome, func in [('pretty recursivo', lambda: em_pilha_grande(lambda: '\n'.join(pretty_recursivo(ast)))),
+                           ('pretty()', ast.pretty),
+                           ('dump()', lambda: ast.dump(arquivo)),
+                           ('dump(jsonl=True)', lambda: ast.dump(arquivo, jsonl=True))]:
+            arquivo.seek(0)
+            tempo = cronometra(func, repeticoes=3)
+            tracemalloc.start()
+            func()
+            pico = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            resultados.append((nome, tempo, pico))
+    return len(esperado), resultados
+
+
+def bench_server(n):
+    # Mediana do tempo de verificar um arquivo pequeno n vezes: um processo
+    # `semantic.py arquivo` por vez, e pedidos check a um server.py já
+    # iniciado, pela entrada padrão
+    diretorio = os.path.dirname(os.path.abspath(__file__))
+    with tempfile.NamedTemporaryFile('w', suffix='.txt') as arquivo:
+        arquivo.write(programa_variaveis(50))
+        arquivo.flush()
+        processos = []
+        for _ in range(n):
+            inicio = time.perf_counter()
+            subprocess.run([sys.executable, 'semantic.py', arquivo.name], cwd=diretorio,
+                           stdout=subprocess.DEVNULL, check=True)
+            processos.append(time.perf_counter() - inicio)
+        servidor = subprocess.Popen([sys.executable, 'server.py', '--workers', '1'], cwd=diretorio,
+                                    stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        pedido = json.dumps({'jsonrpc': '2.0', 'id': 0, 'method': 'check',
+                             'params': {'path': arquivo.name}}).encode() + b'\n'
+        pedidos = []
+        try:
+            for i in range(n + 1):
+                inicio = time.perf_counter()
+                servidor.stdin.write(pedido)
+                servidor.stdin.flush()
+                resposta = json.loads(servidor.stdout.readline())
+                if resposta['result']['status'] != 'ok':
+                    raise AssertionError(resposta)
+                # O primeiro pedido espera o processo do pool subir
+                if i:
+                    pedidos.append(time.perf_counter() - inicio)
+        finally:
+            servidor.stdin.close()
+            servidor.wait()
+    return sorted(processos)[n // 2], sorted(pedidos)[n // 2]
+
+
+def bench_parallel(megabytes, processos):
+    # Análise léxica de um texto grande com TokenArray.scan e com
+    # TokenArray.scan_parallel em cada quantidade de processos; os tokens têm
+    # de ser os mesmos
+    from scanner import TokenArray
+
+    bloco = programa_blocos(100)
+    fonte = bloco * max(1, int(megabytes * 1024 * 1024 / len(bloco.encode())))
+    inicio = time.perf_counter()
+    esperado = TokenArray.scan(fonte)
+    resultados = [('sequencial', len(esperado), time.perf_counter() - inicio)]
+    for n in processos:
+        inicio = time.perf_counter()
+        tokens = TokenArray.scan_parallel(fonte, n)
+        tempo = time.perf_counter() - inicio
+        if list(tokens) != list(esperado):
+            raise AssertionError('Tokens diferentes com {} processos'.format(n))
+        resultados.append(('{} processos'.format(n), len(tokens), tempo))
+    return len(fonte.encode()), resultados
+
+
+if __name__ == '__main__':
+    comando = sys.argv[1] if len(sys.argv) > 1 else 'check'
+    if comando == 'check':
+        for n in [int(arg) for arg in sys.argv[2:]] or [1000, 10000, 20000]:
+            print('check {:>7} variáveis: {:8.3f}s'.format(n, bench_check(n)))
+    elif comando == 'visit':
+        n = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+        profundidade = int(sys.argv[3]) if len(sys.argv) > 3 else 5000
+        nos, tempo, tempo_aninhado = bench_visit(n, profundidade)
+        print('visit {} nós: {:.3f}s ({:.0f} ns/nó)'.format(nos, tempo, tempo / nos * 1e9))
+        print('visit {} níveis de aninhamento: {:.3f}s'.format(profundidade, tempo_aninhado))
+    elif comando == 'memory':
+        n = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+        nos, memoria, fonte = bench_memory(n)
+        print('memory {} nós: {} bytes ({:.1f} bytes/nó, {:.1f}x o código-fonte)'.format(
+            nos, memoria, memoria / nos, memoria / fonte))
+    elif comando == 'stress':
+        n = int(sys.argv[2]) if len(sys.argv) > 2 else 1000000
+        statements, parse, check = bench_stress(n)
+        print('stress {} statements: parse {:.2f}s, check {:.2f}s'.format(statements, parse, check))
+    elif comando == 'startup':
+        repeticoes = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+        for nome, tempo in bench_startup(repeticoes):
+            print('startup {}: {:.3f}s (mediana)'.format(nome, tempo))
+    elif comando == 'lex':
+        megabytes = float(sys.argv[2]) if len(sys.argv) > 2 else 8
+        tamanho, resultados = bench_lex(megabytes)
+        for nome, total, tempo in resultados:
+            print('lex {} ({:.1f} MB): {} tokens em {:.2f}s, {:.0f} tokens/s'.format(
+                nome, tamanho / 1024 / 1024, total, tempo, total / tempo))
+    elif comando == 'stream':
+        megabytes = float(sys.argv[2]) if len(sys.argv) > 2 else 64
+        tamanho, resultados = bench_stream(megabytes)
+        for nome, total, tempo, memoria in resultados:
+            print('stream {} ({:.1f} MB): {} tokens em {:.2f}s, pico de {:.1f} MB'.format(
+                nome, tamanho / 1024 / 1024, total, tempo, memoria / 1024 / 1024))
+    elif comando == 'batch':
+        n = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+        for nome, taxa in bench_batch(n):
+            print('batch {}: {:.1f} arquivos/s'.format(nome, taxa))
+    elif comando == 'incremental':
+        n = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+        edicoes = int(sys.argv[3]) if len(sys.argv) > 3 else 200
+        statements, parciais, incremental, completo = bench_incremental(n, edicoes)
+        print('incremental {} statements, {} edições por partes: {:.2f}ms por edição, parse completo {:.2f}ms'.format(
+            statements, parciais, incremental * 1e3, completo * 1e3))
+    elif comando == 'cache':
+        n = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+        resultados, estatisticas = bench_cache(n)
+        for nome, tempo in resultados:
+            print('cache {} arquivos, {}: {:.3f}s'.format(n, nome, tempo))
+        print('cache {}'.format(estatisticas))
+    elif comando == 'astbin':
+        n = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+        nos, resultados = bench_astbin(n)
+        for nome, tamanho, gravar, ler in resultados:
+            print('astbin {} nós, {}: {:.2f} MB{}, leitura {:.3f}s'.format(
+                nos, nome, tamanho / 1024 / 1024, '' if gravar is None else ', gravação {:.3f}s'.format(gravar), ler))
+    elif comando == 'vm':
+        voltas = int(sys.argv[2]) if len(sys.argv) > 2 else 200000
+        n_fib = int(sys.argv[3]) if len(sys.argv) > 3 else 20
+        for nome, compilacao, tempo_vm, tempo_ast in bench_vm(voltas, n_fib):
+            print('vm {}: compilação {:.2f}ms, vm {:.3f}s, interpretador do AST {:.3f}s ({:.1f}x)'.format(
+                nome, compilacao * 1e3, tempo_vm, tempo_ast, tempo_ast / tempo_vm))
+    elif comando == 'optimize':
+        n = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+        tempo, resultados = bench_optimize(n)
+        print('optimize {} blocos: {:.3f}s'.format(n, tempo))
+        for nome, nos, verificacao, execucao in resultados:
+            print('optimize {}: {} nós, verificação {:.3f}s, execução {:.3f}s'.format(
+                nome, nos, verificacao, execucao))
+    elif comando == 'transpile':
+        voltas = int(sys.argv[2]) if len(sys.argv) > 2 else 200000
+        n_fib = int(sys.argv[3]) if len(sys.argv) > 3 else 20
+        for nome, traducao, do_cache, python, tempo_vm, tempo_ast in bench_transpile(voltas, n_fib):
+            print('transpile {}: tradução {:.2f}ms ({:.2f}ms com cache), python {:.3f}s, vm {:.3f}s ({:.1f}x), '
+                  'interpretador do AST {:.3f}s ({:.1f}x)'.format(
+                      nome, traducao * 1e3, do_cache * 1e3, python, tempo_vm, tempo_vm / python,
+                      tempo_ast, tempo_ast / python))
+    elif comando == 'tokens':
+        megabytes = float(sys.argv[2]) if len(sys.argv) > 2 else 2
+        total, resultados = bench_tokens(megabytes)
+        for nome, memoria, montar, analisar in resultados:
+            print('tokens {} ({} tokens): {:.1f} bytes/token, montar {:.2f}s ({:.0f} tokens/s), '
+                  'parser {:.2f}s ({:.0f} tokens/s)'.format(
+                      nome, total, memoria / total, montar, total / montar, analisar, total / analisar))
+    elif comando == 'dump':
+        profundidade = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+        tamanho, resultados = bench_dump(profundidade)
+        for nome, tempo, pico in resultados:
+            print('dump {} ({} níveis, {:.1f} MB de texto): {:.3f}s, pico de {:.1f} MB'.format(
+                nome, profundidade, tamanho / 1024 / 1024, tempo, pico / 1024 / 1024))
+    elif comando == 'server':
+        n = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+        processo, pedido = bench_server(n)
+        print('server: processo novo {:.1f}ms, pedido ao servidor {:.2f}ms ({:.0f}x)'.format(
+            processo * 1e3, pedido * 1e3, processo / pedido))
+    elif comando == 'parallel':
+        megabytes = float(sys.argv[2]) if len(sys.argv) > 2 else 16
+        processos = [int(arg) for arg in sys.argv[3:]] or [2, 4]
+        tamanho, resultados = bench_parallel(megabytes, processos)
+        for nome, total, tempo in resultados:
+            print('parallel {} ({:.1f} MB, {} tokens): {:.2f}s, {:.1f} MB/s'.format(
+                nome, tamanho / 1024 / 1024, total, tempo, tamanho / 1024 / 1024 / tempo))
+    elif comando == 'suite':
+        args = sys.argv[2:]
+        opcoes = {}
+        for opcao in ('--baseline', '--save', '--limite'):
+            if opcao in args:
+                indice = args.index(opcao)
+                opcoes[opcao] = args[indice + 1]
+                del args[indice:indice + 2]
+        escala = float(args[0]) if args else 1.0
+        resultados = bench_suite(escala)
+        for nome, resultado in resultados.items():
+            print('suite {}: {:.4f}s, pico de {:.1f} MB, {} tokens'.format(
+                nome, resultado['tempo'], resultado['memoria'] / 1024 / 1024, resultado['tokens']))
+        if '--save' in opcoes:
+            with open(opcoes['--save'], 'w') as arquivo:
+                json.dump({'escala': escala, 'resultados': resultados}, arquivo, indent=2, sort_keys=True)
+        if '--baseline' in opcoes:
+            with open(opcoes['--baseline']) as arquivo:
+                base = json.load(arquivo)
+            if base.get('escala') != escala:
+                print('A base foi gerada com a escala {}, não {}.'.format(base.get('escala'), escala))
+                raise SystemExit(1)
+            regressoes, sem_base = compara(resultados, base['resultados'], float(opcoes.get('--limite', 0.25)))
+            for regressao in regressoes:
+                print('Regressão: {}'.format(regressao))
+            for mensagem in sem_base:
+                print('Sem comparação: {}'.format(mensagem))
+            if sem_base:
+                print('Gere a base de novo com --save.')
+            if regressoes or sem_base:
+                raise SystemExit(1)
+            print('Sem regressões em relação a {}.'.format(opcoes['--baseline']))
+    else:
+        print('Comando desconhecido: {}'.format(comando))
+        raise SystemExit(1)
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+Cache em disco das tabelas geradas pelo PLY e dos resultados do parser
+
+As tabelas ficam em $LEXICO_CACHE_DIR (ou $XDG_CACHE_HOME/python-lexical-analyzer)
+com a impressão digital do código que as gerou no nome do arquivo. Quando a
+gramática ou o lexer mudam, o nome muda e as tabelas são geradas de novo.
+
+ParseCache guarda resultados indexados pelo hash do código-fonte, no
+subdiretório 'ast'.
+"""
+
+import hashlib
+import importlib.util
+import os
+import pickle
+import threading
+
+from ply import __version__ as ply_version
+
+
+def cache_dir():
+    # Retorna None se não for possível usar o diretório de cache
+    path = os.environ.get('LEXICO_CACHE_DIR')
+    if not path:
+        base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+        path = os.path.join(base, 'python-lexical-analyzer')
+    try:
+        os.makedirs(path, exist_ok=True)
+    except OSError:
+        return None
+    if not os.access(path, os.W_OK):
+        return None
+    return path
+
+
+def fingerprint(*paths):
+    # Hash da versão do PLY e do conteúdo dos arquivos que definem as tabelas
+    digest = hashlib.sha1(ply_version.encode())
+    for path in paths:
+        with open(path, 'rb') as source:
+            digest.update(source.read())
+    return digest.hexdigest()[:16]
+
+
+def load_module(name, path):
+    # Importa um módulo de tabela a partir do caminho, sem mexer no sys.path
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def temporary(path):
+    # Nome temporário no mesmo diretório; o arquivo final só aparece com
+    # os.replace, então processos concorrentes nunca leem tabela pela metade
+    root, ext = os.path.splitext(path)
+    return '{}_{}_{}{}'.format(root, os.getpid(), threading.get_ident(), ext)
+
+
+class ParseCache:
+    # Resultados em arquivos com o hash do código-fonte no nome. O acesso
+    # atualiza a data de modificação do arquivo, e quando o diretório passa de
+    # max_bytes os arquivos usados há mais tempo são apagados.
+    def __init__(self, directory=None, version='', max_bytes=256 * 1024 * 1024):
+        if directory is None:
+            base = cache_dir()
+            directory = base and os.path.join(base, 'ast')
+        if directory is not None:
+            try:
+                os.makedirs(directory, exist_ok=True)
+            except OSError:
+                directory = None
+        # Sem diretório o cache não guarda nada
+        self.directory = directory
+        self.version = version.encode()
+        self.max_bytes = max_bytes
+        # Tamanho estimado do diretório, recalculado a cada limpeza
+        self.size = None
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+
+    def key(self, data):
+        # data são os bytes do código-fonte
+        return hashlib.sha256(self.version + b'\0' + data).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key + '.pickle')
+
+    def get(self, key):
+        # Devolve o valor guardado ou None
+        value = None
+        if self.directory is not None:
+            path = self.path(key)
+            try:
+                with open(path, 'rb') as file:
+                    value = pickle.load(file)
+                os.utime(path)
+            except FileNotFoundError:
+                pass
+            except Exception:
+                # Arquivo corrompido ou de outra versão do Python
+                self.remove(path)
+        with self.lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def put(self, key, value):
+        if self.directory is None:
+            return
+        try:
+            data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        except RecursionError:
+            # Árvore profunda demais para o pickle; fica sem cache
+            return
+        path = self.path(key)
+        temp = temporary(path)
+        try:
+            with open(temp, 'wb') as file:
+                file.write(data)
+            os.replace(temp, path)
+        except OSError:
+            self.remove(temp)
+            return
+        with self.lock:
+            self.writes += 1
+            if self.size is not None:
+                self.size += len(data)
+            if self.size is None or self.size > self.max_bytes:
+                self.evict()
+
+    def evict(self):
+        # Apaga os arquivos menos usados até o diretório ficar com no máximo
+        # 90% de max_bytes. Outros processos podem estar apagando ao mesmo tempo.
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.pickle'):
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        self.size = sum(size for mtime, size, path in entries)
+        if self.size <= self.max_bytes:
+            return
+        entries.sort()
+        for mtime, size, path in entries:
+            if self.size <= self.max_bytes * 0.9:
+                break
+            self.remove(path)
+            self.size -= size
+            self.evictions += 1
+
+    def remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'writes': self.writes,
+                'evictions': self.evictions}
+
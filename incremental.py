@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+Análise sintática incremental, por statement do nível mais externo
+
+Uso: python incremental.py arquivo.txt [edições] [semente]
+
+Um Document guarda o texto, o AST e onde começa e termina cada statement do
+nível mais externo. Um statement termina no FIM_COMANDO (mais os pontos
+finais seguidos) em que nenhum bloco se/enquanto/para/define está aberto;
+os blocos fecham no 'e deu'. Numa edição só os statements atingidos são
+analisados de novo. A análise léxica recomeça no início do primeiro statement
+atingido e segue até terminar um statement no mesmo ponto em que terminava
+um statement antigo, depois do fim da edição. Dali em diante o texto é o
+mesmo, então os nós antigos são reaproveitados (os mesmos objetos), só com
+as linhas deslocadas.
+
+Em qualquer situação que a análise por partes não resolve (erro léxico ou
+de sintaxe, bloco sem 'e deu', texto que não estava analisado) o documento
+inteiro é analisado de novo com parser.parse, que também imprime os erros.
+"""
+
+import bisect
+import copy
+import random
+import sys
+import time
+
+from parser import Node, get_parser, parse
+from scanner import FastLexer, scan
+
+# Tokens que abrem um bloco terminado por DEU. O SE depois de SENAO continua
+# o mesmo bloco.
+opens = {'SE', 'ENQUANTO', 'PARA', 'DEFINE'}
+
+
+class Segment:
+    # Statement do nível mais externo: posições do primeiro caractere e logo
+    # depois do último, linhas do primeiro e do último token, e o nó
+    __slots__ = ('start', 'end', 'first', 'last', 'node')
+
+    def __init__(self, start, end, first, last, node=None):
+        self.start = start
+        self.end = end
+        self.first = first
+        self.last = last
+        self.node = node
+
+
+class Unsupported(Exception):
+    # A edição não pode ser resolvida por partes
+    pass
+
+
+def raise_error(*args):
+    raise Unsupported()
+
+
+def segments(tokens):
+    # Agrupa tuplas (tipo, valor, linha, posição) em statements do nível mais
+    # externo. Gera (tokens, segmento) assim que o statement termina, isto é,
+    # quando chega um token que não é FIM_COMANDO.
+    current = []
+    depth = 0
+    previous = None
+    for token in tokens:
+        kind = token[0]
+        if current and depth == 0 and previous == 'FIM_COMANDO' and kind != 'FIM_COMANDO':
+            yield current, Segment(current[0][3], current[-1][3] + 1, current[0][2], current[-1][2])
+            current = []
+        if kind in opens and not (kind == 'SE' and previous == 'SENAO'):
+            depth += 1
+        elif kind == 'DEU':
+            depth -= 1
+            if depth < 0:
+                raise Unsupported()
+        current.append(token)
+        previous = kind
+    if current:
+        if depth != 0 or previous != 'FIM_COMANDO':
+            raise Unsupported()
+        yield current, Segment(current[0][3], current[-1][3] + 1, current[0][2], current[-1][2])
+
+
+def shift_lines(node, delta):
+    # Desloca as linhas de uma subárvore. Linha 0 vem de símbolos não
+    # terminais no PLY e não depende da posição, então fica como está.
+    pending = [node]
+    while pending:
+        node = pending.pop()
+        if node.line:
+            node.line += delta
+        pending.extend(child for child in node.children if isinstance(child, Node))
+
+
+def equal(a, b):
+    # Compara duas árvores: tipo, folha, linha e filhos
+    pending = [(a, b)]
+    while pending:
+        a, b = pending.pop()
+        if isinstance(a, Node) != isinstance(b, Node):
+            return False
+        if not isinstance(a, Node):
+            if a != b or type(a) != type(b):
+                return False
+            continue
+        if (a.type, a.leaf, a.line, len(a.children)) != (b.type, b.leaf, b.line, len(b.children)):
+            return False
+        pending.extend(zip(a.children, b.children))
+    return True
+
+
+class Document:
+    def __init__(self, text):
+        self.text = text
+        self.ast = None
+        # None quando o texto não pode ser editado por partes
+        self.segments = None
+        # Parser que interrompe a análise de um statement no primeiro erro,
+        # sem imprimir nada
+        self.parser = copy.copy(get_parser())
+        self.parser.errorfunc = raise_error
+        # Quantas edições foram resolvidas por partes e quantas análises completas
+        self.partial = 0
+        self.full = 0
+        self.full_parse()
+
+    def full_parse(self):
+        # Analisa o texto inteiro. Sem erros, o texto fica pronto para ser
+        # editado por partes; com erros, parser.parse analisa de novo com a
+        # recuperação de erros do PLY e imprime as mensagens.
+        self.full += 1
+        try:
+            tokens = list(scan(self.text, error=raise_error))
+            self.ast = self.parse_tokens(tokens)
+            found = [segment for segment_tokens, segment in segments(tokens)]
+        except Unsupported:
+            self.ast = parse(self.text)
+            return
+        if len(found) != len(self.ast.children):
+            return
+        for segment, node in zip(found, self.ast.children):
+            segment.node = node
+        self.segments = found
+
+    def parse_tokens(self, tokens):
+        lexer = FastLexer()
+        lexer.feed(tokens)
+        program = self.parser.parse(lexer=lexer)
+        if program is None:
+            raise Unsupported()
+        return program
+
+    def parse_segment(self, tokens):
+        program = self.parse_tokens(tokens)
+        if len(program.children) != 1:
+            raise Unsupported()
+        return program.children[0]
+
+    def edit(self, start, end, replacement):
+        # Troca self.text[start:end] por replacement e devolve o novo AST.
+        # Os nós do AST anterior que são reaproveitados têm as linhas
+        # atualizadas, então o AST anterior não deve mais ser usado.
+        self.text = self.text[:start] + replacement + self.text[end:]
+        # Se uma ação da gramática levantar exceção, o documento fica sem
+        # AST e a próxima edição analisa tudo de novo
+        old, self.segments, self.ast = self.segments, None, None
+        if old is None:
+            self.full_parse()
+            return self.ast
+        try:
+            self.reparse(old, start, end, replacement)
+        except Unsupported:
+            self.full_parse()
+        return self.ast
+
+    def reparse(self, old, start, end, replacement):
+        delta = len(replacement) - (end - start)
+        edit_end = start + len(replacement)
+        # Primeiro statement atingido: o último que começa antes da edição,
+        # que pode absorver um ponto final inserido logo depois dele
+        first = bisect.bisect_right([segment.start for segment in old], start) - 1
+        if first < 0:
+            first, pos, lineno = 0, 0, 1
+        else:
+            pos, lineno = old[first].start, old[first].first
+        ends = {segment.end: index for index, segment in enumerate(old)}
+
+        new = []
+        resume = len(old)
+        for tokens, segment in segments(scan(self.text, lineno, pos, error=raise_error)):
+            segment.node = self.parse_segment(tokens)
+            new.append(segment)
+            index = ends.get(segment.end - delta)
+            if segment.end >= edit_end and index is not None and index >= first:
+                resume = index + 1
+                line_delta = segment.last - old[index].last
+                break
+        else:
+            line_delta = 0
+
+        reused = old[resume:]
+        for segment in reused:
+            segment.start += delta
+            segment.end += delta
+            if line_delta:
+                segment.first += line_delta
+                segment.last += line_delta
+                shift_lines(segment.node, line_delta)
+        self.segments = old[:first] + new + reused
+        if not self.segments:
+            raise Unsupported()
+        self.ast = Node('program', children=[segment.node for segment in self.segments], leaf='')
+        self.partial += 1
+
+
+def random_edit(text, rng):
+    # Edição aleatória pequena. Metade das edições mantém o programa válido
+    # na maior parte das vezes (trocar um número, inserir espaço ou quebra de
+    # linha, inserir ou apagar uma linha); a outra metade é arbitrária.
+    kind = rng.randrange(8)
+    if kind == 0:
+        numbers = [i for i, char in enumerate(text) if char.isdigit()]
+        if numbers:
+            start = rng.choice(numbers)
+            return start, start + 1, str(rng.randrange(100))
+    elif kind == 1:
+        spaces = [i for i, char in enumerate(text) if char in ' \n']
+        if spaces:
+            start = rng.choice(spaces)
+            return start, start, rng.choice([' ', '\n', '\n\n', '  # comentário\n'])
+    elif kind in (2, 3):
+        lines = [0] + [i + 1 for i, char in enumerate(text) if char == '\n']
+        start = rng.choice(lines)
+        if kind == 2:
+            return start, start, rng.choice(['int z é 3.\n', 'x é x mais 1.\n', 'mostra x.\n',
+                                             'se x é menor que 2 então\n', 'e deu.\n', '.\n'])
+        end = text.find('\n', start)
+        return start, len(text) if end < 0 else end + 1, ''
+    pieces = ['x', 'y', ' ', '\n', '.', 'é', '1', '2,5', 'mais', 'int z é 3.', 'e deu.', 'e deu',
+              'se x é menor que 2 então', '#', '"a"', 'mostra x.', 'faça', 'menor que', ',', '!']
+    start = rng.randrange(len(text) + 1)
+    end = min(len(text), start + rng.choice([0, 0, 1, 2, 5, 20]))
+    replacement = ''.join(rng.choice(pieces) for _ in range(rng.choice([0, 1, 1, 2, 3])))
+    return start, end, replacement
+
+
+if __name__ == '__main__':
+    # Aplica edições aleatórias e confere cada resultado com uma análise
+    # completa do mesmo texto
+    import contextlib
+    import io
+
+    def run(func, *args):
+        # Resultado, saída impressa e exceção, se houver
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            try:
+                return func(*args), output.getvalue(), None
+            except Exception as error:
+                return None, output.getvalue(), repr(error)
+
+    text = open(sys.argv[1]).read()
+    edits = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    rng = random.Random(int(sys.argv[3]) if len(sys.argv) > 3 else 0)
+    document = Document(text)
+    incremental = full = 0.0
+    failures = 0
+    # Edições feitas desde o último texto analisável por partes. Costumam ser
+    # desfeitas logo depois, para que a maior parte das edições parta de um
+    # texto válido.
+    undo = []
+    for _ in range(edits):
+        if undo and rng.random() < 0.8:
+            start, end, replacement = undo.pop()
+        else:
+            start, end, replacement = random_edit(document.text, rng)
+            undo.append((start, start + len(replacement), document.text[start:end]))
+        begin = time.perf_counter()
+        ast, output, error = run(document.edit, start, end, replacement)
+        incremental += time.perf_counter() - begin
+        begin = time.perf_counter()
+        expected, expected_output, expected_error = run(parse, document.text)
+        full += time.perf_counter() - begin
+        if (ast is None) != (expected is None) or (ast is not None and not equal(ast, expected)) \
+                or (output, error) != (expected_output, expected_error):
+            failures += 1
+            print('Diferença depois da edição {!r}'.format((start, end, replacement)))
+            document = Document(document.text)
+        if document.segments is not None:
+            undo = []
+    print('{} edições ({} por partes), {} diferenças. Incremental {:.3f}s, completo {:.3f}s'.format(
+        edits, document.partial, failures, incremental, full))
+    raise SystemExit(1 if failures else 0)
@@ -4,7 +4,10 @@
 Analisador lexico
 """
 
-from ply import lex
+import cache
+import os
+import sys
+import threading
 
 # Lista de palavras reservadas da linguagem
 reserved = {
@@ -74,6 +77,15 @@ tokens = [
     'INDICE',
 ] + list(reserved.values())
 
+
+# Identificadores, índices e textos passam por sys.intern: ocorrências iguais
+# são o mesmo objeto, e as buscas nos dicionários de escopo terminam na
+# comparação por identidade. Uma string internada é liberada quando nenhum
+# token ou nó a usa mais, então um processo longo (server.py) não acumula os
+# nomes de todos os programas que já analisou.
+intern = sys.intern
+
+
 t_ABRE_PAR = r'\('
 t_FECHA_PAR = r'\)'
 t_VIRGULA = r'\,'
@@ -146,14 +158,17 @@ def t_NUM_INTEIRO(t):
 
 def t_TEXTO_RAW(t):
     r'\"[A-Za-z !#,$%&*+-~|:@¨¬\w]*"'
+    t.value = intern(t.value)
     return t
 
 def t_INDICE(t):
     r'\[[a-zA-Z_\w*][a-zA-Z_0-9\w*]*\]|\[[0-9]+\]'
+    t.value = intern(t.value)
     return t
 
 def t_ID(t):
     r'[a-zA-Z_\w*][a-zA-Z_0-9\w*]*'
+    t.value = intern(t.value)
     t.type = reserved.get(t.value,'ID')    # Check for reserved words
     return t
 
@@ -173,29 +188,77 @@ def t_newline(t):
 #     t.lexer.linepos = 0
 
 def t_error(t):
-    print('Caractere ilegal na linha {}: {}'.format(lexer.lineno, t.value[0]))
+    print('Caractere ilegal na linha {}: {}'.format(t.lexer.lineno, t.value[0]))
     t.lexer.skip(1)
 
 t_ignore = ' \r\t'
 
 t_ignore_COMMENT='\#.*'
 
-lexer = lex.lex()
-
-if __name__ == '__main__':
-    import sys
 
-    # dados = input('Digite uma expressao: ')
+# Há dois backends com os mesmos tokens: 'ply', construído a partir das regras
+# acima, e 'fast', o analisador de scanner.py. Sem argumento, o backend vem de
+# $LEXICO_LEXER (padrão 'ply').
+# As tabelas do PLY são carregadas do cache em disco (cache.py) e só são
+# geradas quando o arquivo deste módulo muda.
+def build_lexer(backend=None):
+    backend = backend or os.environ.get('LEXICO_LEXER') or 'ply'
+    if backend == 'fast':
+        from scanner import FastLexer
+        return FastLexer()
+    if backend != 'ply':
+        raise ValueError('Backend de lexer desconhecido: {}'.format(backend))
+
+    # Importado aqui para não pesar no import deste módulo
+    from ply import lex
+
+    module = sys.modules[__name__]
+    directory = cache.cache_dir()
+    if directory is None:
+        return lex.lex(module=module)
+    name = 'lextab_{}'.format(cache.fingerprint(__file__))
+    path = os.path.join(directory, name + '.py')
+    if os.path.exists(path):
+        try:
+            return lex.lex(module=module, optimize=1, lextab=cache.load_module(name, path))
+        except Exception:
+            pass # Tabela corrompida ou de outra versão, gera de novo
+    temp = cache.temporary(path)
+    built = lex.lex(module=module, optimize=1, outputdir=directory,
+                    lextab=os.path.splitext(os.path.basename(temp))[0])
+    try:
+        os.replace(temp, path)
+    except OSError:
+        pass
+    return built
+
+
+# O lexer compartilhado só é construído no primeiro acesso a `lexer.lexer`
+def get_lexer():
+    global lexer
+    with build_lock:
+        try:
+            return lexer
+        except NameError:
+            lexer = build_lexer()
+            return lexer
+
+build_lock = threading.Lock()
+
+
+def __getattr__(name):
+    if name == 'lexer':
+        return get_lexer()
+    raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
 
-    dados = open(sys.argv[1]).read()
 
-# with open(arq) as file:
-    # Junta a lista das linhas
-    # dados = ('').join(file.readlines())
+if __name__ == '__main__':
+    from scanner import tokenize
 
-    lexer.input(dados)
+    # dados = input('Digite uma expressao: ')
 
-    token = lexer.token()
-    while token:
-        print(token)
-        token = lexer.token()
+    # O arquivo é lido aos poucos (scanner.tokenize), sem carregar tudo na
+    # memória, e os tokens são tuplas: nenhum objeto de token é criado
+    write = sys.stdout.write
+    for token in tokenize(sys.argv[1]):
+        write('LexToken(%s,%r,%d,%d)\n' % token)
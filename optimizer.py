@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+Otimização do AST: propagação de constantes e remoção de blocos mortos
+
+Uso: python optimizer.py arquivo.txt
+
+Roda entre parser.parse e a verificação semântica:
+    - bin_op e boolean_exp com dois literais viram um literal ('2 mais 3
+      vezes 4' vira 14), com as regras de tipo de semantic.op_rules. Operações
+      que a verificação rejeitaria, divisões por zero e potências muito
+      grandes ficam como estão, para o erro aparecer na verificação ou na
+      execução.
+    - se/senão com condição constante fica só com o bloco executado, dentro de
+      um nó 'block' que mantém o escopo do bloco; enquanto com condição falsa
+      é removido.
+
+Os blocos removidos não são verificados. O AST original não é alterado: só os
+nós no caminho de uma mudança são copiados, então nós reaproveitados por
+incremental.Document continuam valendo.
+"""
+
+import sys
+
+from parser import Node
+from semantic import SemanticError, operation_type
+import vm
+
+# Literais que podem ser combinados, com o tipo do valor no Python
+literals = {'int': int, 'real': float, 'texto': str, 'boolean': bool}
+
+# Maior expoente inteiro calculado na otimização
+max_exponent = 64
+
+
+class Optimizer:
+    def __init__(self):
+        # Operações substituídas por literais, blocos removidos e total de nós
+        # a menos no AST
+        self.folded = 0
+        self.pruned = 0
+        self.removed = 0
+
+    def optimize(self, ast):
+        # Percorre em pós-ordem sem recursão. Cada item da pilha é o nó, um
+        # iterador sobre os filhos e a lista dos filhos já otimizados; o
+        # resultado de um nó vai para a lista do pai. Nós sem filhos que são
+        # nós (valores e folhas) não mudam e nem entram na pilha.
+        stack = [(ast, iter(ast.children), [])]
+        visited = 1
+        result = None
+        while stack:
+            node, pending, done = stack[-1]
+            for child in pending:
+                if type(child) is Node and child.type != 'value' and child.children:
+                    stack.append((child, iter(child.children), []))
+                    break
+                visited += type(child) is Node
+                done.append(child)
+            else:
+                stack.pop()
+                visited += len(stack) > 0
+                done = tuple(done)
+                # Compara por identidade (Node não define __eq__)
+                if done != node.children:
+                    node = Node(node.type, done, node.leaf, node.line)
+                node = self.rewrite(node)
+                if stack:
+                    stack[-1][2].append(node)
+                else:
+                    result = node
+        self.removed = visited - count(result)
+        return result
+
+    def rewrite(self, node):
+        # Nó com os filhos já otimizados; devolve o substituto, o próprio nó
+        # ou None quando o nó deve sumir
+        if node.type in ('bin_op', 'boolean_exp'):
+            return self.fold(node)
+        if node.type == 'if_statement':
+            return self.prune_if(node)
+        if node.type == 'while_loop':
+            if constant(node.children[0]) is False:
+                self.pruned += 1
+                return None
+        if node.type in ('program', 'statement_list') and None in node.children:
+            # Statements removidos
+            return Node(node.type, [child for child in node.children if child is not None], node.leaf, node.line)
+        return node
+
+    def fold(self, node):
+        left, right = node.children
+        if not (is_literal(left) and is_literal(right)):
+            return node
+        operation = ' '.join(node.leaf.split())
+        try:
+            result_type = operation_type(operation, left.leaf, right.leaf, node.line)
+        except SemanticError:
+            return node
+        a, b = vm.constants[left.leaf](left.children[0]), vm.constants[right.leaf](right.children[0])
+        if operation == 'na' and type(b) is int and abs(b) > max_exponent:
+            return node
+        try:
+            value = vm.binary[operation](a, b)
+        except (ZeroDivisionError, OverflowError, TypeError):
+            return node
+        # O valor precisa ser do tipo que a verificação atribui (por exemplo,
+        # 'e' entre int e real é boolean na verificação mas não no Python)
+        if literals.get(result_type) is not type(value):
+            return node
+        self.folded += 1
+        return Node('value', children=literal(value, result_type), leaf=result_type,
+                    line=node.line or left.line)
+
+    def prune_if(self, node):
+        # No senão se, o if_statement seguinte já foi otimizado: pode ter
+        # virado um bloco ou sumido
+        if node.leaf == 'if/elseif':
+            following = node.children[2]
+            if following is None:
+                node = Node('if_statement', node.children[:2], 'if', node.line)
+            elif following.type == 'block':
+                node = Node('if_statement', node.children[:2] + following.children, 'if/else', node.line)
+        condition = constant(node.children[0])
+        if condition is None:
+            return node
+        self.pruned += 1
+        if condition:
+            taken = node.children[1]
+        elif node.leaf == 'if/else':
+            taken = node.children[2]
+        elif node.leaf == 'if/elseif':
+            return node.children[2]
+        else:
+            return None
+        # O bloco mantém o escopo que o se abria
+        return Node('block', children=[taken], leaf='block', line=node.line)
+
+
+def is_literal(node):
+    return node.type == 'value' and node.leaf in literals
+
+
+def constant(node):
+    # Valor de uma condição literal booleana, ou None
+    if node.type == 'value' and node.leaf == 'boolean':
+        return node.children[0] == 'verdadeiro'
+    return None
+
+
+def literal(value, type):
+    # Filho do nó 'value' como o parser gera
+    if type == 'texto':
+        return '"{}"'.format(value)
+    if type == 'boolean':
+        return 'verdadeiro' if value else 'falso'
+    if type == 'real':
+        return float(value)
+    return value
+
+
+def count(node):
+    total = 0
+    pending = [node]
+    while pending:
+        node = pending.pop()
+        total += 1
+        pending.extend(child for child in node.children if isinstance(child, Node))
+    return total
+
+
+def optimize(ast):
+    # AST otimizado e quantidade de nós removidos
+    optimizer = Optimizer()
+    return optimizer.optimize(ast), optimizer.removed
+
+
+if __name__ == '__main__':
+    from parser import parse_file
+
+    ast = parse_file(sys.argv[1])
+    if ast is None:
+        raise SystemExit(1)
+    optimizer = Optimizer()
+    optimized = optimizer.optimize(ast)
+    optimized.dump(sys.stdout)
+    print('{} operações calculadas, {} blocos removidos, {} de {} nós a menos'.format(
+        optimizer.folded, optimizer.pruned, optimizer.removed, count(ast)))
@@ -1,39 +1,101 @@
 #!/usr/bin/env python3
 # -*- coding:utf-8 -*-
 
-from ply import yacc
-from lexer import tokens
+from lexer import tokens, get_lexer
+import cache
+import copy
+import io
+import os
 import sys
+import threading
 
 
 class Node:
+    # Sem __dict__ por instância: a árvore pode ter milhões de nós
+    __slots__ = ('type', 'line', 'children', 'leaf', 'inferred')
+
     def __init__(self, type, children=None, leaf=None, line=None):
         self.type = type
         self.line = line
-        if children:
-            if not isinstance(children, (list, tuple)):
-                children = [children]
+        # Os filhos ficam numa tupla; folhas compartilham a tupla vazia.
+        # Valores como 0 e 0,0 também são filhos, por isso o teste com None.
+        if children is None:
+            self.children = ()
+        elif isinstance(children, tuple):
             self.children = children
+        elif isinstance(children, list):
+            self.children = tuple(children)
         else:
-            self.children = []
+            self.children = (children,)
         self.leaf = leaf
-
-    def _pretty(self, prefix='| '):
-        string = []
-        root = '{}'.format(str(self.type))
-        if self.leaf is not None:
-            root += ' ({})'.format(self.leaf)
-        string.append(root)
-        for child in self.children:
-            if isinstance(child, Node):
-                for child_string in child._pretty():
-                    string.append('{}{}'.format(prefix, child_string))
+        # Tipo da expressão, preenchido pela verificação semântica (None
+        # antes dela e em nós que não são expressões). Não vai para o pickle.
+        self.inferred = None
+
+    def dump(self, file, max_depth=None, max_nodes=None, jsonl=False):
+        # Escreve a árvore em file sem recursão, uma linha por nó ou valor,
+        # no formato de pretty() (com '\n' no fim de cada linha). Os filhos
+        # de nós na profundidade max_depth e os nós depois dos primeiros
+        # max_nodes viram uma linha '...'. Com jsonl, cada nó é um objeto JSON
+        # por linha, em pré-ordem: depth, type, leaf, line e children, com
+        # null no lugar dos filhos que são nós, e inferred nas expressões já
+        # verificadas.
+        if jsonl:
+            import json
+            encode = json.JSONEncoder(ensure_ascii=False).encode
+        lines = []
+        size = 0
+        nodes = 0
+        stack = [(self, 0)]
+        while stack:
+            item, depth = stack.pop()
+            if not isinstance(item, Node):
+                lines.append('| ' * depth + '{}'.format(item))
+            elif max_nodes is not None and nodes >= max_nodes:
+                lines.append(encode({'depth': depth, 'truncated': True}) if jsonl else '| ' * depth + '...')
+                break
             else:
-                string.append('{}{}'.format(prefix, child))
-        return string
+                nodes += 1
+                children = item.children
+                truncated = max_depth is not None and depth >= max_depth and len(children) > 0
+                if jsonl:
+                    record = {'depth': depth, 'type': item.type, 'leaf': item.leaf, 'line': item.line,
+                              'children': [None if isinstance(child, Node) else child for child in children]}
+                    if item.inferred is not None:
+                        record['inferred'] = item.inferred
+                    if truncated:
+                        record['truncated'] = True
+                    lines.append(encode(record))
+                    # Os valores já estão no registro do nó
+                    children = [child for child in children if isinstance(child, Node)]
+                elif item.leaf is None:
+                    lines.append('| ' * depth + '{}'.format(item.type))
+                else:
+                    lines.append('| ' * depth + '{} ({})'.format(item.type, item.leaf))
+                if truncated:
+                    if not jsonl:
+                        lines.append('| ' * (depth + 1) + '...')
+                else:
+                    stack.extend([(child, depth + 1) for child in reversed(children)])
+            # Escreve em blocos de uns 64 KB
+            size += len(lines[-1])
+            if size >= 65536:
+                lines.append('')
+                file.write('\n'.join(lines))
+                lines = []
+                size = 0
+        if lines:
+            lines.append('')
+            file.write('\n'.join(lines))
 
     def pretty(self):
-        return '\n'.join(self._pretty())
+        output = io.StringIO()
+        self.dump(output)
+        return output.getvalue()[:-1]
+
+    def __reduce__(self):
+        # Pickle compacto: só os quatro campos, sem o dicionário de estado
+        return (Node, (self.type, self.children, self.leaf, self.line))
 
     def __str__(self):
         children_string = ', '.join([str(c) for c in self.children]) if self.children else ''
@@ -41,18 +103,25 @@ class Node:
         return '({} {}[{}])'.format(self.type, leaf_string, children_string)
 
 def p_program(p):
-    ''' program : statement_list '''
+    ''' program : statements '''
     p[0] = Node('program', children = p[1], leaf = '')
 
 
 def p_list(p):
-    '''statement_list : statement statement_list
-                      | statement '''
+    '''statement_list : statements '''
+    p[0] = Node('statement_list', children=p[1], leaf = ' ')
+
+
+# Recursão à esquerda: os statements vão sendo acumulados numa lista, então
+# nem a pilha do LALR nem a árvore crescem com o tamanho do bloco
+def p_statements(p):
+    '''statements : statements statement
+                  | statement '''
     if len(p) == 2:
-        p[0] = p[1]
-        #p[0] = Node('statement', children=p[1], leaf = ' ')
+        p[0] = [p[1]]
     else:
-        p[0] = Node('statement_list', children=[p[1],p[2]], leaf = ' ')
+        p[1].append(p[2])
+        p[0] = p[1]
 
 
 def p_statement(p):
@@ -208,7 +277,8 @@ def p_types(p):
 
 def p_list_acess(p):
     ''' expression : ID INDICE'''
-    p[0] = Node('index', children=p[1], leaf='index', line = p.lineno(1)) # Talvez children=p[1], leaf = p[2]
+    # Filhos: o nome da lista e o índice com os colchetes ('[2]' ou '[i]')
+    p[0] = Node('index', children=[p[1], p[2]], leaf='index', line = p.lineno(1))
 
 
 def p_if(p):
@@ -287,9 +357,33 @@ def p_range(p):
     ''' expression : NUM_INTEIRO A NUM_INTEIRO '''
     p[0] =  Node('iterable', children=[p[1], p[3]], leaf='range')
 
+# Recuperação de erros: depois de um erro de sintaxe o PLY descarta tokens
+# até o fim do statement (FIM_COMANDO) ou do bloco (DEU FIM_COMANDO) e
+# continua a análise, então um arquivo mostra todos os erros de uma vez
+def p_statement_error(p):
+    ''' statement : error FIM_COMANDO
+                  | error DEU FIM_COMANDO '''
+    p[0] = Node('error', leaf='erro', line=p.lineno(len(p) - 1))
+
+
+# Quantidade de erros de sintaxe depois da qual a análise é interrompida
+max_errors = 100
+
 # Error rule for syntax errors
 def p_error(p):
-    print("Erro de sintaxe!")
+    # Imprime o erro com a linha e guarda (linha, mensagem) em syntax_errors()
+    if p is None:
+        line = None
+        message = 'Erro de sintaxe: fim inesperado do código.'
+    else:
+        line = p.lineno
+        message = 'Erro de sintaxe na linha {}: {!r} inesperado.'.format(line, p.value)
+    print(message)
+    errors = syntax_errors()
+    errors.append((line, message))
+    if len(errors) >= max_errors:
+        print('Muitos erros de sintaxe, análise interrompida.')
+        raise ParseError(message)
 
 
 precedence = (
@@ -302,7 +396,191 @@ precedence = (
     ('right', 'UMENOS'),
 )
 
-parser = yacc.yacc()
+# As tabelas LALR são carregadas do cache em disco (cache.py) e só são
+# geradas quando a gramática ou os tokens mudam. Sem parser.out/parsetab.py
+# ao lado do código.
+def build_parser():
+    # Importado aqui para não pesar no import deste módulo
+    from ply import yacc
+
+    module = sys.modules[__name__]
+    directory = cache.cache_dir()
+    if directory is None:
+        return yacc.yacc(module=module, debug=False, write_tables=False)
+    # As tabelas dependem também dos tokens definidos em lexer.py
+    name = 'parsetab_{}.pickle'.format(cache.fingerprint(__file__, sys.modules['lexer'].__file__))
+    path = os.path.join(directory, name)
+    if os.path.exists(path):
+        try:
+            return yacc.yacc(module=module, debug=False, picklefile=path)
+        except Exception:
+            pass # Tabela corrompida ou de outra versão, gera de novo
+    temp = cache.temporary(path)
+    built = yacc.yacc(module=module, debug=False, picklefile=temp)
+    try:
+        os.replace(temp, path)
+    except OSError:
+        pass
+    return built
+
+
+# O parser compartilhado só é construído no primeiro acesso a `parser.parser`
+def get_parser():
+    global parser
+    with build_lock:
+        try:
+            return parser
+        except NameError:
+            parser = build_parser()
+            return parser
+
+build_lock = threading.Lock()
+
+
+# Cada thread analisa com uma cópia rasa do parser e do lexer compartilhados:
+# as tabelas são as mesmas, mas o estado de uma análise em andamento não
+local = threading.local()
+
+def thread_parser():
+    try:
+        return local.parser
+    except AttributeError:
+        local.parser = copy.copy(get_parser())
+        return local.parser
+
+def thread_lexer():
+    try:
+        return local.lexer
+    except AttributeError:
+        local.lexer = get_lexer().clone()
+        return local.lexer
+
+def strict_parser():
+    # Cópia que levanta ParseError no primeiro erro de sintaxe, em vez de
+    # imprimir a mensagem e tentar se recuperar
+    try:
+        return local.strict_parser
+    except AttributeError:
+        local.strict_parser = copy.copy(get_parser())
+        local.strict_parser.errorfunc = strict_error
+        return local.strict_parser
+
+
+class ParseError(Exception):
+    # Erro léxico ou de sintaxe numa análise sem recuperação de erros, ou
+    # excesso de erros numa análise com recuperação
+    pass
+
+def strict_error(*args):
+    raise ParseError()
+
+
+def syntax_errors():
+    # Erros de sintaxe da última análise desta thread, como (linha, mensagem).
+    # A linha é None quando o código termina no meio de um statement.
+    try:
+        return local.errors
+    except AttributeError:
+        local.errors = []
+        return local.errors
+
+
+def __getattr__(name):
+    if name == 'parser':
+        return get_parser()
+    raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
+
+
+def parse(codigo, lexer=None):
+    # Sem lexer explícito usa o da thread, recomeçando a contagem de linhas
+    if lexer is None:
+        lexer = thread_lexer()
+        lexer.lineno = 1
+    local.errors = []
+    try:
+        return thread_parser().parse(codigo, lexer=lexer)
+    except ParseError:
+        return None
+
+
+def strict_parse(codigo):
+    # Como parse, mas sem imprimir nada nem recuperar erros: o primeiro erro
+    # léxico ou de sintaxe levanta ParseError
+    from scanner import FastLexer, scan
+
+    lexer = FastLexer()
+    lexer.feed(scan(codigo, error=strict_error))
+    return strict_parser().parse(lexer=lexer)
+
+
+# Cache de resultados compartilhado, criado no primeiro uso. A versão inclui
+# os arquivos que definem os tokens, a gramática e os nós.
+def get_cache():
+    global results
+    with build_lock:
+        try:
+            return results
+        except NameError:
+            from scanner import __file__ as scanner_file
+            version = cache.fingerprint(__file__, sys.modules['lexer'].__file__, scanner_file)
+            results = cache.ParseCache(version=version)
+            return results
+
+
+def parse_cached(codigo, store=None):
+    # Como parse, mas consultando o cache de resultados (get_cache() se store
+    # for None). Só programas sem erros vão para o cache; os demais são
+    # analisados com parse, que imprime os erros.
+    store = store or get_cache()
+    return cached(store, store.key(codigo.encode()), lambda: codigo)
+
+
+def parse_file_cached(path, store=None):
+    # Como parse_cached, com o hash calculado direto dos bytes do arquivo.
+    # O texto só é decodificado quando não está no cache.
+    store = store or get_cache()
+    with open(path, 'rb') as file:
+        data = file.read()
+    # Mesma decodificação e tratamento de quebras de linha que open(path)
+    return cached(store, store.key(data), lambda: io.TextIOWrapper(io.BytesIO(data)).read())
+
+
+def cached(store, key, source):
+    ast = store.get(key)
+    if ast is None:
+        codigo = source()
+        try:
+            ast = strict_parse(codigo)
+        except ParseError:
+            return parse(codigo)
+        store.put(key, ast)
+    return ast
+
+
+def parse_file(source):
+    # Como parse, mas lendo os tokens do arquivo (caminho ou objeto de
+    # arquivo) aos poucos, sem ter o código inteiro na memória
+    from scanner import FastLexer
+
+    lexer = FastLexer()
+    lexer.stream(source)
+    local.errors = []
+    try:
+        return thread_parser().parse(lexer=lexer)
+    except ParseError:
+        return None
+
+
+def parse_tokens(tokens, yacc_parser=None):
+    # Como parse, a partir de um scanner.TokenArray: o yacc recebe visões
+    # sobre os vetores em vez de um objeto criado por token. yacc_parser
+    # substitui o parser da thread (profiling usa uma cópia instrumentada).
+    local.errors = []
+    try:
+        return (yacc_parser or thread_parser()).parse(lexer=tokens.lexer())
+    except ParseError:
+        return None
+
 
 if __name__ == '__main__':
 # while True:
@@ -312,6 +590,7 @@ if __name__ == '__main__':
 #         break
 #     if not codigo:
 #         continue
-    codigo = open(sys.argv[1]).read()
-    ast = parser.parse(codigo)
-    print(ast.pretty())
+    ast = parse_file(sys.argv[1])
+    if ast is None:
+        raise SystemExit(1)
+    ast.dump(sys.stdout)
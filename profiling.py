@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+Perfil de uma análise por fase
+
+Uso: python profiling.py arquivo.txt [--all] [--memory]
+
+Profile mede o tempo (relógio e CPU) de cada fase: construção do lexer
+(lex.lex) e do parser (yacc.yacc), lex, parse e check. Também conta os tokens,
+as reduções de cada regra da gramática (ações p_*) e as visitas e o tempo do
+verificador por tipo de nó. Com memory=True (--memory) guarda o pico de
+memória alocada durante cada fase pelo tracemalloc, que deixa tudo mais
+lento: os tempos medidos junto com a memória não servem para comparar.
+semantic.py aceita --profile e --profile-memory e escreve o JSON na saída de
+erro.
+
+Nada é alterado fora de um Profile: as reduções são contadas numa cópia do
+parser com as ações trocadas, e as visitas nos handlers de um Checker só
+dele, então sem perfil não há custo nenhum. report() devolve um dicionário e
+json() o mesmo em JSON. Uso pelo código:
+
+    profile = Profile()
+    ast = profile.parse(codigo)
+    diagnostics = profile.check(ast)
+    print(profile.json())
+
+Fases de outras etapas (vm, transpiler) podem ser medidas com
+`with profile.phase('nome'):`.
+"""
+
+from contextlib import contextmanager
+import copy
+import json
+import os
+import sys
+import time
+import tracemalloc
+from types import GeneratorType
+
+import lexer
+import parser
+from scanner import TokenArray
+import semantic
+
+
+class Profile:
+    def __init__(self, memory=False):
+        self.memory = memory
+        # Nome -> {'wall', 'cpu', 'calls'} e, com memory, 'peak' em bytes
+        self.phases = {}
+        self.tokens = 0
+        # Regra ('statement -> declaration FIM_COMANDO') -> reduções
+        self.reductions = {}
+        # Tipo do nó -> [visitas, segundos]. O tempo é o do próprio handler,
+        # sem o dos filhos, que o verificador visita fora dele. A exceção são
+        # as operações entre dois valores: os valores são visitados dentro do
+        # handler da operação, e o tempo deles entra nos dois tipos.
+        self.visits = {}
+        self.yacc = None
+
+    @contextmanager
+    def phase(self, name):
+        tracing = self.memory and tracemalloc.is_tracing()
+        if self.memory and not tracing:
+            tracemalloc.start()
+        elif tracing:
+            tracemalloc.reset_peak()
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+            entry = self.phases.setdefault(name, {'wall': 0.0, 'cpu': 0.0, 'calls': 0})
+            entry['wall'] += wall
+            entry['cpu'] += cpu
+            entry['calls'] += 1
+            if self.memory:
+                entry['peak'] = max(entry.get('peak', 0), tracemalloc.get_traced_memory()[1])
+                if not tracing:
+                    tracemalloc.stop()
+
+    def parser(self):
+        # Cópia do parser compartilhado com cada ação contando as reduções
+        if self.yacc is None:
+            self.yacc = copy.copy(parser.get_parser())
+            productions = []
+            for production in self.yacc.productions:
+                production = copy.copy(production)
+                if production.callable is not None:
+                    production.callable = self.counted(production.callable, production.str)
+                productions.append(production)
+            self.yacc.productions = productions
+        return self.yacc
+
+    def counted(self, action, rule):
+        reductions = self.reductions
+        reductions[rule] = 0
+
+        def counted_action(p):
+            reductions[rule] += 1
+            action(p)
+        return counted_action
+
+    def instrument(self, checker):
+        # Troca os handlers do checker por versões que contam e medem as visitas
+        for type, handler in checker.handlers.items():
+            checker.handlers[type] = self.timed(handler, type)
+        return checker
+
+    def timed(self, handler, node_type):
+        entry = self.visits.setdefault(node_type, [0, 0.0])
+        clock = time.perf_counter
+
+        def timed_handler(node):
+            entry[0] += 1
+            start = clock()
+            value = handler(node)
+            entry[1] += clock() - start
+            if type(value) is GeneratorType:
+                return resume_timed(value, entry, clock)
+            return value
+        return timed_handler
+
+    # Fases de uma análise
+    def parse(self, codigo):
+        with self.phase('lex.lex'):
+            lexer.get_lexer()
+        with self.phase('yacc.yacc'):
+            self.parser()
+        with self.phase('lex'):
+            source = parser.thread_lexer()
+            source.lineno = 1
+            source.input(codigo)
+            tokens = TokenArray((token.type, token.value, token.lineno, token.lexpos)
+                                for token in iter(source.token, None))
+        self.tokens += len(tokens)
+        with self.phase('parse'):
+            return parser.parse_tokens(tokens, self.parser())
+
+    def parse_file(self, path):
+        with open(path) as file:
+            codigo = file.read()
+        return self.parse(codigo)
+
+    def check(self, ast, collect=False, max_errors=100):
+        checker = self.instrument(semantic.Checker(collect, max_errors))
+        with self.phase('check'):
+            return checker.check(ast)
+
+    def report(self):
+        report = {
+            'phases': self.phases,
+            'tokens': self.tokens,
+            'reductions': {rule: count for rule, count in sorted(self.reductions.items(),
+                                                                 key=lambda item: -item[1]) if count},
+            'visits': {type: {'count': count, 'time': elapsed} for type, (count, elapsed)
+                       in sorted(self.visits.items(), key=lambda item: -item[1][1]) if count},
+        }
+        lex = self.phases.get('lex')
+        if lex and lex['wall']:
+            report['tokens_per_second'] = self.tokens / lex['wall']
+        return report
+
+    def json(self):
+        return json.dumps(self.report(), indent=2, ensure_ascii=False)
+
+
+def resume_timed(generator, entry, clock):
+    # Repassa send e throw ao gerador do handler (o verificador usa os dois),
+    # somando o tempo de cada retomada
+    method, argument = generator.send, None
+    while True:
+        start = clock()
+        try:
+            child = method(argument)
+        except StopIteration as stop:
+            return stop.value
+        finally:
+            entry[1] += clock() - start
+        try:
+            argument = yield child
+            method = generator.send
+        except GeneratorExit:
+            generator.close()
+            raise
+        except BaseException as error:
+            method, argument = generator.throw, error
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    profile = Profile(memory='--memory' in args)
+    ast = profile.parse_file([arg for arg in args if not arg.startswith('--')][0])
+    if ast is not None:
+        profile.check(ast, collect='--all' in args)
+    try:
+        print(profile.json())
+        sys.stdout.flush()
+    except BrokenPipeError:
+        # Saída fechada antes do fim (| head): sem traceback, e sem outro
+        # erro ao fechar sys.stdout na saída do interpretador
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        raise SystemExit(1)
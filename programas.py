@@ -0,0 +1,408 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+Programas de exemplo para os testes e os benchmarks
+
+Geradores de código-fonte (programa_* e, para a suíte de benchmark.py,
+programa_sintetico com as formas de `formas`) e um interpretador ingênuo
+direto sobre o AST (interpreta), referência para comparar a saída de vm.py e
+de transpiler.py.
+"""
+
+import random
+import sys
+
+
+def programa_variaveis(n):
+    # Programa com n declarações, cada uma usando a variável anterior
+    linhas = ['int v0 é 0.']
+    for i in range(1, n):
+        linhas.append('int v{} é v{} mais 1.'.format(i, i - 1))
+    return '\n'.join(linhas) + '\n'
+
+
+def programa_sequencia(n):
+    # Programa com n statements em sequência num único bloco
+    linhas = ['int x é 0.']
+    linhas.extend(['x é x mais 1.'] * (n - 1))
+    return '\n'.join(linhas) + '\n'
+
+
+def programa_blocos(n):
+    # Programa com n blocos se/enquanto/para em sequência
+    linhas = ['int x é 0.', 'lista l é 1 a 10.']
+    for i in range(n):
+        linhas.append('se x é menor que {} então'.format(i))
+        linhas.append('  int a{} é x mais {} vezes 2.'.format(i, i))
+        linhas.append('  x é a{} menos 1.'.format(i))
+        linhas.append('e deu.')
+        linhas.append('enquanto x é maior que {} faça'.format(i))
+        linhas.append('  x é x menos 1.')
+        linhas.append('e deu.')
+        linhas.append('para i em l faça')
+        linhas.append('  mostra i, x.')
+        linhas.append('e deu.')
+    return '\n'.join(linhas) + '\n'
+
+
+def programa_aninhado(profundidade):
+    # Programa com `profundidade` blocos se/enquanto aninhados
+    linhas = ['int x é 0.']
+    for i in range(profundidade):
+        if i % 2:
+            linhas.append('enquanto x é menor que {} faça'.format(i))
+        else:
+            linhas.append('se x é menor que {} então'.format(i))
+        linhas.append('x é x mais 1.')
+    linhas.extend(['e deu.'] * profundidade)
+    return '\n'.join(linhas) + '\n'
+
+
+def programa_laco(n):
+    # Laço numérico com n voltas
+    return '\n'.join([
+        'int i é 0.',
+        'int s é 0.',
+        'enquanto i é menor que {} faça'.format(n),
+        '  s é s mais i vezes 3 menos i dividido por 2.',
+        '  i é i mais 1.',
+        'e deu.',
+        'mostra s.',
+    ]) + '\n'
+
+
+def programa_fib(n):
+    # Fibonacci recursivo: muitas chamadas de função
+    return '\n'.join([
+        'define fib com int n como',
+        '  se n é menor que 2 então',
+        '    retorna n.',
+        '  e deu.',
+        '  retorna (fib com n menos 1) mais (fib com n menos 2).',
+        'e deu.',
+        'mostra fib com {}.'.format(n),
+    ]) + '\n'
+
+
+class Retorno(Exception):
+    def __init__(self, valor):
+        self.valor = valor
+
+
+class Interpretador:
+    # Interpretador ingênuo, direto sobre o AST: recursivo, com as variáveis
+    # em dicionários por escopo e o operador procurado pelo texto. Referência
+    # para comparar com vm.run (mesma semântica e mesma saída).
+    def __init__(self, saida):
+        self.saida = saida
+        self.escopos = [{}]
+        self.funcoes = {}
+
+    def procura(self, nome):
+        for escopo in reversed(self.escopos):
+            if nome in escopo:
+                return escopo
+        raise NameError(nome)
+
+    def executa(self, node):
+        tipo = node.type
+        if tipo in ('program', 'statement_list'):
+            for filho in node.children:
+                self.executa(filho)
+        elif tipo == 'declaration':
+            valor = self.avalia(node.children[1])
+            self.escopos[-1][node.children[0]] = valor
+            if len(node.children) == 3:
+                self.declara(node.children[2])
+        elif tipo == 'null_declaration':
+            nomes = [node.children[0]]
+            if len(node.children) == 2:
+                lista = node.children[1]
+                nomes.append(lista.children[0])
+                while lista.leaf == ',':
+                    lista = lista.children[1]
+                    nomes.append(lista.children[0])
+            for nome in nomes:
+                self.escopos[-1][nome] = [] if node.leaf == 'lista' else \
+                    {'int': 0, 'real': 0.0, 'texto': '', 'boolean': False}[node.leaf]
+        elif tipo == 'assignment':
+            if node.leaf == ',':
+                self.executa(node.children[0])
+                self.executa(node.children[1])
+            else:
+                valor = self.avalia(node.children[1])
+                self.procura(node.children[0])[node.children[0]] = valor
+        elif tipo == 'if_statement':
+            if self.avalia(node.children[0]):
+                self.bloco(node.children[1])
+            elif node.leaf == 'if/else':
+                self.bloco(node.children[2])
+            elif node.leaf == 'if/elseif':
+                self.executa(node.children[2])
+        elif tipo == 'block':
+            self.bloco(node.children[0])
+        elif tipo == 'while_loop':
+            while self.avalia(node.children[0]):
+                self.bloco(node.children[1])
+        elif tipo == 'for_loop':
+            for item in self.avalia(node.children[1]):
+                self.escopos.append({node.children[0]: item})
+                try:
+                    self.executa(node.children[2])
+                finally:
+                    self.escopos.pop()
+        elif tipo == 'function_declaration':
+            self.funcoes[node.leaf] = node
+        elif tipo == 'return':
+            raise Retorno(self.avalia(node.children[0]))
+        elif tipo == 'print_statement':
+            from vm import parameters, show
+            valores = [self.avalia(valor) for valor in parameters(node.children[0])]
+            self.saida.write(' '.join(show(valor) for valor in valores) + '\n')
+        else:
+            self.avalia(node)
+
+    def declara(self, node):
+        if node.leaf == ',':
+            self.declara(node.children[0])
+            self.declara(node.children[1])
+        else:
+            self.escopos[-1][node.children[0]] = self.avalia(node.children[1])
+
+    def bloco(self, node):
+        self.escopos.append({})
+        try:
+            self.executa(node)
+        finally:
+            self.escopos.pop()
+
+    def avalia(self, node):
+        tipo = node.type
+        if tipo == 'value':
+            valor = node.children[0]
+            if node.leaf == 'id':
+                return self.procura(valor)[valor]
+            if node.leaf == 'texto':
+                return valor[1:-1]
+            if node.leaf == 'boolean':
+                return valor == 'verdadeiro'
+            if node.leaf in ('increment', 'decrement'):
+                escopo = self.procura(valor)
+                escopo[valor] += 1 if node.leaf == 'increment' else -1
+                return escopo[valor]
+            return valor
+        if tipo in ('bin_op', 'boolean_exp'):
+            a = self.avalia(node.children[0])
+            b = self.avalia(node.children[1])
+            operador = ' '.join(node.leaf.split())
+            if operador == 'mais':
+                return a + b
+            if operador == 'menos':
+                return a - b
+            if operador == 'vezes':
+                return a * b
+            if operador == 'dividido por':
+                return a // b if type(a) is int and type(b) is int else a / b
+            if operador == 'na':
+                return a ** b
+            if operador == 'menor que':
+                return a < b
+            if operador == 'maior que':
+                return a > b
+            if operador == 'menor ou igual a':
+                return a <= b
+            if operador == 'maior ou igual a':
+                return a >= b
+            if operador == 'igual a':
+                return a == b
+            if operador == 'diferente de':
+                return a != b
+            if operador == 'e':
+                return a and b
+            if operador == 'ou':
+                return a or b
+            return a and not b
+        if tipo == 'function_call':
+            from vm import parameters
+            funcao = self.funcoes[node.leaf]
+            argumentos = [self.avalia(valor) for valor in parameters(node.children[0])]
+            escopo = {}
+            if len(funcao.children) == 2:
+                pendentes = [funcao.children[0]]
+                nomes = []
+                while pendentes:
+                    args = pendentes.pop()
+                    if args.leaf == 'single_argument':
+                        nomes.append(args.children[0])
+                    else:
+                        pendentes.extend(reversed(args.children))
+                escopo = dict(zip(nomes, argumentos))
+            # As funções veem só os próprios escopos
+            externos = self.escopos
+            self.escopos = [escopo]
+            try:
+                self.executa(funcao.children[-1])
+            except Retorno as retorno:
+                return retorno.valor
+            finally:
+                self.escopos = externos
+            return None
+        if tipo == 'index':
+            nome, indice = node.children
+            indice = indice[1:-1]
+            return self.procura(nome)[nome][int(indice) if indice.isdigit() else self.procura(indice)[indice]]
+        if tipo == 'append':
+            valor = self.avalia(node.children[0])
+            lista = self.procura(node.children[1])[node.children[1]]
+            lista.append(valor)
+            return lista
+        if tipo == 'iterable':
+            return list(range(node.children[0], node.children[1] + 1))
+        raise ValueError(tipo)
+
+
+def interpreta(ast, saida):
+    limite = sys.getrecursionlimit()
+    sys.setrecursionlimit(max(limite, 100000))
+    try:
+        Interpretador(saida).executa(ast)
+    except Retorno:
+        pass
+    finally:
+        sys.setrecursionlimit(limite)
+
+
+def conta_nos(ast):
+    from parser import Node
+
+    total = 0
+    pendentes = [ast]
+    while pendentes:
+        node = pendentes.pop()
+        total += 1
+        pendentes.extend(child for child in node.children if isinstance(child, Node))
+    return total
+
+
+def programa_constantes(n):
+    # Programa com n blocos cheios de expressões constantes e ramos mortos
+    linhas = ['int x é 0.']
+    for i in range(n):
+        linhas.append('int c{} é {} mais 2 vezes 3 menos 10 dividido por 2.'.format(i, i))
+        linhas.append('se 1 é maior que 2 então')
+        linhas.append('  x é x mais 1000.')
+        linhas.append('tá bom então')
+        linhas.append('  x é x mais c{} vezes (4 menos 3).'.format(i))
+        linhas.append('e deu.')
+        linhas.append('enquanto 3 é menor que 2 faça')
+        linhas.append('  x é x menos 1.')
+        linhas.append('e deu.')
+        linhas.append('se x é maior que {} mais 1 então'.format(i))
+        linhas.append('  x é x menos 1.')
+        linhas.append('e deu.')
+    linhas.append('mostra x.')
+    return '\n'.join(linhas) + '\n'
+
+
+# Gerador de programas válidos para a suíte. Cada forma recebe o tamanho e um
+# random.Random com semente fixa, então o mesmo tamanho gera sempre o mesmo
+# programa.
+operadores_aritmeticos = ['mais', 'menos', 'vezes', 'dividido por']
+comparacoes = ['é menor que', 'é maior que', 'é menor ou igual a', 'é maior ou igual a',
+               'é igual a', 'é diferente de']
+
+
+def gera_plano(n, rnd):
+    # Lista longa de statements simples num único bloco
+    linhas = ['int v0 é 1.']
+    for i in range(1, n):
+        j = rnd.randrange(i)
+        escolha = rnd.random()
+        if escolha < 0.5:
+            linhas.append('int v{} é v{} {} {}.'.format(i, j, rnd.choice(operadores_aritmeticos), rnd.randint(1, 99)))
+        elif escolha < 0.8:
+            linhas.append('int v{} é {}.'.format(i, rnd.randint(0, 999)))
+            linhas.append('v{} é v{} mais v{}.'.format(j, j, i))
+        else:
+            linhas.append('int v{} é v{}.'.format(i, j))
+            linhas.append('mostra v{}, v{}.'.format(i, j))
+    return '\n'.join(linhas) + '\n'
+
+
+def gera_aninhado(n, rnd):
+    # se/enquanto aninhados até a profundidade n
+    linhas = ['int x é 0.']
+    for i in range(n):
+        condicao = 'x {} {}'.format(rnd.choice(comparacoes), rnd.randint(0, 99))
+        if rnd.random() < 0.5:
+            linhas.append('se {} então'.format(condicao))
+        else:
+            linhas.append('enquanto {} faça'.format(condicao))
+        linhas.append('x é x {} {}.'.format(rnd.choice(['mais', 'menos']), rnd.randint(1, 9)))
+    linhas.extend(['e deu.'] * n)
+    return '\n'.join(linhas) + '\n'
+
+
+def gera_funcoes(n, rnd):
+    # n funções com dois parâmetros e 10 chamadas por função, cada uma
+    # chamando funções já declaradas
+    linhas = []
+    for i in range(n):
+        linhas.append('define f{} com int p, int q como'.format(i))
+        linhas.append('  int t é p {} q mais {}.'.format(rnd.choice(operadores_aritmeticos), i))
+        if i and rnd.random() < 0.5:
+            linhas.append('  t é t mais (f{} com p, {}).'.format(rnd.randrange(i), rnd.randint(1, 9)))
+        linhas.append('  retorna t.')
+        linhas.append('e deu.')
+    for i in range(n * 10):
+        linhas.append('int c{} é (f{} com {}, {}) mais (f{} com {}, {}).'.format(
+            i, rnd.randrange(n), rnd.randint(0, 99), rnd.randint(0, 99),
+            rnd.randrange(n), rnd.randint(0, 99), rnd.randint(0, 99)))
+    return '\n'.join(linhas) + '\n'
+
+
+def gera_listas(n, rnd):
+    # Listas com intervalos, bota, índices e laços para
+    linhas = ['int i é 0.']
+    for k in range(n):
+        linhas.append('lista l{} é 1 a {}.'.format(k, rnd.randint(5, 50)))
+        linhas.append('lista m{}.'.format(k))
+        for _ in range(rnd.randint(1, 4)):
+            linhas.append('bota {} em m{}.'.format(rnd.randint(0, 99), k))
+        linhas.append('para item em l{} faça'.format(k))
+        linhas.append('  bota item vezes 2 em m{}.'.format(k))
+        linhas.append('e deu.')
+        linhas.append('mostra m{}, l{}[{}], m{}[i].'.format(k, k, rnd.randint(0, 4), k))
+    return '\n'.join(linhas) + '\n'
+
+
+def gera_expressoes(n, rnd, termos=20):
+    # Expressões longas com operadores de várias palavras ('dividido por',
+    # 'é maior ou igual a', ...)
+    linhas = ['int e0 é 1.']
+    for i in range(1, n):
+        partes = [str(rnd.randint(1, 99))]
+        for _ in range(termos):
+            operando = 'e{}'.format(rnd.randrange(i)) if rnd.random() < 0.4 else str(rnd.randint(1, 99))
+            partes.append('{} {}'.format(rnd.choice(operadores_aritmeticos), operando))
+        linhas.append('int e{} é {}.'.format(i, ' '.join(partes)))
+        linhas.append('se e{} {} e{} dividido por {} então'.format(i, rnd.choice(comparacoes),
+                                                                   rnd.randrange(i), rnd.randint(1, 9)))
+        linhas.append('  e{} é e{} vezes 2.'.format(i, i))
+        linhas.append('e deu.')
+    return '\n'.join(linhas) + '\n'
+
+
+# Forma -> (gerador, tamanho na escala 1)
+formas = {
+    'plano': (gera_plano, 5000),
+    'aninhado': (gera_aninhado, 1000),
+    'funcoes': (gera_funcoes, 300),
+    'listas': (gera_listas, 600),
+    'expressoes': (gera_expressoes, 300),
+}
+
+
+def programa_sintetico(forma, n, semente=0):
+    gerador, _ = formas[forma]
+    return gerador(n, random.Random(semente))
@@ -0,0 +1,470 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+Analisador lexico alternativo, sem PLY
+
+Gera os mesmos tokens (tipo, valor, linha e posição) que as regras de lexer.py,
+mas com uma única expressão regular pré-compilada. As expressões de várias
+palavras ('é maior ou igual a', 'dividido por', ...) ficam numa trie que é
+convertida em um trecho da expressão regular com os prefixos em comum
+fatorados. Palavras reservadas são resolvidas pelo dicionário `reserved`.
+
+TokenArray guarda uma sequência de tokens em vetores (tipo, posição, linha e
+índice do valor), com os valores numa tabela sem repetições, em vez de um
+objeto por token. TokenArray.lexer() alimenta o yacc com visões sobre os
+vetores, criadas só quando o parser pede o token.
+
+TokenArray.scan_parallel divide textos grandes em pedaços nas quebras de
+linha seguras e analisa os pedaços num pool de processos, com o mesmo
+resultado de TokenArray.scan.
+"""
+
+from array import array
+import os
+import re
+from sys import intern
+
+from lexer import reserved, tokens as token_names
+
+
+# Expressões de várias palavras, na ordem das regras de lexer.py. Entre as
+# palavras vai \s+, exceto em 'e deu', que aceita exatamente um espaço.
+phrases = [
+    ('DIVIDIDO', ['dividido', 'por']),
+    ('DEU', ['e', 'deu']),
+    ('ELEVADO', ['na']),
+    ('DIFERENTE', ['é', 'diferente', 'de']),
+    ('MAIOR_IGUAL', ['é', 'maior', 'ou', 'igual', 'a']),
+    ('MENOR_IGUAL', ['é', 'menor', 'ou', 'igual', 'a']),
+    ('IGUAL', ['é', 'igual', 'a']),
+    ('MAIOR_QUE', ['é', 'maior', 'que']),
+    ('MENOR_QUE', ['é', 'menor', 'que']),
+    ('TA_BOM', ['tá', 'bom']),
+]
+single_space = {'DEU'}
+
+
+def build_trie(phrases):
+    # Cada nó é um dicionário palavra -> nó; a chave None guarda o tipo do token
+    trie = {}
+    for type, words in phrases:
+        node = trie
+        for word in words:
+            node = node.setdefault(word, {})
+        node[None] = type
+    return trie
+
+
+def trie_pattern(node):
+    # Converte a trie em alternativas com os prefixos fatorados
+    alternatives = []
+    for word, child in node.items():
+        if word is None:
+            continue
+        if None in child:
+            alternatives.append(re.escape(word))
+        else:
+            separator = r'\s' if all(t in single_space for t in leaves(child)) else r'\s+'
+            alternatives.append('{}{}{}'.format(re.escape(word), separator, trie_pattern(child)))
+    return '(?:{})'.format('|'.join(alternatives))
+
+
+def leaves(node):
+    for word, child in node.items():
+        if word is None:
+            yield child
+        else:
+            yield from leaves(child)
+
+
+# Cada match consome os espaços e comentários ignorados e um token, na mesma
+# ordem de tentativa do lexer do PLY: expressões de várias palavras, números,
+# texto, índice, identificador e pontuação. Os grupos são (ignorado, expressão,
+# token, caractere ilegal), então os matches são contíguos e findall devolve
+# tudo o que é preciso para calcular as posições sem criar objetos Match.
+master = re.compile(r'((?:[ \r\t]+|\#.*)*)(?:(' + trie_pattern(build_trie(phrases)) + ')|(' + '|'.join([
+    r'\d+,\d+|,\d+',
+    r'[0-9]+',
+    r'"[A-Za-z !#,$%&*+-~|:@¨¬\w]*"',
+    r'\[[a-zA-Z_\w*][a-zA-Z_0-9\w*]*\]|\[[0-9]+\]',
+    r'[a-zA-Z_\w*][a-zA-Z_0-9\w*]*',
+    r'[.\n(),]',
+]) + r')|(.)|\Z)')
+
+# Tipo das expressões de várias palavras, com as palavras separadas por um espaço
+phrase_types = {' '.join(words): type for type, words in phrases}
+
+# Tokens de texto fixo: palavras reservadas e pontuação. A quebra de linha não
+# gera token, só conta a linha.
+fixed = dict(reserved)
+fixed.update({'.': 'FIM_COMANDO', '(': 'ABRE_PAR', ')': 'FECHA_PAR', ',': 'VIRGULA', '\n': None})
+
+# Tamanho aproximado dos trechos passados a findall
+chunk_size = 1 << 16
+# Tamanho mínimo dos pedaços de TokenArray.scan_parallel
+parallel_chunk_size = 1 << 20
+
+# Quebra de linha precedida por um caractere que não termina palavra: nenhuma
+# expressão de várias palavras passa por ela, então o texto pode ser cortado ali
+boundary = re.compile(r'[^\w\s]\s*?\n')
+word = re.compile(r'\w')
+
+
+def report_error(char, lineno, lexpos):
+    print('Caractere ilegal na linha {}: {}'.format(lineno, char))
+
+
+def cut(data, pos, end):
+    # Fim do trecho que começa em pos: logo depois de uma quebra de linha
+    # segura a partir de pos + chunk_size, ou end
+    if end - pos <= chunk_size:
+        return end
+    m = boundary.search(data, pos + chunk_size, end)
+    return m.end() if m else end
+
+
+def last_cut(data, start=0):
+    # Posição logo depois da última quebra de linha segura de data[start:], ou 0
+    newline = data.rfind('\n', start)
+    while newline >= start:
+        before = newline - 1
+        while before >= 0 and data[before].isspace():
+            before -= 1
+        if before < 0 or not word.match(data, before):
+            return newline + 1
+        newline = data.rfind('\n', start, before)
+    return 0
+
+
+def scan(data, lineno=1, pos=0, end=None, error=report_error, offset=0):
+    # Gera tuplas (tipo, valor, linha, posição) a partir de data[pos:end].
+    # offset é somado às posições, para quando data é um pedaço de um texto
+    # maior; o valor de retorno do gerador é o número da linha no final.
+    get = fixed.get
+    if end is None:
+        end = len(data)
+    while pos < end:
+        stop = cut(data, pos, end)
+        for ignored, phrase, text, illegal in master.findall(data, pos, stop):
+            pos += len(ignored)
+            if text:
+                kind = get(text, '')
+                if kind:
+                    yield kind, text, lineno, pos + offset
+                elif kind is None:
+                    lineno += 1
+                elif text[0] == '"':
+                    yield 'TEXTO_RAW', intern(text), lineno, pos + offset
+                elif ',' in text:
+                    yield 'NUM_REAL', float(text.replace(',', '.')), lineno, pos + offset
+                elif text[0] in '0123456789':
+                    yield 'NUM_INTEIRO', int(text), lineno, pos + offset
+                elif text[0] == '[':
+                    yield 'INDICE', intern(text), lineno, pos + offset
+                else:
+                    yield 'ID', intern(text), lineno, pos + offset
+                pos += len(text)
+            elif phrase:
+                yield phrase_types[' '.join(phrase.split())], phrase, lineno, pos + offset
+                pos += len(phrase)
+            elif illegal:
+                error(illegal, lineno, pos + offset)
+                pos += 1
+        pos = stop
+    return lineno
+
+
+def tokenize(source, lineno=1, error=report_error):
+    # Como scan, mas lendo um arquivo (caminho ou objeto de arquivo) aos
+    # poucos. Só é analisado o texto até a última quebra de linha segura do
+    # buffer; o resto espera o próximo pedaço, então tokens que cruzam o fim
+    # de um pedaço ('é menor ou igual a', textos) saem inteiros. A memória
+    # usada depende do tamanho dos pedaços, não do arquivo.
+    if isinstance(source, (str, bytes, os.PathLike)):
+        with open(source) as file:
+            return (yield from tokenize(file, lineno, error))
+    buffer = ''
+    offset = 0
+    while True:
+        chunk = source.read(chunk_size)
+        # Quebras de linha do que já estava no buffer não são seguras
+        start = len(buffer)
+        buffer += chunk
+        stop = last_cut(buffer, start) if chunk else len(buffer)
+        if stop:
+            lineno = yield from scan(buffer, lineno, 0, stop, error, offset)
+            buffer = buffer[stop:]
+            offset += stop
+        if not chunk:
+            return lineno
+
+
+class Token:
+    # Mesmos atributos que o LexToken do PLY usa com o yacc
+    __slots__ = ('type', 'value', 'lineno', 'lexpos', 'lexer')
+
+    def __init__(self, type, value, lineno, lexpos, lexer=None):
+        self.type = type
+        self.value = value
+        self.lineno = lineno
+        self.lexpos = lexpos
+        self.lexer = lexer
+
+    def __str__(self):
+        return 'LexToken(%s,%r,%d,%d)' % (self.type, self.value, self.lineno, self.lexpos)
+
+    __repr__ = __str__
+
+
+class TokenArray:
+    # Tokens em vetores: tipos (índice em token_names) em array('H'), posições
+    # e linhas em array('I') e o índice do valor em array('I'). Valores iguais
+    # ocupam uma posição só em `table`.
+    names = token_names
+    type_ids = {name: index for index, name in enumerate(token_names)}
+
+    def __init__(self, tokens=()):
+        self.types = array('H')
+        self.offsets = array('I')
+        self.lines = array('I')
+        self.values = array('I')
+        self.table = []
+        # Valor -> posição em table. Números entram com o tipo na chave
+        # (1 == 1.0 no dicionário); textos, como eles mesmos.
+        self.value_ids = {}
+        self.extend(tokens)
+
+    @classmethod
+    def scan(cls, data, error=report_error):
+        return cls(scan(data, error=error))
+
+    @classmethod
+    def stream(cls, source, error=report_error):
+        # Lê o arquivo aos poucos com tokenize; só os vetores ficam na memória
+        return cls(tokenize(source, error=error))
+
+    @classmethod
+    def scan_parallel(cls, data, workers=None, error=report_error):
+        # Como scan, com os pedaços de data (ver split) analisados por um
+        # pool de processos. Os erros léxicos são repassados a error depois,
+        # na ordem do texto.
+        workers = workers or os.cpu_count() or 1
+        size = max(parallel_chunk_size, len(data) // (workers * 4) + 1)
+        if workers == 1 or len(data) <= size:
+            return cls.scan(data, error)
+        from concurrent.futures import ProcessPoolExecutor
+
+        chunks = split(data, size)
+        tokens = cls()
+        # Linhas antes do pedaço atual
+        shift = 0
+        with ProcessPoolExecutor(min(workers, len(chunks))) as pool:
+            for vectors, errors, lines in pool.map(scan_chunk, [(data[start:end], start) for start, end in chunks]):
+                tokens.merge(*vectors, shift)
+                for char, lineno, lexpos in errors:
+                    error(char, lineno + shift, lexpos)
+                shift += lines
+        return tokens
+
+    def extend(self, tokens):
+        # Acrescenta tuplas (tipo, valor, linha, posição)
+        type_ids, value_ids, table = self.type_ids, self.value_ids, self.table
+        add_type, add_offset = self.types.append, self.offsets.append
+        add_line, add_value = self.lines.append, self.values.append
+        for type, value, lineno, lexpos in tokens:
+            key = value if value.__class__ is str else (value.__class__, value)
+            index = value_ids.get(key)
+            if index is None:
+                index = value_ids[key] = len(table)
+                table.append(value)
+            add_type(type_ids[type])
+            add_offset(lexpos)
+            add_line(lineno)
+            add_value(index)
+
+    def merge(self, types, offsets, lines, values, table, shift=0):
+        # Acrescenta os vetores de outro TokenArray, trocando os índices da
+        # tabela dele pelos desta e somando shift às linhas
+        value_ids, own = self.value_ids, self.table
+        remap = []
+        for value in table:
+            if value.__class__ is str:
+                key = value = intern(value)
+            else:
+                key = (value.__class__, value)
+            index = value_ids.get(key)
+            if index is None:
+                index = value_ids[key] = len(own)
+                own.append(value)
+            remap.append(index)
+        self.types.extend(types)
+        self.offsets.extend(offsets)
+        self.lines.extend(map(shift.__add__, lines) if shift else lines)
+        if remap == list(range(len(remap))):
+            # Mesmos índices (sempre o caso no primeiro pedaço)
+            self.values.extend(values)
+        else:
+            self.values.extend(map(remap.__getitem__, values))
+
+    def __len__(self):
+        return len(self.types)
+
+    def __getitem__(self, index):
+        return (self.names[self.types[index]], self.table[self.values[index]],
+                self.lines[index], self.offsets[index])
+
+    def __iter__(self):
+        names, table = self.names, self.table
+        for type, value, lineno, lexpos in zip(self.types, self.values, self.lines, self.offsets):
+            yield names[type], table[value], lineno, lexpos
+
+    def nbytes(self):
+        # Memória dos vetores e da tabela de valores (sem o dicionário usado
+        # para montar a tabela)
+        import sys
+
+        total = sum(vector.itemsize * len(vector) for vector in (self.types, self.offsets, self.lines, self.values))
+        return total + sys.getsizeof(self.table) + sum(sys.getsizeof(value) for value in self.table)
+
+    def lexer(self):
+        return ArrayLexer(self)
+
+
+def split(data, size):
+    # Pedaços (início, fim) de uns size caracteres, cortados em quebras de
+    # linha seguras (boundary): textos e comentários não passam de uma linha
+    # e expressões de várias palavras não passam por elas, então cada pedaço
+    # é analisado sozinho com os mesmos tokens.
+    chunks = []
+    start = 0
+    while start < len(data):
+        m = boundary.search(data, start + size) if start + size < len(data) else None
+        end = m.end() if m else len(data)
+        chunks.append((start, end))
+        start = end
+    return chunks
+
+
+def scan_chunk(chunk):
+    # Roda num processo do pool: vetores, erros léxicos e linhas de um
+    # pedaço, contando da linha 1. As quebras de linha dentro de expressões
+    # de várias palavras não contam como linha, então a linha em que cada
+    # pedaço começa só se sabe somando as linhas dos anteriores.
+    text, offset = chunk
+    errors = []
+    end = []
+
+    def tokens():
+        end.append((yield from scan(text, 1, error=lambda *args: errors.append(args), offset=offset)))
+    array = TokenArray(tokens())
+    return (array.types, array.offsets, array.lines, array.values, array.table), errors, end[0] - 1
+
+
+class TokenView:
+    # Token lido de um TokenArray. O yacc lê o tipo de todo token, então ele
+    # já vem pronto; valor, linha e posição são lidos dos vetores quando
+    # acessados. O yacc só guarda o token enquanto ele está na pilha.
+    __slots__ = ('type', 'tokens', 'index')
+
+    # O yacc só atribui lexer a tokens que não têm o atributo
+    lexer = None
+
+    def __init__(self, type, tokens, index):
+        self.type = type
+        self.tokens = tokens
+        self.index = index
+
+    @property
+    def value(self):
+        return self.tokens.table[self.tokens.values[self.index]]
+
+    @property
+    def lineno(self):
+        return self.tokens.lines[self.index]
+
+    @property
+    def lexpos(self):
+        return self.tokens.offsets[self.index]
+
+    def __str__(self):
+        return 'LexToken(%s,%r,%d,%d)' % (self.type, self.value, self.lineno, self.lexpos)
+
+    __repr__ = __str__
+
+
+class ArrayLexer:
+    # Interface do lexer usada pelo yacc, sobre um TokenArray
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.position = 0
+        self.lexdata = ''
+        self.lexpos = 0
+        self.lineno = 1
+
+    def input(self, data):
+        self.tokens = TokenArray.scan(data)
+        self.position = 0
+
+    def token(self):
+        position = self.position
+        tokens = self.tokens
+        if position < len(tokens.types):
+            self.position = position + 1
+            return TokenView(tokens.names[tokens.types[position]], tokens, position)
+        if position:
+            self.lineno = self.tokens.lines[position - 1]
+            self.lexpos = self.tokens.offsets[position - 1]
+        return None
+
+
+class FastLexer:
+    # Mesma interface do lexer do PLY usada por lexer.py e pelo yacc
+    def __init__(self):
+        self.lexdata = ''
+        self.lexpos = 0
+        self.lineno = 1
+        self._tokens = iter(())
+
+    def input(self, data):
+        self.lexdata = data
+        self.lexpos = 0
+        self._tokens = scan(data, self.lineno, error=self._error)
+
+    def stream(self, source):
+        # Como input, mas lendo os tokens de um arquivo com tokenize
+        self.lexdata = ''
+        self.lexpos = 0
+        self._tokens = tokenize(source, self.lineno, error=self._error)
+
+    def feed(self, tokens):
+        # Como input, mas com tuplas (tipo, valor, linha, posição) já prontas
+        self.lexdata = ''
+        self.lexpos = 0
+        self._tokens = iter(tokens)
+
+    def clone(self):
+        # Lexer novo com a mesma contagem de linhas, para outra análise
+        lexer = FastLexer()
+        lexer.lineno = self.lineno
+        return lexer
+
+    def _error(self, char, lineno, lexpos):
+        self.lineno = lineno
+        report_error(char, lineno, lexpos)
+
+    def token(self):
+        for type, value, lineno, lexpos in self._tokens:
+            self.lineno = lineno
+            self.lexpos = lexpos
+            return Token(type, value, lineno, lexpos, self)
+        self.lexpos = len(self.lexdata)
+        return None
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        token = self.token()
+        if token is None:
+            raise StopIteration
+        return token
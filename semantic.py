@@ -1,362 +1,624 @@
 #!/usr/bin/env python3
 # -*- coding:utf-8 -*-
 
-from ply import yacc
-from parser import parser
-from lexer import lexer
+from parser import parse_file, syntax_errors
+from symbol_table import SymbolTable
+from types import GeneratorType
 import sys
 
-scope = []
-codigo = open(sys.argv[1]).read()
-ast = parser.parse(codigo)
-declaration = False # Flag para ser usada em caso de múltiplas declarações
-function_flag = 0 # Flag para ser usada na verificação do escopo interno de funções
-
 # Tipos que estão na mesma lista executam as mesmas operações
 r1 = ['statement_list', 'print_statement', 'parameter']
-r2 = ['program']
-
-
-# Nós que são apenas 'containers' de outros nós
-def routine1(node):
-    for child in node.children:
-        visit(child)
-    return
-
-# Operações que abrem um novo escopo
-def routine2(node):
-    # Inicia um novo escopo na lista de escopo
-    scope.append(None)
-    for child in node.children:
-        visit(child)
-    # Desmonta o escopo
-    while scope.pop():
+r2 = ['program', 'block']
+
+# Tipos de retorno que a pilha de visita retoma depois de visitar os filhos
+resumable = {GeneratorType, type(iter([])), type(iter(()))}
+
+# Regras de tipo das operações: (operações, tipo da esquerda, tipo da direita,
+# tipo do resultado). Combinações que não estão aqui são erro. None é o tipo
+# de expressões sem tipo conhecido (índices de lista), que aceitam tudo.
+arithmetic = ('mais', 'menos', 'vezes', 'dividido por', 'na')
+ordering = ('maior que', 'menor que', 'maior ou igual a', 'menor ou igual a')
+equality = ('igual a', 'diferente de')
+logical = ('e', 'ou', 'nao')
+op_rules = [
+    (arithmetic, 'int', 'int', 'int'),
+    (arithmetic, 'real', 'real', 'real'),
+    (arithmetic, 'int', 'real', 'real'),
+    (arithmetic, 'real', 'int', 'real'),
+    (ordering + equality, 'int', 'int', 'boolean'),
+    (ordering + equality, 'real', 'real', 'boolean'),
+    # Entre int e real os operadores lógicos também resultam em boolean
+    (ordering + equality + logical, 'int', 'real', 'boolean'),
+    (ordering + equality + logical, 'real', 'int', 'boolean'),
+    (ordering + equality + logical, 'boolean', 'boolean', 'boolean'),
+    (('mais',), 'texto', 'texto', 'texto'),
+    (equality, 'texto', 'texto', 'boolean'),
+    (('mais',), 'lista', 'lista', 'lista'),
+    (equality, 'lista', 'lista', 'boolean'),
+    (arithmetic, None, None, None),
+    (ordering + equality + logical, None, None, 'boolean'),
+]
+
+
+def compile_rules(rules):
+    # (operação, tipo da esquerda, tipo da direita) -> tipo do resultado
+    table = {}
+    for operations, left, right, result in rules:
+        for operation in operations:
+            table[operation, left, right] = result
+    return table
+
+op_types = compile_rules(op_rules)
+typed = {left for operations, left, right, result in op_rules if left is not None}
+
+# Tipo de retorno de uma função enquanto o corpo dela é verificado: uma
+# chamada recursiva antes do primeiro retorno ainda não tem tipo, e esse tipo
+# combina com qualquer outro
+unknown = 'desconhecido'
+
+
+def matches(expected, actual):
+    return expected == actual or expected == unknown or actual == unknown
+
+
+def operation_type(operation, left, right, line=None):
+    # Tipo do resultado de uma operação, ou SemanticError
+    try:
+        return op_types[operation, left, right]
+    except KeyError:
         pass
-    return
-
-def visit(node):
-    global declaration, function_flag, last_function
-
-    # Tipos pertencentes a r1
-    if node.type in r1:
-        routine1(node)
-
-    # Tipos pertencentes a r2
-    elif node.type in r2:
-        routine2(node)
-
-    elif node.type == 'bin_op':
-        types = []
+    # Operador com outros espaços ('dividido  por')
+    operation = ' '.join(operation.split())
+    if (operation, left, right) in op_types:
+        return op_types[operation, left, right]
+    if left == unknown or right == unknown:
+        return 'boolean' if operation in ordering + equality + logical else unknown
+    if left != right:
+        raise SemanticError(Diagnostic(line, "Linha {}: Tipos incompatíveis para a operação '{}', {} e {}.".format(
+            line, operation, left, right)))
+    if left not in typed:
+        # Tipo sem regras próprias: como None, mas a aritmética mantém o tipo
+        result = op_types.get((operation, None, None), left)
+        return left if result is None else result
+    raise SemanticError(Diagnostic(line, "Operação inválida para o tipo {} na linha {}: {}.".format(left, line, operation)))
+
+
+class Diagnostic:
+    __slots__ = ('line', 'message', 'fatal')
+
+    def __init__(self, line, message, fatal=True):
+        self.line = line
+        self.message = message
+        # Erros fatais interrompem a verificação
+        self.fatal = fatal
+
+    def __str__(self):
+        return self.message
+
+    def __repr__(self):
+        return 'Diagnostic({!r}, {!r})'.format(self.line, self.message)
+
+
+class SemanticError(Exception):
+    # Interrompe a verificação; Checker.check devolve o diagnóstico
+    def __init__(self, diagnostic):
+        Exception.__init__(self, diagnostic.message)
+        self.diagnostic = diagnostic
+
+
+class TooManyErrors(Exception):
+    # A verificação que coleta todos os erros chegou ao limite de diagnósticos
+    pass
+
+
+# Todo o estado de uma verificação fica na instância, então verificações
+# diferentes podem rodar ao mesmo tempo em threads separadas
+class Checker:
+    # Com collect=True um erro fatal interrompe só o statement em que aparece:
+    # o erro é registrado e a verificação continua no statement seguinte, até
+    # max_errors diagnósticos.
+    def __init__(self, collect=False, max_errors=100):
+        self.collect = collect
+        self.max_errors = max_errors
+        self.scope = SymbolTable()
+        self.declaration = False # Flag para ser usada em caso de múltiplas declarações
+        self.function_flag = 0 # Flag para ser usada na verificação do escopo interno de funções
+        self.last_function = None # Resumo da função cujo corpo está sendo verificado
+        self.function_base = 0 # Escopo mais externo visível dentro da função atual
+        self.diagnostics = []
+        # Tabela de despacho: tipo do nó -> método que trata o nó
+        self.handlers = {
+            'bin_op': self.visit_operation,
+            'boolean_exp': self.visit_operation,
+            'declaration': self.visit_declaration,
+            'null_declaration': self.visit_null_declaration,
+            'id_list': self.visit_id_list,
+            'value': self.visit_value,
+            'assignment': self.visit_assignment,
+            'while_loop': self.visit_while_loop,
+            'for_loop': self.visit_for_loop,
+            'function_declaration': self.visit_function_declaration,
+            'function_call': self.visit_function_call,
+            'args': self.visit_args,
+            'index': self.visit_index,
+            'append': self.visit_append,
+            'read': self.visit_read,
+            'iterable': self.visit_iterable,
+            'if_statement': self.visit_if_statement,
+            'return': self.visit_return,
+        }
+        # Tipos pertencentes a r1
+        self.handlers.update(dict.fromkeys(r1, self.routine1))
+        # Tipos pertencentes a r2
+        self.handlers.update(dict.fromkeys(r2, self.routine2))
+        if collect:
+            self.handlers['statement_list'] = self.statements
+            self.handlers['program'] = self.program
+
+    def check(self, ast):
+        # Verifica o programa e devolve a lista de diagnósticos (vazia se não
+        # houver erros). Sem collect, um erro fatal encerra a verificação e é
+        # o último da lista.
+        try:
+            self.visit(ast)
+        except SemanticError as error:
+            self.diagnostics.append(error.diagnostic)
+        except TooManyErrors:
+            self.diagnostics.append(Diagnostic(None, 'Muitos erros, verificação interrompida.'))
+        return self.diagnostics
+
+    def error(self, line, message):
+        # Erro fatal
+        raise SemanticError(Diagnostic(line, message))
+
+    def warning(self, line, message):
+        # Erro que não interrompe a verificação
+        self.report(Diagnostic(line, message, fatal=False))
+
+    def report(self, diagnostic):
+        self.diagnostics.append(diagnostic)
+        if self.collect and len(self.diagnostics) >= self.max_errors:
+            raise TooManyErrors()
+
+    # O verificador não usa a pilha do Python para descer na árvore: cada nó é
+    # tratado por um método da tabela `handlers`. Nós folha retornam o tipo
+    # direto; os demais são geradores que fazem `yield filho` para pedir a visita
+    # de um filho e recebem de volta o tipo dele. Nós que só agrupam outros nós
+    # retornam um iterador sobre os filhos, que a pilha percorre sem gerador.
+    # No modo collect um SemanticError é repassado às visitas em andamento até
+    # chegar à lista de statements que contém o statement com erro.
+    def visit(self, node):
+        handlers = self.handlers
+        handler = handlers.get(node.type)
+        if handler is None:
+            return None
+        value = handler(node)
+        if type(value) not in resumable:
+            return value
+        stack = [value]
+        value = None
+        while stack:
+            top = stack[-1]
+            try:
+                if type(top) is GeneratorType:
+                    try:
+                        child = top.send(value)
+                    except StopIteration as stop:
+                        stack.pop()
+                        value = stop.value
+                        continue
+                else:
+                    child = next(top, None)
+                    if child is None:
+                        stack.pop()
+                        value = None
+                        continue
+                handler = handlers.get(child.type)
+                if handler is None:
+                    value = None
+                    continue
+                value = handler(child)
+                if type(value) in resumable:
+                    stack.append(value)
+                    value = None
+            except SemanticError as error:
+                if not self.collect:
+                    raise
+                self.recover(stack, error)
+                value = None
+        return value
+
+    def recover(self, stack, error):
+        # Lança o erro nas visitas da pilha, da mais interna para a mais
+        # externa, até uma que o trate (statements ou program). As que não
+        # tratam terminam com o próprio erro e saem da pilha.
+        while stack:
+            top = stack.pop()
+            if type(top) is GeneratorType:
+                try:
+                    top.throw(error)
+                except SemanticError as again:
+                    error = again
+                    continue
+                stack.append(top)
+                return
+        raise error
+
+    # Nós que são apenas 'containers' de outros nós
+    def routine1(self, node):
+        return iter(node.children)
+
+    # Operações que abrem um novo escopo
+    def routine2(self, node):
+        # Inicia um novo escopo na tabela de símbolos
+        self.scope.push()
         for child in node.children:
-            types.append(visit(child))
-        return op_type(types, node.leaf, node.line)
+            yield child
+        # Desmonta o escopo
+        self.scope.pop()
 
-    elif node.type == 'boolean_exp':
-        types = []
+    # statement_list e program no modo collect: um erro num statement é
+    # registrado e o estado volta a ser o de antes dele
+    def statements(self, node):
         for child in node.children:
-            types.append(visit(child))
-        return op_type(types, node.leaf, node.line)
-
-    elif node.type == 'declaration':
+            state = self.save()
+            try:
+                yield child
+            except SemanticError as error:
+                self.restore(state)
+                self.report(error.diagnostic)
+                # Devolve o controle para recover; a pilha retoma daqui
+                yield
+
+    def program(self, node):
+        self.scope.push()
+        yield from self.statements(node)
+        self.scope.pop()
+
+    def save(self):
+        return (self.scope.depth, self.declaration, self.function_flag, self.last_function,
+                self.function_base)
+
+    def restore(self, state):
+        depth, self.declaration, self.function_flag, self.last_function, self.function_base = state
+        while self.scope.depth > depth:
+            self.scope.pop()
+
+    # bin_op e boolean_exp
+    # O tipo de cada expressão fica em node.inferred
+    def visit_operation(self, node):
+        left, right = node.children
+        # Caso mais comum: os dois operandos são valores, resolvidos sem a pilha.
+        # A visita passa pela tabela, para contar no perfil (profiling.py).
+        if left.type == 'value' and right.type == 'value':
+            visit_value = self.handlers['value']
+            node.inferred = operation_type(node.leaf, visit_value(left), visit_value(right), node.line)
+            return node.inferred
+        return self.visit_operands(node)
+
+    def visit_operands(self, node):
+        left = yield node.children[0]
+        right = yield node.children[1]
+        node.inferred = operation_type(node.leaf, left, right, node.line)
+        return node.inferred
+
+    # Nas declarações a expressão é verificada antes de a variável entrar no
+    # escopo, na mesma ordem da execução (vm.py, transpiler.py): em
+    # 'int x é x mais 1' o x da expressão é o de fora. Com erro na expressão a
+    # variável é declarada mesmo assim, para os usos seguintes não virarem
+    # outros erros.
+    def visit_declaration(self, node):
         # Verificar o escopo para identificar declaração duplicada
+        var = self.scope.id(node.children[0])
         if len(node.children) == 2: # Declaração única (com atribuição)
             # Checa para ver se o ID já existe
-            check_scope(node.children[0], node.line, 1, function_flag)
-            # Adiciona no escopo o ID e o tipo
-            scope.append([node.children[0], node.leaf])
-            exp_type = visit(node.children[1])
-            check_type(node.children[0], fetch_type(node.children[0]), exp_type, node.line)
+            self.check_scope(var, node.line, 1, self.function_flag)
+            try:
+                exp_type = yield node.children[1]
+            finally:
+                # Adiciona no escopo o ID e o tipo
+                self.scope.declare(var, node.leaf)
+            self.check_type(node.children[0], self.fetch_type(var), exp_type, node.line)
         else: # Declaração múltipla
             # Verifica no escopo para ver se a declaração é duplicada
-            check_scope(node.children[0], node.line, 1, function_flag)
-            scope.append([node.children[0], node.leaf])
+            self.check_scope(var, node.line, 1, self.function_flag)
+            try:
+                yield node.children[1]
+            finally:
+                self.scope.declare(var, node.leaf)
             # Define declaração como True para visitar os nós de atribuição(node.type == 'assignment')
-            declaration = True
-            visit(node.children[1])
-            visit(node.children[2])
-            declaration = False
-
-    elif node.type == 'null_declaration':
-        if len(node.children) == 1: # Declaração nula única
-            # Verifica o escopo por duplicadas
-            check_scope(node.children[0], node.line, 1, function_flag)
-            # Adiciona ao escopo
-            scope.append([node.children[0], node.leaf])
-        else: # Declaração nula de múltiplas variáveis
-            # Verifica o escopo por duplicadas
-            check_scope(node.children[0], node.line, 1, function_flag)
-            scope.append([node.children[0], node.leaf])
+            self.declaration = True
+            yield node.children[1]
+            yield node.children[2]
+            self.declaration = False
+
+    def visit_null_declaration(self, node):
+        # Verifica o escopo por duplicadas
+        var = self.scope.id(node.children[0])
+        self.check_scope(var, node.line, 1, self.function_flag)
+        # Adiciona ao escopo
+        self.scope.declare(var, node.leaf)
+        if len(node.children) == 2: # Declaração nula de múltiplas variáveis
             # Visita o id_list
-            visit(node.children[1])
+            yield node.children[1]
 
-    elif node.type == 'id_list':
-        scope.append([node.children[0], scope[-1][1]])
+    def visit_id_list(self, node):
+        self.scope.declare(self.scope.id(node.children[0]), self.scope.last.type)
         if node.leaf == ',':
-            visit(node.children[1])
-
+            yield node.children[1]
 
     # Se o node for do tipo valor, a expressão vira um primitivo(int, float, id, etc.)
-    elif node.type == 'value':
+    def visit_value(self, node):
         # Verificar se o ID sendo usado na expressão existe
         if node.leaf == 'id' or node.leaf == 'increment' or node.leaf == 'decrement':
-            check_scope(node.children[0], node.line, function = function_flag)
             # retorna o tipo do valor
-            return fetch_type(node.children[0])
+            node.inferred = self.check_scope(self.scope.id(node.children[0]), node.line, function = self.function_flag).type
+            return node.inferred
         if node.leaf == 'int' or node.leaf == 'real' or node.leaf == 'texto' or node.leaf == 'boolean':
             # Retorna o tipo
+            node.inferred = node.leaf
             return node.leaf
 
-
     # Se o node for um atribuição
-    elif node.type == 'assignment':
+    def visit_assignment(self, node):
         if node.leaf == '=':
-            if declaration:
+            var = self.scope.id(node.children[0])
+            if self.declaration:
                 # Se for uma atribuição que está dentro de uma declaração, como:
                 # int x é 10, y é 5, z é 53.
                 # Verifica por variáveis duplicadas no escopo
-                check_scope(node.children[0], node.line, 1, function_flag)
-                # Adiciona a variável no escopo
-                scope.append([node.children[0], scope[-1][1]])
-                # Visita a expressão
-                exp_type = visit(node.children[1])
-                check_type(node.children[0], fetch_type(node.children[0]), exp_type, node.line)
-
+                self.check_scope(var, node.line, 1, self.function_flag)
+                var_type = self.scope.last.type
+                try:
+                    exp_type = yield node.children[1]
+                finally:
+                    # Adiciona a variável no escopo, depois da expressão
+                    self.scope.declare(var, var_type)
             else:
                 # Se for uma atribuição comum e.g: ID ATRIBUICAO expression
                 # Verifica se a variável existe no escopo
-                check_scope(node.children[0], node.line, function = function_flag)
-                # Adiciona na lista o tipo do id que recebe a expressão
+                self.check_scope(var, node.line, function = self.function_flag)
                 # Visita a child expression
-                exp_type = visit(node.children[1])
-                check_type(node.children[0], fetch_type(node.children[0]), exp_type, node.line)
+                exp_type = yield node.children[1]
+            self.check_type(node.children[0], self.fetch_type(var), exp_type, node.line)
         else:
             for child in node.children:
-                visit(child)
+                yield child
 
-
-    elif node.type == 'while_loop':
-        scope.append(None)
-        tp = visit(node.children[0])
-        if tp == 'boolean':
-            for child in node.children:
-                visit(child)
-        else:
-            print ('Enquanto: Expressão incompatível na linha {}, esperava boolean mas obteve {}'.format(node.line, tp))
-            raise SystemExit
+    def visit_while_loop(self, node):
+        self.scope.push()
+        tp = yield node.children[0]
+        if not matches('boolean', tp):
+            self.error(node.line, 'Enquanto: Expressão incompatível na linha {}, esperava boolean mas obteve {}'.format(node.line, tp))
+        for child in node.children:
+            yield child
         # Desmonta o escopo
-        while scope.pop():
-            pass
-        return
-
+        self.scope.pop()
 
-    elif node.type == 'for_loop':
-        scope.append(None)
+    def visit_for_loop(self, node):
+        self.scope.push()
         # Adiciona ao escopo a variável do loop
         # A variável do loop deve ser do mesmo tipo que o item da lista
         # o qual ela representa # Ver um jeito de pegar o tipo de cada elemento
         # Momentâneamente fica como inteiro, precisamosa acessar os valores da lista e buscar o tipo de cada um
-        scope.append([node.children[0], 'int'])
+        self.scope.declare(self.scope.id(node.children[0]), 'int')
         # Verifica o tipo da variável que está sendo iterada
-        exp_type = visit(node.children[1])
-        if exp_type != 'lista':
-            print ("{}: Tentativa de iterar sobre elemento não iterável na linha {}.".format(node.children[0], node.line))
-            raise SystemExit
-        visit(node.children[2])
-        while scope.pop():
-            pass
+        exp_type = yield node.children[1]
+        if not matches('lista', exp_type):
+            self.error(node.line, "{}: Tentativa de iterar sobre elemento não iterável na linha {}.".format(node.children[0], node.line))
+        yield node.children[2]
+        self.scope.pop()
 
     # Se o node é uma declaração de função
-    elif node.type == 'function_declaration':
+    def visit_function_declaration(self, node):
+        scope = self.scope
+        name = scope.id(node.leaf)
         # Verifica se a função não está duplicada no escopo
-        check_scope(node.leaf, node.line, 1, function = function_flag)
-        last_function = node.leaf
-        # Adiciona a função ao escopo:
+        self.check_scope(name, node.line, 1, function = self.function_flag)
         if len(node.children) == 2:
             # Se há dois filhos é uma declaração com parâmetros.
-            # Adiciona no escopo o nome da função e o statement_list e os argumentos
-            # Inicia o tipo de retorno como None, depois que encontrar o retorno altera.
-            scope.append([node.leaf, None, node.children[1], node.children[0]])
+            args, body = node.children
         else:
             # É uma declaração de função sem parâmetros.
-            # Coloca o ID da função no escopo
-            scope.append([node.leaf, None])
-            # visit(node.children[0])
-
-        # Inicia um escopo agora somente para testar a função
-        scope.append(None)
-        # Visita os filhos para colocar os parâmetros no escopo
-        for child in node.children:
-            visit(child)
-        # Desmonta o escopo, que será montado novamente quando a função for chamada
-        while scope.pop():
-            pass
-        last_function = None
-
-    elif node.type == 'function_call':
-        # Verifica o escopo para ver se a função foi declarada
-        check_scope(node.leaf, node.line, function = function_flag)
-        # Se a função foi declarada, adiciona ao escopo os parâmetros da função
-        scope.append(None)
-        function_flag = 1
-        # Percorre o escopo de trás pra frente
-        for var in scope[::-1]:
-            # Se encontrar a função que está sendo chamada:
-            if var and var[0] == node.leaf:
-                if len(var) > 2: # É uma função que possui parâmetros [ID, Statement_list, Arguments]
-                    # Precisamos montar o escopo da função
-                    visit(var[3])
-                    # Verifica o corpo da função
-                    visit(var[2])
-                else: # É uma função sem parâmetros
-                    # Verifica o corpo da função
-                    visit(var[2])
-
-        function_flag = 0
-        while scope.pop():
-            pass
-        tipo_retorno = fetch_type(node.leaf)
-        return tipo_retorno
-
-    elif node.type == 'args':
+            args, body = None, node.children[0]
+        # Adiciona a função ao escopo antes de verificar o corpo, assim chamadas
+        # recursivas usam o resumo em vez de verificar o corpo de novo.
+        # O tipo de retorno fica unknown até o primeiro retorno.
+        function = scope.declare(name, unknown, params=())
+        outer = self.last_function, self.function_flag, self.function_base
+        self.last_function = function
+
+        # Inicia o escopo da função, que é verificada uma única vez
+        scope.push()
+        self.function_flag = 1
+        self.function_base = scope.depth
+        if args is not None:
+            # Coloca os parâmetros no escopo e guarda os tipos no resumo
+            yield args
+            function.params = tuple(scope.symbols[index].type for index in scope.frames[-1])
+        # Verifica o corpo da função
+        yield body
+        # Desmonta o escopo
+        scope.pop()
+        if function.type == unknown:
+            # Função sem retorno
+            function.type = None
+        self.last_function, self.function_flag, self.function_base = outer
+
+    def visit_function_call(self, node):
+        # Verifica o escopo para ver se a função foi declarada. O nome da função
+        # é visível mesmo de dentro do corpo de outra função.
+        function = self.scope.lookup(self.scope.id(node.leaf))
+        if function is None:
+            self.error(node.line, "{}: Variável não declarada na linha {}.".format(node.leaf, node.line))
+        if function.params is None:
+            self.error(node.line, "Linha {}: {} não é uma função.".format(node.line, node.leaf))
+        # Verifica os argumentos contra o resumo da função, sem visitar o corpo
+        arg_types = []
+        for arg in parameters(node.children[0]):
+            arg_types.append((yield arg))
+        # A gramática exige ao menos um argumento na chamada (ID COM parameters),
+        # então funções sem parâmetros ignoram os argumentos recebidos
+        if function.params:
+            if len(arg_types) != len(function.params):
+                self.error(node.line, "Linha {}: {} espera {} argumento(s) mas recebeu {}.".format(node.line, node.leaf,
+                len(function.params), len(arg_types)))
+            for param_type, arg_type in zip(function.params, arg_types):
+                if not matches(param_type, arg_type):
+                    self.error(node.line, "Linha {}: Tipos incompatíveis na chamada de {}.".format(node.line, node.leaf)
+                    + " Esperava {} mas obteve {}.".format(param_type, arg_type))
+        node.inferred = function.type
+        return function.type
+
+    def visit_args(self, node):
         if node.leaf == 'single_argument':
-            scope.append([node.children[0], node.children[1]])
+            self.scope.declare(self.scope.id(node.children[0]), node.children[1])
         else:
             for child in node.children:
-                visit(child)
+                yield child
 
-    elif node.type == 'index':
+    def visit_index(self, node):
         # Checa se a variável que está sendo indexada existe
-        check_scope(node.children[0], node.line, function = function_flag)
+        var = self.scope.id(node.children[0])
+        self.check_scope(var, node.line, function = self.function_flag)
         # Checa se a variável que está sendo indexada é uma lista
-        id_type = fetch_type(node.children[0])
+        id_type = self.fetch_type(var)
         if id_type != 'lista':
-            print("Linha {}: Variáveis do tipo {} não podem ser acessadas por meio de índices.".format(node.line, id_type))
+            self.warning(node.line, "Linha {}: Variáveis do tipo {} não podem ser acessadas por meio de índices.".format(node.line, id_type))
+        # Índice dado por uma variável ('[i]'): a variável precisa existir
+        index = node.children[1][1:-1]
+        if not index.isdigit():
+            self.check_scope(self.scope.id(index), node.line, function = self.function_flag)
 
-    elif node.type == 'append':
+    def visit_append(self, node):
         # Verifica se o ID existe no escopo
-        check_scope(node.children[1], node.line, function = function_flag)
-        if fetch_type(node.children[1]) != 'lista':
-            print ("Linha {}: Variáveis do tipo {} não possuem o método 'bota'.".format(node.line, fetch_type(node.children[1])))
-            raise SystemExit
+        var = self.scope.id(node.children[1])
+        self.check_scope(var, node.line, function = self.function_flag)
+        if self.fetch_type(var) != 'lista':
+            self.error(node.line, "Linha {}: Variáveis do tipo {} não possuem o método 'bota'.".format(node.line, self.fetch_type(var)))
         # Pega o tipo da expressão que está sendo colocada na lista
-        exp_type = visit(node.children[0])
+        exp_type = yield node.children[0]
         if exp_type == 'lista':
-            print ("Linha {}: Tipos incompatíveis para a operação 'bota', lista em lista.".format(node.line))
-
+            self.warning(node.line, "Linha {}: Tipos incompatíveis para a operação 'bota', lista em lista.".format(node.line))
 
-    elif node.type == 'read':
-        check_scope(node.children[0], node.line, function = function_flag)
-        tipo = fetch_type(node.children[0])
+    def visit_read(self, node):
+        var = self.scope.id(node.children[0])
+        self.check_scope(var, node.line, function = self.function_flag)
+        tipo = self.fetch_type(var)
         if tipo == 'lista' or tipo == 'boolean':
-            print ("Linha {}: Variáveis do tipo {} não podem ser lidas.".format(node.line, tipo))
-            raise SystemExit
+            self.error(node.line, "Linha {}: Variáveis do tipo {} não podem ser lidas.".format(node.line, tipo))
 
-    elif node.type == 'iterable':
+    def visit_iterable(self, node):
+        node.inferred = 'lista'
         return 'lista'
 
-
-    elif node.type == 'if_statement':
-        scope.append(None)
-
-        tp = visit(node.children[0])
-        if tp == 'boolean':
+    def visit_if_statement(self, node):
+        self.scope.push()
+        tp = yield node.children[0]
+        if matches('boolean', tp):
             for child in node.children:
-                visit(child)
+                yield child
         else:
-            print ('Se: Expressão incompatível na linha {}, esperava boolean mas obteve {}'.format(node.line, tp))
+            self.warning(node.line, 'Se: Expressão incompatível na linha {}, esperava boolean mas obteve {}'.format(node.line, tp))
         # Desmonta o escopo
-        while scope.pop():
-            pass
-        return
-
-    elif node.type == 'return':
-        tipo_retorno = visit(node.children[0])
-        # Adicionar o tipo do retorno da função no escopo
-        for index in range(len(scope)):
-            if scope[index] and scope[index][0] == last_function:
-                scope[index][1] = tipo_retorno
-                break
-
-def check_scope(identifier, lineno, duplicate = 0, function = 0):
-    if duplicate == 1:
-        # Se for checar por duplicadas, checa somente no escopo atual.
-        for var in scope[::-1]:
-            if var and var[0] == identifier:
-                print("{}: Declaração de variável duplicada na linha {}.".format(identifier, lineno))
-                raise SystemExit
-            # Para quando chegar no fim do último escopo
-            elif var == None:
-                break
-    else:
-        if function == 1:
-            for var in scope[::-1]:
-                if var and var[0] == identifier:
-                    break
-                elif var == None:
-                    print ("{}: Variável não declarada na linha {}.".format(identifier, lineno))
-                    raise SystemExit
+        self.scope.pop()
+
+    def visit_return(self, node):
+        tipo_retorno = yield node.children[0]
+        # Adicionar o tipo do retorno no resumo da função. Chamadas recursivas
+        # feitas antes do primeiro retorno ainda não conhecem o tipo (unknown).
+        if self.last_function is not None and tipo_retorno is not None and tipo_retorno != unknown:
+            self.last_function.type = tipo_retorno
+
+    # identifier é o id do nome na tabela do escopo (SymbolTable.id)
+    def check_scope(self, identifier, lineno, duplicate = 0, function = 0):
+        if duplicate == 1:
+            # Se for checar por duplicadas, checa somente no escopo atual.
+            if self.scope.local(identifier) is not None:
+                self.error(lineno, "{}: Declaração de variável duplicada na linha {}.".format(self.scope.name(identifier), lineno))
         else:
-            for var in scope[::-1]:
-                if var and var[0] == identifier:
-                    break
-            else:
-                print ("{}: Variável não declarada na linha {}.".format(identifier, lineno))
-                raise SystemExit
-
-def check_type(var, left_hand_type, right_hand_type, line):
-    if left_hand_type != right_hand_type:
-        print ("Tipos incompatíveis ao atribuir valor a variável {} na linha {}.".format(var, line)
-        + " Esperava {} mas obteve {}.".format(left_hand_type, right_hand_type))
-        raise SystemExit
-
-def fetch_type(identifier):
-    # Percorre o escopo de trás pra frente
-    for var in scope[::-1]:
-        # Quando encontrar a variável em questão
-        if var and var[0] == identifier:
-            return var[1] # Retorna o tipo
-
-def op_type(types, operation, line):
-    if len(set(types)) == 1:
-        # Cai aqui: [str str] [int int] [real real] [boolean boolean] [lista lista]
-        # As operações envolvem somente um tipo - OK
-        if types[0] == 'boolean':
-            if operation in ['mais', 'menos', 'dividido por', 'vezes', 'na']:
-                print ("Operação inválida para o tipo {} na linha {}: {}.".format(types[0], line, operation))
-                raise SystemExit
-
-        elif types[0] == 'texto' or types[0] == 'lista':
-            if operation in ['menos', 'dividido por', 'vezes', 'na', 'menor que', 'maior que', 'menor ou igual a', 'maior ou igual a',
-            'ou', 'e', 'nao']:
-                print ("Operação inválida para o tipo {} na linha {}: {}.".format(types[0], line, operation))
-                raise SystemExit
-
-        elif types[0] == 'int' or types[0] == 'real':
-            if operation in ['e', 'ou', 'nao']:
-                print ("Operação inválida para o tipo {} na linha {}: {}.".format(types[0], line, operation))
-                raise SystemExit
-
-        if operation in ['maior que', 'menor que', 'diferente de', 'igual a', 'maior ou igual a', 'menor ou igual a', 'e', 'ou', 'nao']:
-            return 'boolean'
-
-        return types[0]
-
-    # Se for uma operação entre dois tipos diferentes
-    if len(set(types)) == 2:
-        # Se os tipos da operação forem real e inteiro
-        if 'real' in types and 'int' in types:
-            if operation in ['maior que', 'menor que', 'diferente de', 'igual a', 'maior ou igual a', 'menor ou igual a', 'e', 'ou', 'nao']:
-                # Se for uma operação booleana retorna boolean
-                return 'boolean'
+            if function == 1:
+                # Dentro de uma função só os escopos da própria função são visíveis
+                symbol = self.scope.lookup(identifier, self.function_base)
             else:
-                # Se for uma operação aritmética retorna real
-                return 'real'
-
+                symbol = self.scope.lookup(identifier)
+            if symbol is None:
+                self.error(lineno, "{}: Variável não declarada na linha {}.".format(self.scope.name(identifier), lineno))
+            # Retorna o símbolo encontrado
+            return symbol
+
+    def check_type(self, var, left_hand_type, right_hand_type, line):
+        if not matches(left_hand_type, right_hand_type):
+            self.error(line, "Tipos incompatíveis ao atribuir valor a variável {} na linha {}.".format(var, line)
+            + " Esperava {} mas obteve {}.".format(left_hand_type, right_hand_type))
+
+    def fetch_type(self, identifier):
+        # Busca a declaração mais interna do identificador
+        symbol = self.scope.lookup(identifier)
+        if symbol is not None:
+            return symbol.type # Retorna o tipo
+
+    def op_type(self, types, operation, line):
+        return operation_type(operation, types[0], types[1], line)
+
+
+def parameters(node):
+    # Lista as expressões de uma árvore de parâmetros, da esquerda para a direita
+    expressions = []
+    pending = [node]
+    while pending:
+        node = pending.pop()
+        if node.leaf == 'parameters':
+            pending.extend(reversed(node.children))
         else:
-            print ("Linha {}: Tipos incompatíveis para a operação '{}', {} e {}.".format(line, operation, types[0], types[1]))
-            raise SystemExit
-
-
-print (ast.pretty())
-visit(ast)
-print ("[+] Verificação concluída. Nenhum erro encontrado")
+            expressions.append(node.children[0])
+    return expressions
+
+def check(ast, collect=False, max_errors=100):
+    # Verifica um programa com um Checker novo e devolve os diagnósticos
+    return Checker(collect, max_errors).check(ast)
+
+
+if __name__ == '__main__':
+    # python semantic.py arquivo.txt [--all] [--max-errors N] [--optimize]
+    #                    [--profile | --profile-memory]
+    args = sys.argv[1:]
+    collect = '--all' in args
+    if collect:
+        args.remove('--all')
+    optimize = '--optimize' in args
+    if optimize:
+        args.remove('--optimize')
+    max_errors = 100
+    if '--max-errors' in args:
+        index = args.index('--max-errors')
+        max_errors = int(args[index + 1])
+        del args[index:index + 2]
+    profile = None
+    for flag in ('--profile', '--profile-memory'):
+        if flag in args:
+            args.remove(flag)
+            # Importado aqui: profiling usa este módulo
+            from profiling import Profile
+            profile = Profile(memory=flag == '--profile-memory')
+    try:
+        ast = profile.parse_file(args[0]) if profile else parse_file(args[0])
+        if ast is None:
+            raise SystemExit(1)
+        if optimize:
+            from optimizer import optimize
+            ast, _ = optimize(ast)
+        ast.dump(sys.stdout)
+        if profile:
+            diagnostics = profile.check(ast, collect, max_errors)
+        else:
+            diagnostics = check(ast, collect, max_errors)
+        for diagnostic in diagnostics:
+            print (diagnostic)
+        if syntax_errors() or any(diagnostic.fatal for diagnostic in diagnostics):
+            raise SystemExit(1)
+        print ("[+] Verificação concluída. Nenhum erro encontrado")
+    finally:
+        # O relatório vai para a saída de erro, separado da saída normal
+        if profile:
+            print(profile.json(), file=sys.stderr)
@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+Servidor de verificação com JSON-RPC 2.0
+
+Uso: python server.py [--socket caminho] [--workers N]
+
+Mantém processos com o lexer e o parser já carregados e atende pedidos, um
+objeto JSON por linha, pela entrada padrão (as respostas saem na saída
+padrão) ou, com --socket, por conexões num socket Unix. O código vem de
+"path" (arquivo) ou "text" (o próprio código). Métodos:
+
+    check     {"path" | "text", "all": false, "max_errors": 100}
+              -> {"status", "diagnosticos"}
+    parse     {"path" | "text", "jsonl": false, "max_depth", "max_nodes", "types": false}
+              -> {"status", "nos", "ast", "diagnosticos"}
+              Com types, a árvore passa também pela verificação semântica
+              (com "all" e "max_errors" como em check), e no formato jsonl
+              cada expressão leva o tipo dela em "inferred".
+    tokenize  {"path" | "text"} -> {"tokens": [[tipo, valor, linha, posição]], "diagnosticos"}
+    cancel    {"id"}: o pedido com esse id, da mesma conexão, responde com o
+              erro -32800
+    shutdown  encerra o servidor depois de responder
+
+Cada diagnóstico é {"linha", "mensagem", "origem", "fatal"}, com origem
+'lexico', 'sintaxe' ou 'semantico'. Exemplo:
+
+    {"jsonrpc": "2.0", "id": 1, "method": "check", "params": {"path": "programa.txt"}}
+
+Os pedidos rodam num pool de processos (--workers, padrão até 4), então um
+arquivo grande não segura os outros, e as respostas saem na ordem em que
+ficam prontas. Um pedido cancelado ainda na fila do pool nem começa; um que
+já começou termina no processo, mas a resposta dele é descartada.
+"""
+
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import contextlib
+import io
+import json
+import os
+import signal
+import stat
+import sys
+
+from optimizer import count
+import parser
+from scanner import TokenArray
+import semantic
+
+# Códigos de erro do JSON-RPC
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INTERNAL_ERROR = -32603
+REQUEST_CANCELLED = -32800
+
+# Maior linha (pedido) aceita, com o código dentro
+max_line = 1 << 28
+
+
+# Pedidos, executados nos processos do pool
+def init_worker():
+    # Carrega as tabelas e faz uma análise antes do primeiro pedido
+    parser.get_parser()
+    parser.parse_tokens(TokenArray.scan('int x é 1.\n'))
+
+
+def diagnostic(line, message, origin, fatal=True):
+    return {'linha': line, 'mensagem': message, 'origem': origin, 'fatal': fatal}
+
+
+def source(params):
+    if 'text' in params:
+        return params['text']
+    with open(params['path']) as file:
+        return file.read()
+
+
+def scan(params):
+    # Tokens e os diagnósticos léxicos
+    diagnostics = []
+
+    def lexical_error(char, lineno, lexpos):
+        diagnostics.append(diagnostic(lineno, 'Caractere ilegal na linha {}: {}'.format(lineno, char), 'lexico'))
+    return TokenArray.scan(source(params), error=lexical_error), diagnostics
+
+
+def analyze(params):
+    # AST e os diagnósticos léxicos e de sintaxe. As mensagens que o parser
+    # imprime ficam fora da saída padrão, que pode ser a das respostas.
+    tokens, diagnostics = scan(params)
+    with contextlib.redirect_stdout(io.StringIO()):
+        ast = parser.parse_tokens(tokens)
+    diagnostics.extend(diagnostic(line, message, 'sintaxe') for line, message in parser.syntax_errors())
+    return ast, diagnostics
+
+
+def status(ast, diagnostics):
+    return 'ok' if ast is not None and not diagnostics else 'erro'
+
+
+def verify(ast, params, diagnostics):
+    # Acrescenta os diagnósticos semânticos; anota os tipos das expressões
+    for item in semantic.check(ast, bool(params.get('all')), int(params.get('max_errors', 100))):
+        diagnostics.append(diagnostic(item.line, item.message, 'semantico', item.fatal))
+
+
+def run_check(params):
+    ast, diagnostics = analyze(params)
+    if ast is not None:
+        verify(ast, params, diagnostics)
+    return {'status': status(ast, diagnostics), 'diagnosticos': diagnostics}
+
+
+def run_parse(params):
+    ast, diagnostics = analyze(params)
+    if ast is not None and params.get('types'):
+        verify(ast, params, diagnostics)
+    result = {'status': status(ast, diagnostics), 'nos': 0, 'ast': None, 'diagnosticos': diagnostics}
+    if ast is not None:
+        output = io.StringIO()
+        ast.dump(output, params.get('max_depth'), params.get('max_nodes'), bool(params.get('jsonl')))
+        result['nos'] = count(ast)
+        result['ast'] = output.getvalue()
+    return result
+
+
+def run_tokenize(params):
+    tokens, diagnostics = scan(params)
+    return {'tokens': list(tokens), 'diagnosticos': diagnostics}
+
+
+methods = {'check': run_check, 'parse': run_parse, 'tokenize': run_tokenize}
+
+
+class RequestError(Exception):
+    def __init__(self, code, message):
+        Exception.__init__(self, message)
+        self.code = code
+
+
+def response(id, result):
+    return {'jsonrpc': '2.0', 'id': id, 'result': result}
+
+
+def error_response(id, code, message):
+    return {'jsonrpc': '2.0', 'id': id, 'error': {'code': code, 'message': message}}
+
+
+def validate(request):
+    # Método e parâmetros de um pedido de check, parse ou tokenize
+    method = request['method']
+    if method not in methods:
+        raise RequestError(METHOD_NOT_FOUND, 'Método desconhecido: {}'.format(method))
+    params = request.get('params')
+    if not isinstance(params, dict):
+        raise RequestError(INVALID_PARAMS, 'Os parâmetros devem ser um objeto.')
+    if not isinstance(params.get('text', params.get('path')), str):
+        raise RequestError(INVALID_PARAMS, "Faltou 'path' ou 'text'.")
+    return method, params
+
+
+class Server:
+    def __init__(self, workers=None):
+        self.workers = workers or min(4, os.cpu_count() or 1)
+        self.pool = None
+        self.stopped = None
+
+    def start_pool(self):
+        self.pool = ProcessPoolExecutor(self.workers, initializer=init_worker)
+        # Sobe os processos já, para o primeiro pedido não esperar as tabelas
+        for _ in range(self.workers):
+            self.pool.submit(int)
+
+    def restart_pool(self, broken):
+        # Todos os pedidos que estavam no pool quebrado falham juntos; só o
+        # primeiro a chegar aqui refaz o pool
+        if self.pool is broken:
+            broken.shutdown(wait=False, cancel_futures=True)
+            self.start_pool()
+
+    async def serve(self, socket_path=None):
+        self.stopped = asyncio.Event()
+        self.start_pool()
+        loop = asyncio.get_running_loop()
+        try:
+            if socket_path is None:
+                mode = os.fstat(sys.stdin.fileno()).st_mode
+                if stat.S_ISFIFO(mode) or stat.S_ISSOCK(mode) or sys.stdin.isatty():
+                    reader = asyncio.StreamReader(limit=max_line)
+                    await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+                else:
+                    # Arquivo (python server.py < pedidos.jsonl) ou /dev/null,
+                    # que o asyncio não lê sem bloquear
+                    reader = FileReader(sys.stdin.buffer)
+                await self.serve_connection(reader, write_stdout)
+                return
+            # Socket de uma execução anterior que não foi removido
+            with contextlib.suppress(FileNotFoundError):
+                if stat.S_ISSOCK(os.stat(socket_path).st_mode):
+                    os.unlink(socket_path)
+            server = await asyncio.start_unix_server(self.client, socket_path, limit=max_line)
+            loop.add_signal_handler(signal.SIGTERM, self.stopped.set)
+            loop.add_signal_handler(signal.SIGINT, self.stopped.set)
+            try:
+                async with server:
+                    await self.stopped.wait()
+            finally:
+                with contextlib.suppress(OSError):
+                    os.unlink(socket_path)
+        finally:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+
+    async def client(self, reader, writer):
+        try:
+            await self.serve_connection(reader, writer.write)
+        except (ConnectionError, asyncio.CancelledError):
+            # Cliente que caiu, ou conexão ainda aberta no fim do servidor
+            pass
+        finally:
+            writer.close()
+
+    async def serve_connection(self, reader, write):
+        # Lê os pedidos de uma conexão até o fim dela ou um shutdown. Cada
+        # pedido vira uma tarefa; `running` guarda as que têm id, para o cancel.
+        running = {}
+        tasks = set()
+
+        def send(message):
+            write(json.dumps(message, ensure_ascii=False).encode() + b'\n')
+
+        while not self.stopped.is_set():
+            try:
+                line = await reader.readline()
+            except ValueError:
+                send(error_response(None, INVALID_REQUEST, 'Pedido maior que o limite.'))
+                break
+            if not line:
+                break
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line)
+            except ValueError:
+                send(error_response(None, PARSE_ERROR, 'JSON inválido.'))
+                continue
+            if not isinstance(request, dict) or not isinstance(request.get('method'), str):
+                send(error_response(request.get('id') if isinstance(request, dict) else None,
+                                    INVALID_REQUEST, 'Pedido inválido.'))
+                continue
+            id = request.get('id')
+            method = request['method']
+            if method == 'cancel':
+                params = request.get('params')
+                task = running.get(params.get('id')) if isinstance(params, dict) else None
+                if task is not None:
+                    task.cancel()
+                if id is not None:
+                    send(response(id, {'cancelado': task is not None}))
+            elif method == 'shutdown':
+                if id is not None:
+                    send(response(id, None))
+                self.stopped.set()
+            else:
+                task = asyncio.ensure_future(self.handle(request, send))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+                if id is not None:
+                    running[id] = task
+                    task.add_done_callback(lambda task, id=id: running.pop(id, None) if running.get(id) is task else None)
+        # Fim da entrada: os pedidos em andamento ainda respondem
+        if tasks and not self.stopped.is_set():
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def handle(self, request, send):
+        id = request.get('id')
+        pool = self.pool
+        try:
+            method, params = validate(request)
+            result = await asyncio.get_running_loop().run_in_executor(pool, methods[method], params)
+            message = response(id, result)
+        except asyncio.CancelledError:
+            message = error_response(id, REQUEST_CANCELLED, 'Pedido cancelado.')
+        except RequestError as error:
+            message = error_response(id, error.code, str(error))
+        except OSError as error:
+            message = error_response(id, INVALID_PARAMS, str(error))
+        except BrokenProcessPool:
+            # Um processo morreu (falta de memória, sinal): o pool é refeito
+            self.restart_pool(pool)
+            message = error_response(id, INTERNAL_ERROR, 'Processo de verificação interrompido.')
+        except Exception as error:
+            message = error_response(id, INTERNAL_ERROR, '{}: {}'.format(type(error).__name__, error))
+        if id is not None:
+            send(message)
+
+
+class FileReader:
+    # Lê as linhas de um arquivo numa thread, com o mesmo readline de
+    # asyncio.StreamReader
+    def __init__(self, file):
+        self.file = file
+
+    async def readline(self):
+        line = await asyncio.get_running_loop().run_in_executor(None, self.file.readline, max_line + 1)
+        if len(line) > max_line:
+            raise ValueError('Linha maior que o limite.')
+        return line
+
+
+def write_stdout(data):
+    sys.stdout.buffer.write(data)
+    sys.stdout.buffer.flush()
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    socket_path = None
+    if '--socket' in args:
+        index = args.index('--socket')
+        socket_path = args[index + 1]
+        del args[index:index + 2]
+    workers = None
+    if '--workers' in args:
+        index = args.index('--workers')
+        workers = int(args[index + 1])
+        del args[index:index + 2]
+    if args:
+        print(__doc__.strip().splitlines()[2])
+        raise SystemExit(2)
+    asyncio.run(Server(workers).serve(socket_path))
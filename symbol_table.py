@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+Tabela de símbolos com escopos aninhados
+"""
+
+
+class Names:
+    # Tabela de strings de uma análise: cada nome distinto recebe um id inteiro
+    # pequeno, na ordem em que aparece. Os escopos guardam só os ids; a string
+    # fica aqui, para as mensagens. A tabela vive com a verificação, então um
+    # processo longo (server.py) não acumula os nomes de todos os programas.
+    def __init__(self):
+        # Nome -> id, e id -> nome
+        self.ids = {}
+        self.names = []
+
+    def id(self, name):
+        try:
+            return self.ids[name]
+        except KeyError:
+            index = self.ids[name] = len(self.names)
+            self.names.append(name)
+            return index
+
+    def __getitem__(self, index):
+        return self.names[index]
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self.ids
+
+
+class Symbol:
+    __slots__ = ('id', 'type', 'depth', 'params', 'shadowed')
+
+    def __init__(self, id, type, depth, params=None, shadowed=None):
+        self.id = id
+        # Para funções é o tipo de retorno
+        self.type = type
+        self.depth = depth
+        # Tipos dos parâmetros, somente para funções
+        self.params = params
+        # Símbolo de mesmo nome de um escopo mais externo, restaurado no pop
+        self.shadowed = shadowed
+
+    def __repr__(self):
+        return 'Symbol({}, {!r}, {})'.format(self.id, self.type, self.depth)
+
+
+class SymbolTable:
+    # Os nomes chegam como ids de Names (SymbolTable.id); declarar, buscar e
+    # desmontar escopos só indexa listas com inteiros
+    def __init__(self, names=None):
+        self.names = Names() if names is None else names
+        # Sem passar por um método de SymbolTable: é chamado a cada nome
+        self.id = self.names.id
+        # Id -> símbolo visível mais interno, ou None. Cada símbolo aponta
+        # para o que ele esconde, então a busca não depende da quantidade de
+        # escopos.
+        self.symbols = []
+        # Ids declarados em cada escopo, na ordem de declaração
+        self.frames = [[]]
+        # Último símbolo declarado (usado em declarações múltiplas)
+        self.last = None
+
+    @property
+    def depth(self):
+        return len(self.frames) - 1
+
+    def name(self, index):
+        return self.names[index]
+
+    def push(self):
+        # Inicia um novo escopo
+        self.frames.append([])
+
+    def pop(self):
+        # Desmonta o escopo atual, restaurando os símbolos escondidos por ele
+        symbols = self.symbols
+        for index in reversed(self.frames.pop()):
+            symbols[index] = symbols[index].shadowed
+
+    def declare(self, index, type, params=None):
+        symbols = self.symbols
+        if index >= len(symbols):
+            symbols.extend([None] * (index + 1 - len(symbols)))
+        symbol = Symbol(index, type, self.depth, params, symbols[index])
+        symbols[index] = symbol
+        self.frames[-1].append(index)
+        self.last = symbol
+        return symbol
+
+    def lookup(self, index, floor=0):
+        # Busca o símbolo mais interno, desde que declarado no escopo `floor`
+        # ou acima dele
+        if index < len(self.symbols):
+            symbol = self.symbols[index]
+            if symbol is not None and symbol.depth >= floor:
+                return symbol
+        return None
+
+    def local(self, index):
+        # Busca somente no escopo atual
+        return self.lookup(index, self.depth)
+
+    def __len__(self):
+        # Quantidade de nomes visíveis
+        return sum(1 for symbol in self.symbols if symbol is not None)
+
+    def __contains__(self, index):
+        return self.lookup(index) is not None
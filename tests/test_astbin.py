@@ -0,0 +1,62 @@
+import mmap
+import os
+import subprocess
+import sys
+
+import pytest
+
+import astbin
+import programas
+from incremental import equal
+from parser import Node, parse
+from semantic import check
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.mark.parametrize('forma', sorted(programas.formas))
+def test_round_trip(forma):
+    ast = parse(programas.programa_sintetico(forma, 30))
+    tree = astbin.loads(astbin.dumps(ast))
+    assert len(tree) == programas.conta_nos(ast)
+    assert equal(tree.materialize(), ast)
+    assert equal(tree.root.materialize(), ast)
+
+
+def test_load(tmp_path):
+    ast = parse(programas.programa_constantes(10))
+    path = tmp_path / 'programa.ast'
+    with open(path, 'wb') as file:
+        astbin.dump(ast, file)
+    tree = astbin.load(path)
+    assert isinstance(tree.buffer, mmap.mmap)
+    assert equal(tree.materialize(), ast)
+    tree.close()
+    assert tree.buffer.closed
+
+
+@pytest.mark.parametrize('codigo', ['', 'int x é .\n'])
+def test_main_invalid(tmp_path, codigo):
+    path = tmp_path / 'programa.txt'
+    path.write_text(codigo)
+    result = subprocess.run([sys.executable, 'astbin.py', str(path)], cwd=root, stdout=subprocess.PIPE,
+                            stderr=subprocess.PIPE)
+    assert result.returncode == 1
+    assert b'Traceback' not in result.stderr
+
+
+def test_check_views():
+    # A verificação semântica roda direto sobre os NodeView e anota os tipos
+    # no Tree
+    ast = parse(programas.programa_sintetico('expressoes', 20) + 'int z é "a" mais 1.\n')
+    tree = astbin.loads(astbin.dumps(ast))
+    expected = [str(diagnostic) for diagnostic in check(ast, collect=True)]
+    assert [str(diagnostic) for diagnostic in check(tree.root, collect=True)] == expected
+    assert tree.root.children[1].children[1].inferred == 'int'
+    nodes = [tree.materialize()]
+    originals = [ast]
+    while nodes:
+        node, original = nodes.pop(), originals.pop()
+        assert node.inferred == original.inferred
+        nodes.extend(child for child in node.children if isinstance(child, Node))
+        originals.extend(child for child in original.children if isinstance(child, Node))
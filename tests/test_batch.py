@@ -0,0 +1,30 @@
+import batch
+from parser import parse_file
+
+
+def check(tmp_path, monkeypatch, codigo):
+    monkeypatch.setattr(batch, 'parse_path', parse_file)
+    path = tmp_path / 'programa.txt'
+    path.write_text(codigo)
+    result = batch.check_file(str(path))
+    return result['status'], result['mensagens']
+
+
+def test_ok(tmp_path, monkeypatch):
+    assert check(tmp_path, monkeypatch, 'int x é 1.\nmostra x.\n') == ('ok', [])
+
+
+def test_warning(tmp_path, monkeypatch):
+    # Avisos vão para o relatório, mas o arquivo continua ok, como em semantic.py
+    assert check(tmp_path, monkeypatch, 'int x é 1.\nmostra x[2].\n') == (
+        'ok', ['Linha 2: Variáveis do tipo int não podem ser acessadas por meio de índices.'])
+
+
+def test_errors(tmp_path, monkeypatch):
+    assert check(tmp_path, monkeypatch, 'int x é 1.\nmostra y.\n') == (
+        'erro', ['y: Variável não declarada na linha 2.'])
+    status, messages = check(tmp_path, monkeypatch, 'int x é 1.\nx[1] é 2.\n')
+    assert status == 'erro' and messages
+    # Um erro fatal junto com um aviso
+    status, messages = check(tmp_path, monkeypatch, 'int x é 1.\nmostra x[2], y.\n')
+    assert status == 'erro' and len(messages) == 2
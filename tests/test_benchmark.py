@@ -0,0 +1,21 @@
+from benchmark import compara
+
+
+def resultado(tempo, fonte='abc'):
+    return {'tempo': tempo, 'memoria': 1000, 'tokens': 10, 'fonte': fonte}
+
+
+def test_compara():
+    base = {'plano/lex': resultado(1.0), 'plano/parse': resultado(1.0)}
+    assert compara({'plano/lex': resultado(1.1), 'plano/parse': resultado(0.5)}, base, 0.25) == ([], [])
+    regressoes, sem_base = compara({'plano/lex': resultado(1.5)}, base, 0.25)
+    assert len(regressoes) == 1 and sem_base == []
+
+
+def test_compara_sem_base():
+    # Resultados sem medida comparável na base não passam como sem regressões
+    base = {'plano/lex': resultado(1.0, fonte='outro')}
+    regressoes, sem_base = compara({'plano/lex': resultado(1.0), 'plano/parse': resultado(1.0)}, base, 0.25)
+    assert regressoes == []
+    assert sem_base == ['plano/lex: programa diferente do da base', 'plano/parse: ausente da base']
+    assert compara({'plano/lex': resultado(1.0)}, {}, 0.25)[1] == ['plano/lex: ausente da base']
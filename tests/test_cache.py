@@ -0,0 +1,48 @@
+import programas
+from cache import ParseCache
+from incremental import equal
+from parser import parse, parse_file_cached
+
+
+def test_get_put(tmp_path):
+    cache = ParseCache(str(tmp_path), version='teste')
+    data = 'int x é 1.\n'.encode()
+    key = cache.key(data)
+    assert cache.get(key) is None
+    ast = parse('int x é 1.\n')
+    cache.put(key, ast)
+    assert equal(cache.get(key), ast)
+    # Outra versão não vê os resultados desta
+    other = ParseCache(str(tmp_path), version='outra')
+    assert other.get(other.key(data)) is None
+    assert cache.stats() == {'hits': 1, 'misses': 1, 'writes': 1, 'evictions': 0}
+
+
+def test_parse_file_cached(tmp_path):
+    path = tmp_path / 'programa.txt'
+    path.write_text(programas.programa_blocos(20))
+    cache = ParseCache(str(tmp_path / 'cache'), version='teste')
+    first = parse_file_cached(str(path), cache)
+    second = parse_file_cached(str(path), cache)
+    assert equal(first, parse(path.read_text()))
+    assert equal(second, first)
+    assert (cache.misses, cache.hits, cache.writes) == (1, 1, 1)
+
+
+def test_syntax_errors_not_cached(tmp_path, capsys):
+    path = tmp_path / 'programa.txt'
+    path.write_text('int x é .\n')
+    cache = ParseCache(str(tmp_path / 'cache'), version='teste')
+    parse_file_cached(str(path), cache)
+    parse_file_cached(str(path), cache)
+    assert cache.writes == 0 and cache.misses == 2
+    assert capsys.readouterr().out
+
+
+def test_eviction(tmp_path):
+    cache = ParseCache(str(tmp_path), version='teste', max_bytes=4000)
+    for i in range(20):
+        codigo = programas.programa_variaveis(10 + i)
+        cache.put(cache.key(codigo.encode()), parse(codigo))
+    assert cache.evictions > 0
+    assert sum(entry.stat().st_size for entry in tmp_path.iterdir()) <= 4000
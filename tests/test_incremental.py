@@ -0,0 +1,49 @@
+import contextlib
+import io
+import random
+
+import pytest
+
+import programas
+from incremental import Document, equal, random_edit
+from parser import parse
+
+
+def run(func, *args):
+    # Resultado, saída impressa (mensagens de erro do parser) e exceção,
+    # se houver: uma ação da gramática pode falhar ('menos' antes de uma
+    # expressão que não é número)
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        try:
+            return func(*args), output.getvalue(), None
+        except Exception as error:
+            return None, output.getvalue(), repr(error)
+
+
+@pytest.mark.parametrize('forma', sorted(programas.formas))
+@pytest.mark.parametrize('semente', [0, 1])
+def test_random_edits(forma, semente):
+    # Cada edição por partes deve dar o mesmo AST (e as mesmas mensagens) que
+    # uma análise completa do texto editado
+    gerador, tamanho = programas.formas[forma]
+    rng = random.Random(semente)
+    document = Document(programas.programa_sintetico(forma, tamanho // 100 + 3, semente))
+    # Como em incremental.py: as edições costumam ser desfeitas logo depois,
+    # para que a maior parte delas parta de um texto válido
+    undo = []
+    for _ in range(100):
+        if undo and rng.random() < 0.8:
+            start, end, replacement = undo.pop()
+        else:
+            start, end, replacement = random_edit(document.text, rng)
+            undo.append((start, start + len(replacement), document.text[start:end]))
+        ast, output, error = run(document.edit, start, end, replacement)
+        expected, expected_output, expected_error = run(parse, document.text)
+        edit = (start, end, replacement)
+        assert (ast is None) == (expected is None), edit
+        assert ast is None or equal(ast, expected), edit
+        assert (output, error) == (expected_output, expected_error), edit
+        if document.segments is not None:
+            undo = []
+    assert document.partial > 0
@@ -0,0 +1,91 @@
+import io
+
+import pytest
+
+import programas
+import scanner
+from incremental import equal
+from lexer import build_lexer
+from parser import parse, parse_tokens
+from scanner import TokenArray, scan, tokenize
+
+extras = '''lista l é 1 a 10.
+texto t é "um texto com é menor que dentro".
+real r é 2,5 dividido por 0,5.
+se r é maior ou
+   igual a 1 então
+    mostra l[2], t.
+tá bom então  # comentário
+    mostra r elevado a 2.
+e deu.
+'''
+
+
+def exemplos():
+    # Frases com quebra de linha no meio mudam a contagem de linhas
+    yield 'extras', extras * 20
+    for forma, (gerador, tamanho) in programas.formas.items():
+        yield forma, programas.programa_sintetico(forma, tamanho // 20, semente=1)
+
+
+def ply_tokens(codigo):
+    lexer = build_lexer('ply')
+    lexer.input(codigo)
+    return [(token.type, token.value, token.lineno, token.lexpos) for token in lexer]
+
+
+@pytest.fixture(params=list(exemplos()), ids=lambda programa: programa[0])
+def codigo(request):
+    return request.param[1]
+
+
+def test_scan(codigo):
+    assert list(scan(codigo)) == ply_tokens(codigo)
+
+
+def test_scan_errors(capsys):
+    # Mesmos tokens e mesmas posições dos caracteres ilegais que o PLY
+    codigo = 'int x é 1 $ 2.\nmostra x ! "a".\n' * 3
+    erros = []
+    tokens = list(scan(codigo, error=lambda *erro: erros.append(erro)))
+    assert tokens == ply_tokens(codigo)
+    assert [(char, linha) for char, linha, posicao in erros] == [('$', 1), ('!', 2), ('$', 3), ('!', 4),
+                                                                  ('$', 5), ('!', 6)]
+    assert all(codigo[posicao] == char for char, linha, posicao in erros)
+    assert capsys.readouterr().out.count('Caractere ilegal') == 6
+
+
+def test_tokenize(codigo, monkeypatch):
+    # Pedaços pequenos, para que muitos tokens cruzem o fim de um pedaço
+    monkeypatch.setattr(scanner, 'chunk_size', 37)
+    assert list(tokenize(io.StringIO(codigo))) == ply_tokens(codigo)
+
+
+def test_tokenize_path(tmp_path):
+    path = tmp_path / 'programa.txt'
+    path.write_text(extras)
+    assert list(tokenize(str(path))) == ply_tokens(extras)
+
+
+def test_token_array(codigo):
+    tokens = TokenArray.scan(codigo)
+    assert list(tokens) == ply_tokens(codigo)
+    assert len(tokens) == len(ply_tokens(codigo))
+    # O parser lendo as visões sobre os vetores dá a mesma árvore
+    assert equal(parse_tokens(tokens), parse(codigo))
+
+
+def test_scan_parallel(codigo, monkeypatch):
+    monkeypatch.setattr(scanner, 'parallel_chunk_size', 256)
+    assert list(TokenArray.scan_parallel(codigo, workers=3)) == ply_tokens(codigo)
+
+
+def test_scan_parallel_errors(monkeypatch):
+    codigo = 'int x é 1 $ 2.\nmostra x ! "a".\n' * 50
+    erros = []
+    tokens = list(TokenArray.scan(codigo, error=lambda *erro: erros.append(erro)))
+    paralelos = []
+    monkeypatch.setattr(scanner, 'parallel_chunk_size', 64)
+    assert list(TokenArray.scan_parallel(codigo, 3, error=lambda *erro: paralelos.append(erro))) == tokens
+    assert paralelos == erros
+    assert len(erros) == 100
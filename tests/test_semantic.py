@@ -0,0 +1,75 @@
+from parser import parse
+from semantic import check
+from symbol_table import SymbolTable
+
+
+def messages(codigo):
+    ast = parse(codigo)
+    assert ast is not None
+    return [str(diagnostic) for diagnostic in check(ast, collect=True)]
+
+
+fatorial = '''define fat com int n como
+    int r é 1.
+    se n é maior que 1 então
+        r é n vezes (fat com n menos 1).
+    e deu.
+    retorna r.
+e deu.
+int x é fat com 5.
+'''
+
+recursao_no_retorno = '''define f com int n como
+    se n é menor que 1 então
+        retorna 0.
+    e deu.
+    retorna f com n menos 1.
+e deu.
+int x é f com 3.
+'''
+
+
+def test_recursive_call_before_return():
+    # A chamada recursiva vem antes do primeiro retorno: o tipo ainda não é
+    # conhecido e não pode virar erro
+    assert messages(fatorial) == []
+
+
+def test_recursive_call_in_return():
+    assert messages(recursao_no_retorno) == []
+
+
+def test_function_without_return_has_no_type():
+    codigo = 'define f com int n como\n    mostra n.\ne deu.\nint x é f com 1.\n'
+    assert messages(codigo) == ['Tipos incompatíveis ao atribuir valor a variável x na linha 4. Esperava int mas obteve None.']
+
+
+def test_type_errors_still_reported():
+    codigo = 'int x é "a".\nboolean b é verdadeiro mais falso.\n'
+    assert messages(codigo) == [
+        'Tipos incompatíveis ao atribuir valor a variável x na linha 1. Esperava int mas obteve texto.',
+        'Operação inválida para o tipo boolean na linha 2: mais.',
+    ]
+
+
+def test_symbol_table():
+    scope = SymbolTable()
+    x, y = scope.id('x'), scope.id('y')
+    assert (x, y, scope.id('x')) == (0, 1, 0)
+    assert scope.name(y) == 'y'
+    scope.declare(x, 'int')
+    scope.push()
+    scope.declare(x, 'texto')
+    scope.declare(y, 'real')
+    assert scope.lookup(x).type == 'texto' and scope.local(y).type == 'real'
+    assert scope.lookup(x, floor=2) is None
+    scope.pop()
+    assert scope.lookup(x).type == 'int' and scope.lookup(y) is None
+    # Um nome que nunca foi declarado só ganha um id
+    assert scope.lookup(scope.id('z')) is None and len(scope) == 1
+
+
+def test_messages_use_names():
+    # As mensagens levam os nomes, não os ids
+    assert messages('int x é 1.\nint x é 2.\nmostra y.\n') == [
+        'x: Declaração de variável duplicada na linha 2.', 'y: Variável não declarada na linha 3.']
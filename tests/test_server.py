@@ -0,0 +1,115 @@
+import asyncio
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+import programas
+import server
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def serve(requests, stdin=None):
+    # Respostas do servidor para os pedidos enviados pela entrada padrão (um
+    # pipe, ou o arquivo stdin), por id
+    data = ''.join(json.dumps(request) + '\n' for request in requests)
+    if stdin is None:
+        options = {'input': data.encode()}
+    else:
+        stdin.write_text(data)
+        options = {'stdin': stdin.open('rb')}
+    result = subprocess.run([sys.executable, 'server.py', '--workers', '2'], cwd=root, stdout=subprocess.PIPE,
+                            timeout=60, check=True, **options)
+    return {response['id']: response for response in map(json.loads, result.stdout.decode().splitlines())}
+
+
+def request(id, method, **params):
+    return {'jsonrpc': '2.0', 'id': id, 'method': method, 'params': params}
+
+
+@pytest.fixture(scope='module')
+def responses():
+    return serve([
+        request(1, 'check', text='int x é 1.\nmostra x.\n'),
+        request(2, 'check', text='int x é "a" mais 1.\n'),
+        request(3, 'parse', text='int x é 1.\n', jsonl=True),
+        request(4, 'tokenize', text='int x é 1 $.\n'),
+        request(5, 'nada', text=''),
+        request(6, 'check'),
+        request(7, 'check', path='nao_existe.txt'),
+        request(8, 'parse', text='int x é 1 mais 2.\nx é "a".\n', jsonl=True, types=True, all=True),
+    ])
+
+
+def test_check(responses):
+    assert responses[1]['result'] == {'status': 'ok', 'diagnosticos': []}
+    result = responses[2]['result']
+    assert result['status'] == 'erro'
+    assert [item['origem'] for item in result['diagnosticos']] == ['semantico']
+
+
+def test_parse(responses):
+    result = responses[3]['result']
+    assert result['status'] == 'ok'
+    assert [json.loads(line)['type'] for line in result['ast'].splitlines()][:2] == ['program', 'declaration']
+    assert result['nos'] == len(result['ast'].splitlines())
+    assert all('inferred' not in json.loads(line) for line in result['ast'].splitlines())
+
+
+def test_parse_types(responses):
+    result = responses[8]['result']
+    records = [json.loads(line) for line in result['ast'].splitlines()]
+    assert [record.get('inferred') for record in records if record['type'] in ('bin_op', 'value')] == ['int'] * 3 + ['texto']
+    assert [item['origem'] for item in result['diagnosticos']] == ['semantico']
+
+
+def test_tokenize(responses):
+    result = responses[4]['result']
+    assert [token[0] for token in result['tokens']] == ['INT', 'ID', 'ATRIBUICAO', 'NUM_INTEIRO', 'FIM_COMANDO']
+    assert [item['origem'] for item in result['diagnosticos']] == ['lexico']
+
+
+def test_errors(responses):
+    assert responses[5]['error']['code'] == -32601
+    assert responses[6]['error']['code'] == -32602
+    assert responses[7]['error']['code'] == -32602
+
+
+def test_stdin_file(tmp_path):
+    responses = serve([request(1, 'check', text='int x é 1.\n'), request(2, 'tokenize', text='x.\n')],
+                      tmp_path / 'pedidos.jsonl')
+    assert responses[1]['result']['status'] == 'ok'
+    assert len(responses[2]['result']['tokens']) == 2
+
+
+def test_broken_pool():
+    # Com os processos do pool mortos, os pedidos em andamento falham e o
+    # pool é refeito uma vez só
+    async def main():
+        instance = server.Server(2)
+        instance.start_pool()
+        broken = instance.pool
+        started = []
+        start_pool = instance.start_pool
+        instance.start_pool = lambda: started.append(start_pool())
+        try:
+            await asyncio.wrap_future(broken.submit(int))
+            # Pedidos longos, ainda nos processos quando eles morrem
+            sent = []
+            text = programas.programa_blocos(3000)
+            tasks = [asyncio.ensure_future(instance.handle(request(id, 'check', text=text), sent.append))
+                     for id in range(4)]
+            await asyncio.sleep(0)
+            for process in list(broken._processes.values()):
+                process.kill()
+            await asyncio.gather(*tasks)
+            assert [message['error']['code'] for message in sent] == [server.INTERNAL_ERROR] * 4
+            assert len(started) == 1 and instance.pool is not broken
+            await instance.handle(request(5, 'check', text='int x é 1.\n'), sent.append)
+            assert sent[-1]['result']['status'] == 'ok'
+        finally:
+            instance.pool.shutdown()
+    asyncio.run(main())
@@ -0,0 +1,99 @@
+# Programas aninhados muito além do limite de recursão do Python, e listas de
+# statements muito mais longas que ele: nenhuma passagem sobre o AST pode usar
+# a pilha do Python para descer na árvore ou percorrer uma lista
+import sys
+
+import pytest
+
+import optimizer
+import programas
+from parser import parse
+from semantic import check
+import vm
+
+profundidade = 3000
+statements = 20000
+
+
+class Contador:
+    # Arquivo que só conta o que recebe, para não guardar o texto inteiro
+    def __init__(self):
+        self.total = 0
+        self.linhas = 0
+
+    def write(self, texto):
+        self.total += len(texto)
+        self.linhas += texto.count('\n')
+
+
+@pytest.fixture(autouse=True)
+def limite_padrao():
+    limite = sys.getrecursionlimit()
+    sys.setrecursionlimit(1000)
+    yield
+    sys.setrecursionlimit(limite)
+
+
+def test_nested_blocks():
+    ast = parse(programas.programa_aninhado(profundidade))
+    assert ast is not None
+    assert check(ast, collect=True) == []
+    saida = Contador()
+    ast.dump(saida)
+    # Cada nível tem um nó do bloco, a condição e o statement de dentro
+    assert saida.linhas == programas.conta_nos(ast) + sum(1 for _ in valores(ast))
+    otimizado, _ = optimizer.optimize(ast)
+    assert check(otimizado) == []
+    vm.compile(ast)
+
+
+def test_nested_expression():
+    codigo = 'int x é {}1{}.\nmostra x.\n'.format('(1 mais ' * profundidade, ')' * profundidade)
+    ast = parse(codigo)
+    assert ast is not None
+    assert check(ast) == []
+    ast.dump(Contador())
+    otimizado, _ = optimizer.optimize(ast)
+    # A soma inteira vira um literal
+    assert programas.conta_nos(otimizado) < 10
+    saida = []
+    vm.run(vm.compile(ast), output=type('Saida', (), {'write': lambda self, texto: saida.append(texto)})())
+    assert ''.join(saida) == '{}\n'.format(profundidade + 1)
+
+
+def valores(node):
+    # Filhos que não são nós (nomes, números), uma linha cada no dump
+    pendentes = [node]
+    while pendentes:
+        node = pendentes.pop()
+        for filho in node.children:
+            if type(filho) is type(node):
+                pendentes.append(filho)
+            else:
+                yield filho
+
+
+def test_flat_statements():
+    # A lista de statements é plana: 'statements : statements statement'
+    # acumula numa lista só, em vez de aninhar um nó por statement
+    ast = parse(programas.programa_sequencia(statements))
+    assert ast is not None
+    assert len(ast.children) == statements
+    assert check(ast, collect=True) == []
+    saida = Contador()
+    ast.dump(saida)
+    assert saida.linhas == programas.conta_nos(ast) + sum(1 for _ in valores(ast))
+    resultado = []
+    fonte = programas.programa_sequencia(statements) + 'mostra x.\n'
+    vm.run(vm.compile(parse(fonte)), output=type('Saida', (), {'write': lambda self, texto: resultado.append(texto)})())
+    assert ''.join(resultado) == '{}\n'.format(statements - 1)
+
+
+def test_flat_block():
+    # O mesmo dentro de um bloco
+    corpo = '  x é x mais 1.\n' * statements
+    ast = parse('int x é 0.\nse x é menor que 1 então\n{}e deu.\n'.format(corpo))
+    assert ast is not None
+    bloco = ast.children[1].children[1]
+    assert len(bloco.children) == statements
+    assert check(ast, collect=True) == []
@@ -0,0 +1,114 @@
+import io
+
+import pytest
+
+import optimizer
+import programas
+import transpiler
+import vm
+from parser import parse
+from semantic import check
+
+fatorial = '''define fat com int n como
+    int r é 1.
+    se n é maior que 1 então
+        r é n vezes (fat com n menos 1).
+    e deu.
+    retorna r.
+e deu.
+mostra (fat com 10), (fat com 0).
+'''
+
+# A expressão de uma declaração vê a variável de fora, na execução e na
+# verificação
+sombra = '''int x é 1.
+se x é igual a 1 então
+    int x é x mais 1.
+    mostra x.
+e deu.
+mostra x.
+'''
+
+# Constantes negativas, que a otimização cria dobrando as subtrações
+negativos = '''int y é 2.
+int x é (1 menos 2) na y.
+real r é (1,5 menos 3) na y.
+mostra x, r, y na (1 menos 2), (1 menos 2) na 3, 5 menos (1 menos 2), (0 menos 3) vezes y.
+mostra (1 menos 2) dividido por y, 7 dividido por (1 menos 3).
+'''
+
+
+def exemplos():
+    yield 'fatorial', fatorial
+    yield 'sombra', sombra
+    yield 'negativos', negativos
+    yield 'laco', programas.programa_laco(500)
+    yield 'fib', programas.programa_fib(12)
+    yield 'constantes', programas.programa_constantes(20)
+    # aninhado fica de fora: os laços enquanto podem não terminar
+    for forma in ['plano', 'funcoes', 'listas', 'expressoes']:
+        for semente in range(3):
+            yield '{}-{}'.format(forma, semente), programas.programa_sintetico(forma, 40, semente)
+
+
+def run(execute, program):
+    # Saída e erro de execução, se houver
+    output = io.StringIO()
+    try:
+        execute(program, output)
+    except vm.ExecutionError as error:
+        return output.getvalue(), str(error)
+    return output.getvalue(), None
+
+
+@pytest.mark.parametrize('codigo', [codigo for nome, codigo in exemplos()],
+                         ids=[nome for nome, codigo in exemplos()])
+def test_vm_interpreter(codigo):
+    # Mesma saída do interpretador de referência; a divisão por zero dele é
+    # uma exceção do Python
+    ast = parse(codigo)
+    assert ast is not None
+    output, error = run(vm.run, vm.compile(ast))
+    expected = io.StringIO()
+    try:
+        programas.interpreta(ast, expected)
+    except ZeroDivisionError:
+        assert error is not None and error.endswith('divisão por zero')
+    else:
+        assert error is None
+    assert output == expected.getvalue()
+
+
+@pytest.mark.parametrize('codigo', [codigo for nome, codigo in exemplos()],
+                         ids=[nome for nome, codigo in exemplos()])
+def test_transpiler(codigo):
+    # O Python gerado dá a mesma saída e os mesmos erros que a máquina
+    # virtual, com e sem a otimização
+    ast = parse(codigo)
+    optimized, _ = optimizer.optimize(ast)
+    for tree in (ast, optimized):
+        assert run(transpiler.run, transpiler.translate(tree)) == run(vm.run, vm.compile(ast))
+
+
+def test_shadowing():
+    assert check(parse(sombra)) == []
+    assert run(vm.run, vm.compile(parse(sombra))) == ('2\n1\n', None)
+    # Com outro tipo fora, a expressão é de texto e o erro aparece na verificação
+    codigo = sombra.replace('int x é 1.', 'texto x é "a".').replace('se x é igual a 1', 'se 1 é igual a 1')
+    assert [str(diagnostic) for diagnostic in check(parse(codigo))] == [
+        "Linha 3: Tipos incompatíveis para a operação 'mais', texto e int."]
+    assert [str(diagnostic) for diagnostic in check(parse('int y é y mais 1.\nmostra y.\n'), collect=True)] == [
+        'y: Variável não declarada na linha 1.']
+
+
+def test_deep_recursion():
+    # As chamadas não usam a pilha do Python
+    codigo = '''define conta com int n como
+    se n é igual a 0 então
+        retorna 0.
+    e deu.
+    retorna (conta com n menos 1) mais 1.
+e deu.
+mostra conta com 20000.
+'''
+    assert run(vm.run, vm.compile(parse(codigo))) == ('20000\n', None)
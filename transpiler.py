@@ -0,0 +1,604 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+Tradução para código Python
+
+Uso: python transpiler.py arquivo.txt [--source] [--optimize]
+
+translate() transforma um AST já verificado num módulo Python: cada função
+da linguagem vira uma função no nível do módulo e o programa principal vira
+a função main(), então todas as variáveis são locais do Python. Os nomes são
+resolvidos na tradução, como em vm.Compiler: cada declaração ganha um nome
+próprio (x_0, x_1, ...), o que reproduz os escopos dos blocos. load() compila
+o código com compile() uma vez só; os code objects ficam em `codes`, pelo
+hash do código gerado. run() executa com a mesma semântica e a mesma saída
+de vm.run.
+
+A ordem de avaliação é a da máquina virtual: 'e', 'ou' e 'nao' avaliam os
+dois lados (só viram and/or do Python quando o lado direito é uma variável ou
+um literal), e 'dividido por' decide entre divisão inteira e real pelo tipo
+dos valores na execução. Diferenças: a profundidade de recursão é limitada
+pela do Python, e programas muito aninhados passam dos limites do compile()
+(o uso pela linha de comando volta para a máquina virtual nesses casos).
+"""
+
+import builtins
+import hashlib
+import sys
+import threading
+
+import vm
+from vm import CompileError, ExecutionError, parameters
+
+# Nome de arquivo dos code objects gerados, para achar as linhas nos erros
+FILENAME = '<transpilado>'
+
+# Precedência das expressões geradas, como na gramática do Python
+OR, AND, NOT, COMPARE, ADD, MUL, UNARY, POWER, ATOM = 1, 2, 3, 4, 6, 7, 8, 9, 10
+
+# Operador do Python e precedência, por texto do operador
+python_operators = {
+    'mais': ('+', ADD), 'menos': ('-', ADD), 'vezes': ('*', MUL), 'na': ('**', POWER),
+    'menor que': ('<', COMPARE), 'maior que': ('>', COMPARE), 'menor ou igual a': ('<=', COMPARE),
+    'maior ou igual a': ('>=', COMPARE), 'igual a': ('==', COMPARE), 'diferente de': ('!=', COMPARE),
+    'e': ('and', AND), 'ou': ('or', OR),
+}
+
+# Funções de vm usadas quando o operador do Python mudaria a ordem de avaliação
+helpers = {'e': 'both', 'ou': 'either', 'nao': 'but_not', 'dividido por': 'divide'}
+
+# Literais que não têm efeito nem podem falhar ao serem avaliados
+simple = {'id', 'int', 'real', 'texto', 'boolean'}
+
+
+class Function:
+    # Função da linguagem já declarada: nome no código gerado e parâmetros
+    __slots__ = ('name', 'nparams')
+
+    def __init__(self, name):
+        self.name = name
+        self.nparams = 0
+
+
+class Translation:
+    # Código Python gerado. lines[i] é a linha do programa original da linha
+    # i + 1 do código gerado; code é preenchido por load().
+    __slots__ = ('source', 'lines', 'code')
+
+    def __init__(self, source, lines):
+        self.source = source
+        self.lines = lines
+        self.code = None
+
+
+class Translator:
+    def __init__(self):
+        # Escopos: nome -> nome no código gerado (variáveis) ou Function.
+        # Variáveis só são procuradas a partir de base, o primeiro escopo da
+        # função atual.
+        self.scopes = [{}]
+        self.base = 0
+        # Linhas (texto, linha original) da função sendo gerada e das prontas
+        self.body = []
+        self.functions = []
+        self.nfunctions = 0
+        self.indent = 1
+        # Declarações de cada nome, para os nomes gerados, e o tipo de cada
+        # nome gerado
+        self.counts = {}
+        self.types = {}
+        # Linha do statement sendo traduzido, para os nós sem linha
+        self.line = None
+        self.handlers = {
+            'program': self.translate_statements,
+            'statement_list': self.translate_statements,
+            'block': self.translate_block,
+            'declaration': self.translate_declaration,
+            'null_declaration': self.translate_null_declaration,
+            'id_list': self.translate_id_list,
+            'assignment': self.translate_assignment,
+            'if_statement': self.translate_if,
+            'while_loop': self.translate_while,
+            'for_loop': self.translate_for,
+            'function_declaration': self.translate_function,
+            'return': self.translate_return,
+            'print_statement': self.translate_print,
+            'read': self.translate_read,
+        }
+        # Nós de expressão: texto a partir dos textos dos operandos
+        self.expressions = {
+            'value': self.translate_value,
+            'bin_op': self.translate_operation,
+            'boolean_exp': self.translate_operation,
+            'function_call': self.translate_call,
+            'index': self.translate_index,
+            'append': self.translate_append,
+            'iterable': self.translate_range,
+        }
+
+    # Mesmo trampolim de vm.Compiler.compile: os statements são geradores que
+    # fazem `yield filho`, sem recursão do Python
+    def translate(self, ast):
+        stack = [self.dispatch(ast)]
+        while stack:
+            try:
+                child = next(stack[-1])
+            except StopIteration:
+                stack.pop()
+                continue
+            stack.append(self.dispatch(child))
+        return self.module()
+
+    def dispatch(self, node):
+        if node.line:
+            self.line = node.line
+        handler = self.handlers.get(node.type)
+        if handler is not None:
+            return handler(node)
+        if node.type not in self.expressions:
+            raise CompileError('Linha {}: nó {!r} não pode ser compilado.'.format(node.line, node.type))
+        return self.translate_expression_statement(node)
+
+    def emit(self, text, line=None):
+        self.body.append(('    ' * self.indent + text, line or self.line))
+
+    def module(self):
+        lines = []
+        for body in self.functions:
+            lines.extend(body)
+        lines.append(('def main():', None))
+        lines.extend(self.body or [('    pass', None)])
+        source = '\n'.join(text for text, line in lines) + '\n'
+        return Translation(source, [line for text, line in lines])
+
+    # Escopos
+    def declare(self, name, type):
+        count = self.counts.get(name, 0)
+        self.counts[name] = count + 1
+        # Nomes da linguagem terminam em _número no código gerado, então não
+        # coincidem com as funções auxiliares nem com palavras do Python
+        generated = '{}_{}'.format(name, count)
+        if not generated.isidentifier():
+            generated = '_{}'.format(sum(self.counts.values()))
+        self.scopes[-1][name] = generated
+        self.types[generated] = type
+        return generated
+
+    def variable(self, name, line):
+        for scope in reversed(self.scopes[self.base:]):
+            entry = scope.get(name)
+            if entry is not None and not isinstance(entry, Function):
+                return entry
+        raise CompileError('Linha {}: variável {} não declarada.'.format(line, name))
+
+    def function(self, name, line):
+        for scope in reversed(self.scopes):
+            entry = scope.get(name)
+            if isinstance(entry, Function):
+                return entry
+        raise CompileError('Linha {}: função {} não declarada.'.format(line, name))
+
+    def block(self, node):
+        # Lista de statements num escopo novo
+        self.scopes.append({})
+        yield node
+        self.scopes.pop()
+
+    def suite(self, node, scope=True):
+        # Corpo indentado de um if, while, for ou função; pass se ficar vazio
+        self.indent += 1
+        start = len(self.body)
+        if scope:
+            yield from self.block(node)
+        else:
+            yield node
+        if len(self.body) == start:
+            self.emit('pass')
+        self.indent -= 1
+
+    # Statements
+    def translate_statements(self, node):
+        for child in node.children:
+            yield child
+
+    def translate_block(self, node):
+        return self.block(node.children[0])
+
+    def translate_declaration(self, node):
+        # A expressão vem antes da declaração: em 'int x é x mais 1' o x da
+        # expressão é o de fora
+        value = self.expression(node.children[1])
+        self.emit('{} = {}'.format(self.declare(node.children[0], node.leaf), value), node.line)
+        if len(node.children) == 3:
+            pending = [node.children[2]]
+            while pending:
+                assignment = pending.pop()
+                if assignment.leaf == ',':
+                    pending.extend(reversed(assignment.children))
+                    continue
+                value = self.expression(assignment.children[1])
+                self.emit('{} = {}'.format(self.declare(assignment.children[0], node.leaf), value), assignment.line)
+        return
+        yield
+
+    def translate_null_declaration(self, node):
+        names = [node.children[0]]
+        if len(node.children) == 2:
+            id_list = node.children[1]
+            while True:
+                names.append(id_list.children[0])
+                if id_list.leaf != ',':
+                    break
+                id_list = id_list.children[1]
+        value = '[]' if node.leaf == 'lista' else repr(vm.defaults[node.leaf])
+        for name in names:
+            self.emit('{} = {}'.format(self.declare(name, node.leaf), value), node.line)
+        return
+        yield
+
+    def translate_id_list(self, node):
+        raise CompileError('Linha {}: lista de nomes fora de uma declaração.'.format(node.line))
+
+    def translate_assignment(self, node):
+        if node.leaf == ',':
+            yield node.children[0]
+            yield node.children[1]
+            return
+        value = self.expression(node.children[1])
+        self.emit('{} = {}'.format(self.variable(node.children[0], node.line), value), node.line)
+
+    def translate_if(self, node):
+        # Uma cadeia de senão se vira uma sequência de elif, sem aninhar
+        keyword = 'if'
+        while True:
+            self.emit('{} {}:'.format(keyword, self.expression(node.children[0])), node.line)
+            yield from self.suite(node.children[1])
+            if node.leaf == 'if/elseif':
+                node = node.children[2]
+                keyword = 'elif'
+                continue
+            if node.leaf == 'if/else':
+                self.emit('else:', node.line)
+                yield from self.suite(node.children[2])
+            break
+
+    def translate_while(self, node):
+        self.emit('while {}:'.format(self.expression(node.children[0])), node.line)
+        yield from self.suite(node.children[1])
+
+    def translate_for(self, node):
+        iterable = node.children[1]
+        if iterable.type == 'iterable':
+            # A lista do intervalo não é visível no programa: basta o range
+            first, last = iterable.children
+            iterable = 'range({}, {})'.format(first, last + 1)
+        else:
+            iterable = self.expression(iterable)
+        # A variável do laço e o corpo ficam no mesmo escopo, como na VM
+        self.scopes.append({})
+        # A variável do laço é int, como na verificação semântica
+        self.emit('for {} in {}:'.format(self.declare(node.children[0], 'int'), iterable), node.line)
+        yield from self.suite(node.children[2], scope=False)
+        self.scopes.pop()
+
+    def translate_function(self, node):
+        # Nomes de função terminam em _f e um número, diferentes dos de variável
+        self.nfunctions += 1
+        name = '{}_f{}'.format(node.leaf, self.nfunctions)
+        function = Function(name if name.isidentifier() else '_f{}'.format(self.nfunctions))
+        # Declarada antes do corpo, para as chamadas recursivas
+        self.scopes[-1][node.leaf] = function
+        outer = self.body, self.indent, self.base
+        self.body, self.indent = [], 0
+        self.scopes.append({})
+        self.base = len(self.scopes) - 1
+        names = []
+        if len(node.children) == 2:
+            # Parâmetros na ordem da declaração
+            pending = [node.children[0]]
+            while pending:
+                args = pending.pop()
+                if args.leaf == 'single_argument':
+                    names.append(self.declare(args.children[0], args.children[1]))
+                else:
+                    pending.extend(reversed(args.children))
+        function.nparams = len(names)
+        self.emit('def {}({}):'.format(function.name, ', '.join(names)), node.line)
+        yield from self.suite(node.children[-1], scope=False)
+        self.functions.append(self.body)
+        self.scopes.pop()
+        self.body, self.indent, self.base = outer
+
+    def translate_return(self, node):
+        self.emit('return {}'.format(self.expression(node.children[0])), node.line)
+        return
+        yield
+
+    def translate_print(self, node):
+        values = ['show({})'.format(self.expression(value)) for value in parameters(node.children[0])]
+        self.emit("write({} + '\\n')".format(" + ' ' + ".join(values)), node.line)
+        return
+        yield
+
+    def translate_read(self, node):
+        name = self.variable(node.children[0], node.line)
+        type = self.types[name]
+        if type not in vm.read_types:
+            raise CompileError('Linha {}: variáveis do tipo {} não podem ser lidas.'.format(node.line, type))
+        self.emit('{} = read_value({}, readline())'.format(name, vm.read_types.index(type)), node.line)
+        return
+        yield
+
+    def translate_expression_statement(self, node):
+        # Expressão usada como statement: o valor é descartado
+        if node.type == 'value' and node.leaf in ('increment', 'decrement'):
+            operator = '+=' if node.leaf == 'increment' else '-='
+            self.emit('{} {} 1'.format(self.variable(node.children[0], node.line), operator), node.line)
+        elif node.type == 'append':
+            self.emit('{}.append({})'.format(self.variable(node.children[1], node.line),
+                                             self.expression(node.children[0])), node.line)
+        else:
+            self.emit(self.expression(node), node.line)
+        return
+        yield
+
+    # Expressões
+    def expression(self, root):
+        # Texto da expressão. Percorre em pós-ordem sem recursão: cada nó
+        # recebe os pares (texto, precedência) dos operandos.
+        results = []
+        stack = [(root, False)]
+        while stack:
+            node, ready = stack.pop()
+            operands = expression_operands(node)
+            if operands and not ready:
+                stack.append((node, True))
+                stack.extend((operand, False) for operand in reversed(operands))
+                continue
+            handler = self.expressions.get(node.type)
+            if handler is None:
+                raise CompileError('Linha {}: {!r} não é uma expressão.'.format(node.line, node.type))
+            if operands:
+                values = results[len(results) - len(operands):]
+                del results[len(results) - len(operands):]
+            else:
+                values = []
+            results.append(handler(node, values))
+        return results[0][0]
+
+    def translate_value(self, node, values):
+        value = node.children[0]
+        if node.leaf == 'id':
+            return self.variable(value, node.line), ATOM
+        if node.leaf in ('increment', 'decrement'):
+            name = self.variable(value, node.line)
+            return '({} := {} {} 1)'.format(name, name, '+' if node.leaf == 'increment' else '-'), ATOM
+        if node.leaf in vm.constants:
+            text = repr(vm.constants[node.leaf](value))
+            # Números negativos vêm da otimização (1 menos 2 vira -1): -1 ** y
+            # seria -(1 ** y)
+            return text, UNARY if text[0] == '-' else ATOM
+        raise CompileError('Linha {}: valor {!r} desconhecido.'.format(node.line, node.leaf))
+
+    def translate_operation(self, node, values):
+        name = ' '.join(node.leaf.split())
+        if name not in vm.binary:
+            raise CompileError('Linha {}: operador desconhecido {!r}.'.format(node.line, name))
+        (a, a_precedence), (b, b_precedence) = values
+        left, right = node.children
+        if name == 'dividido por':
+            return self.division(left, right, a, b)
+        if name in ('e', 'ou', 'nao') and not is_simple(right):
+            # and/or não avaliariam o lado direito em todos os casos
+            return '{}({}, {})'.format(helpers[name], a, b), ATOM
+        if name == 'nao':
+            if b_precedence < NOT:
+                b = '({})'.format(b)
+            if a_precedence < AND:
+                a = '({})'.format(a)
+            return '{} and not {}'.format(a, b), AND
+        symbol, precedence = python_operators[name]
+        # Comparações não podem encadear (a < b < c é outra coisa no Python),
+        # e a potência associa à direita
+        if a_precedence < precedence or (a_precedence == precedence and precedence in (COMPARE, POWER)):
+            a = '({})'.format(a)
+        if b_precedence < precedence or (b_precedence == precedence and precedence != POWER):
+            b = '({})'.format(b)
+        return '{} {} {}'.format(a, symbol, b), precedence
+
+    def division(self, left, right, a, b):
+        # Como vm.divide: divisão inteira só entre dois int
+        types = [literal_type(left), literal_type(right)]
+        if 'real' in types:
+            symbol = '/'
+        elif types == ['int', 'int']:
+            symbol = '//'
+        elif is_simple(left) and is_simple(right):
+            # Variáveis: o teste de tipo fica no código, sem chamar função
+            checks = ['type({}) is int'.format(text) for text, type in zip((a, b), types) if type != 'int']
+            return '({} // {} if {} else {} / {})'.format(a, b, ' and '.join(checks), a, b), ATOM
+        else:
+            return 'divide({}, {})'.format(a, b), ATOM
+        return '{} {} {}'.format(a, symbol, b), MUL
+
+    def translate_call(self, node, values):
+        function = self.function(node.leaf, node.line)
+        arguments = [text for text, precedence in values]
+        if function.nparams == 0:
+            # Funções sem parâmetros ignoram os argumentos, que ainda são
+            # avaliados antes da chamada
+            return '({}, {}())[-1]'.format(', '.join(arguments), function.name), ATOM
+        if len(arguments) != function.nparams:
+            raise CompileError('Linha {}: {} espera {} argumento(s).'.format(node.line, node.leaf, function.nparams))
+        return '{}({})'.format(function.name, ', '.join(arguments)), ATOM
+
+    def translate_index(self, node, values):
+        name, index = node.children
+        name = self.variable(name, node.line)
+        index = index[1:-1]
+        if index.isdigit():
+            return '{}[{}]'.format(name, int(index)), ATOM
+        # Índices negativos são erro, não contam do fim da lista
+        return 'item({}, {})'.format(name, self.variable(index, node.line)), ATOM
+
+    def translate_append(self, node, values):
+        name = self.variable(node.children[1], node.line)
+        return '({}.append({}) or {})'.format(name, values[0][0], name), ATOM
+
+    def translate_range(self, node, values):
+        first, last = node.children
+        return 'list(range({}, {}))'.format(first, last + 1), ATOM
+
+
+def expression_operands(node):
+    # Filhos de uma expressão que também são expressões
+    if node.type in ('bin_op', 'boolean_exp'):
+        return node.children
+    if node.type == 'function_call':
+        return parameters(node.children[0])
+    if node.type == 'append':
+        return node.children[:1]
+    return ()
+
+
+def is_simple(node):
+    return node.type == 'value' and node.leaf in simple
+
+
+def literal_type(node):
+    if node.type == 'value' and node.leaf in vm.constants:
+        return node.leaf
+    return None
+
+
+def item(items, index):
+    if type(index) is not int or index < 0:
+        raise IndexError(index)
+    return items[index]
+
+
+class CodeCache:
+    # Code objects por hash do código gerado. Ao passar de max_entries, os
+    # usados há mais tempo saem.
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self.entries = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, source):
+        key = hashlib.sha256(source.encode()).digest()
+        with self.lock:
+            code = self.entries.pop(key, None)
+            if code is not None:
+                # Volta para o fim: o dicionário fica em ordem de uso
+                self.entries[key] = code
+                self.hits += 1
+                return code
+            self.misses += 1
+        try:
+            code = compile(source, FILENAME, 'exec')
+        except (SyntaxError, RecursionError, MemoryError) as error:
+            # Aninhamento ou expressões além dos limites do compilador do Python
+            raise CompileError('O programa não pode ser compilado pelo Python ({}).'.format(error)) from None
+        with self.lock:
+            self.entries[key] = code
+            while len(self.entries) > self.max_entries:
+                del self.entries[next(iter(self.entries))]
+                self.evictions += 1
+        return code
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions}
+
+
+codes = CodeCache()
+
+
+def translate(ast):
+    return Translator().translate(ast)
+
+
+def load(translation):
+    # Compila o código gerado (ou pega do cache)
+    if translation.code is None:
+        translation.code = codes.get(translation.source)
+    return translation.code
+
+
+def run(translation, output=None, readline=None):
+    # Executa o programa traduzido; mesmos argumentos de vm.run
+    namespace = {
+        '__builtins__': builtins,
+        'write': (output or sys.stdout).write,
+        'readline': readline or sys.stdin.readline,
+        'show': vm.show,
+        'read_value': vm.read_value,
+        'item': item,
+        'divide': vm.divide,
+        'both': vm.both,
+        'either': vm.either,
+        'but_not': vm.but_not,
+    }
+    exec(load(translation), namespace)
+    try:
+        namespace['main']()
+    except ZeroDivisionError as error:
+        raise ExecutionError(error_line(translation, error), 'divisão por zero') from None
+    except IndexError as error:
+        raise ExecutionError(error_line(translation, error), 'índice fora da lista') from None
+    except ValueError as error:
+        raise ExecutionError(error_line(translation, error), 'valor inválido ({})'.format(error)) from None
+    except TypeError as error:
+        raise ExecutionError(error_line(translation, error), 'tipos incompatíveis ({})'.format(error)) from None
+    except RecursionError as error:
+        raise ExecutionError(error_line(translation, error), 'recursão profunda demais') from None
+
+
+def error_line(translation, error):
+    # Linha do programa original do ponto mais interno do código gerado
+    line = None
+    traceback = error.__traceback__
+    while traceback is not None:
+        if traceback.tb_frame.f_code.co_filename == FILENAME:
+            line = traceback.tb_lineno
+        traceback = traceback.tb_next
+    if line is None:
+        return None
+    return translation.lines[line - 1]
+
+
+if __name__ == '__main__':
+    from parser import parse_file, syntax_errors
+    import semantic
+
+    ast = parse_file(sys.argv[1])
+    if ast is None or syntax_errors():
+        raise SystemExit(1)
+    if '--optimize' in sys.argv:
+        from optimizer import optimize
+        ast, _ = optimize(ast)
+    diagnostics = semantic.check(ast)
+    for diagnostic in diagnostics:
+        print(diagnostic)
+    if any(diagnostic.fatal for diagnostic in diagnostics):
+        raise SystemExit(1)
+    translation = translate(ast)
+    if '--source' in sys.argv:
+        print(translation.source, end='')
+        raise SystemExit
+    try:
+        load(translation)
+    except CompileError as error:
+        print('{} Executando na máquina virtual.'.format(error), file=sys.stderr)
+        translation = None
+    try:
+        if translation is None:
+            vm.run(vm.compile(ast))
+        else:
+            run(translation)
+    except ExecutionError as error:
+        print(error)
+        raise SystemExit(1)
@@ -0,0 +1,746 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+Compilador para bytecode e máquina virtual de pilha
+
+Uso: python vm.py arquivo.txt [--dis] [--optimize]
+
+compile() transforma um AST já verificado (semantic.check sem erros fatais)
+num Program: o código do programa principal e o de cada função. O código é
+uma lista plana de inteiros, pares (operação, argumento), com uma tabela de
+constantes por função. As variáveis são resolvidas na compilação para
+posições (slots) na lista de variáveis da função, então a execução não
+procura nomes. As constantes ficam no fim da mesma lista, em ordem inversa,
+e são endereçadas com índices negativos (a constante k é o slot -k - 1):
+uma operação lê variáveis e constantes do mesmo jeito. run() executa o
+Program num único laço, com a pilha de valores e a de chamadas em listas, sem
+recursão do Python.
+
+Semântica adotada onde a linguagem não define:
+    - 'dividido por' entre inteiros é divisão inteira; com reais, divisão real
+    - 'x não y' é 'x e não y'
+    - '1 a 10' é a lista de 1 a 10, incluindo os dois extremos
+    - índices de lista começam em 0
+    - variáveis declaradas sem valor começam com 0, 0,0, "", falso ou lista vazia
+"""
+
+import operator
+import sys
+from types import GeneratorType
+
+# Operações, na ordem em que o laço de execução testa: as mais frequentes
+# primeiro. As operações *_SS operam dois slots (variáveis ou constantes) sem
+# passar pela pilha; o argumento é a posição da tupla (função, slot, slot,
+# destino) em Code.operands.
+names = [
+    'LOAD',           # empilha o slot arg
+    'STORE',          # desempilha para a variável arg
+    'BINARY',         # desempilha b e a, empilha operators[arg](a, b)
+    'BINARY_SS',      # empilha função(slot, slot)
+    'ASSIGN_SS',      # variável destino = função(slot, slot)
+    'JUMP_IF_SS',     # desvia para o destino se função(slot, slot)
+    'JUMP_UNLESS_SS', # desvia para o destino se não função(slot, slot)
+    'JUMP_IF_TRUE',   # desempilha e desvia para arg se for verdadeiro
+    'JUMP_IF_FALSE',  # desempilha e desvia para arg se for falso
+    'JUMP',           # desvia para arg
+    'CALL',           # chama a função arg com os argumentos do topo da pilha
+    'RETURN',         # volta da função com o valor do topo
+    'POP',            # descarta o topo
+    'FOR_ITER',       # próximo item do iterador no topo para a variável arg,
+                      # pulando o JUMP seguinte; sem itens, desempilha o iterador
+                      # e segue para o JUMP
+    'INDEX',          # desempilha o índice, empilha o item da lista na variável arg
+    'INC', 'DEC',     # soma ou subtrai 1 da variável arg e empilha o resultado
+    'APPEND',         # desempilha um valor e coloca na lista da variável arg
+    'NEW_LIST',       # empilha uma lista vazia
+    'RANGE',          # desempilha b e a, empilha a lista de a até b
+    'GET_ITER',       # troca o topo por um iterador sobre ele
+    'PRINT',          # desempilha arg valores e mostra
+    'READ',           # lê uma linha e empilha convertida para o tipo arg
+    'HALT',
+]
+for opcode, name in enumerate(names):
+    globals()[name] = opcode
+
+
+def divide(a, b):
+    return a // b if type(a) is int and type(b) is int else a / b
+
+
+def both(a, b):
+    return a and b
+
+
+def either(a, b):
+    return a or b
+
+
+def but_not(a, b):
+    return a and not b
+
+
+# Funções dos operadores, por texto do operador
+binary = {
+    'mais': operator.add, 'menos': operator.sub, 'vezes': operator.mul, 'dividido por': divide,
+    'na': operator.pow, 'menor que': operator.lt, 'maior que': operator.gt,
+    'menor ou igual a': operator.le, 'maior ou igual a': operator.ge, 'igual a': operator.eq,
+    'diferente de': operator.ne, 'e': both, 'ou': either, 'nao': but_not,
+}
+operators = list(binary.values())
+operator_names = list(binary)
+
+# Operações que desviam para o destino da tupla em Code.operands
+fused_jumps = {JUMP_IF_SS, JUMP_UNLESS_SS}
+
+# Tipos de leitura do READ e valores iniciais das declarações sem valor
+read_types = ['int', 'real', 'texto']
+defaults = {'int': 0, 'real': 0.0, 'texto': '', 'boolean': False}
+
+
+class CompileError(Exception):
+    pass
+
+
+class ExecutionError(Exception):
+    def __init__(self, line, message):
+        Exception.__init__(self, 'Erro de execução na linha {}: {}'.format(line, message))
+        self.line = line
+
+
+class Code:
+    # Código de uma função (ou do programa principal)
+    __slots__ = ('name', 'ops', 'lines', 'consts', 'constant_index', 'operands', 'names', 'nparams',
+                 'index', 'template', 'line')
+
+    def __init__(self, name, index=-1):
+        self.name = name
+        # Pares (operação, argumento)
+        self.ops = []
+        # Linha de cada par, para as mensagens de erro
+        self.lines = []
+        self.consts = []
+        self.constant_index = {}
+        # Tuplas (função, slot, slot, destino) das operações *_SS
+        self.operands = []
+        # Nome da variável de cada slot
+        self.names = []
+        self.nparams = 0
+        # Posição em Program.functions
+        self.index = index
+        # Slots iniciais de uma chamada (ver frame)
+        self.template = None
+        # Linha do statement sendo compilado, para os nós sem linha
+        self.line = None
+
+    def emit(self, op, arg=0, line=None):
+        # Nós sem linha (0 ou None no PLY) ficam com a do statement
+        if not line:
+            line = self.line
+        self.ops.append(op)
+        self.ops.append(arg)
+        self.lines.append(line)
+        return len(self.ops) - 2
+
+    def patch(self, position, target=None):
+        # Desvio em position passa a apontar para target (ou para o fim atual)
+        if target is None:
+            target = len(self.ops)
+        if self.ops[position] in fused_jumps:
+            function, a, b, _ = self.operands[self.ops[position + 1]]
+            self.operands[self.ops[position + 1]] = (function, a, b, target)
+        else:
+            self.ops[position + 1] = target
+
+    def operand(self, function, a, b, target=None):
+        self.operands.append((function, a, b, target))
+        return len(self.operands) - 1
+
+    def store(self, slot, line):
+        # STORE, ou ASSIGN_SS no lugar de um BINARY_SS logo antes
+        if self.ops and self.ops[-2] == BINARY_SS:
+            function, a, b, _ = self.operands[self.ops[-1]]
+            self.operands[self.ops[-1]] = (function, a, b, slot)
+            self.ops[-2] = ASSIGN_SS
+            return
+        self.emit(STORE, slot, line)
+
+    def jump_if(self, value, target, line):
+        # Desvio condicional pelo valor no topo, ou JUMP_IF_SS/JUMP_UNLESS_SS
+        # no lugar de um BINARY_SS logo antes. Devolve a posição para patch.
+        if self.ops and self.ops[-2] == BINARY_SS:
+            self.ops[-2] = JUMP_IF_SS if value else JUMP_UNLESS_SS
+            self.patch(len(self.ops) - 2, target)
+            return len(self.ops) - 2
+        return self.emit(JUMP_IF_TRUE if value else JUMP_IF_FALSE, target, line)
+
+    def constant(self, value):
+        # True == 1 == 1.0 no dicionário, por isso o tipo faz parte da chave
+        key = (type(value), value)
+        index = self.constant_index.get(key)
+        if index is None:
+            index = self.constant_index[key] = len(self.consts)
+            self.consts.append(value)
+        # Slot da constante
+        return -index - 1
+
+    def frame(self):
+        # Lista de slots de uma chamada: variáveis e as constantes invertidas
+        if self.template is None:
+            self.template = [None] * len(self.names) + self.consts[::-1]
+        return self.template[:]
+
+    def slot(self, name):
+        self.names.append(name)
+        return len(self.names) - 1
+
+
+class Program:
+    def __init__(self):
+        self.main = Code('<programa>')
+        self.functions = []
+
+
+class Compiler:
+    def __init__(self):
+        self.program = Program()
+        self.code = self.program.main
+        # Escopos da compilação: nome -> (slot, tipo) para variáveis, nome ->
+        # Code para funções. Variáveis só são procuradas a partir de base, o
+        # primeiro escopo da função atual.
+        self.scopes = [{}]
+        self.base = 0
+        self.handlers = {
+            'program': self.compile_statements,
+            'statement_list': self.compile_statements,
+            'block': self.compile_block,
+            'declaration': self.compile_declaration,
+            'null_declaration': self.compile_null_declaration,
+            'id_list': self.compile_id_list,
+            'assignment': self.compile_assignment,
+            'if_statement': self.compile_if,
+            'while_loop': self.compile_while,
+            'for_loop': self.compile_for,
+            'function_declaration': self.compile_function,
+            'args': self.compile_args,
+            'return': self.compile_return,
+            'print_statement': self.compile_print,
+            'read': self.compile_read,
+        }
+        # Nós de expressão: o valor fica no topo da pilha
+        self.expressions = {
+            'value': self.compile_value,
+            'bin_op': self.compile_operation,
+            'boolean_exp': self.compile_operation,
+            'function_call': self.compile_call,
+            'index': self.compile_index,
+            'append': self.compile_append,
+            'iterable': self.compile_range,
+        }
+
+    # Mesma estratégia de semantic.Checker.visit: cada nó é compilado por um
+    # gerador que faz `yield filho` para compilar um filho, então programas
+    # muito aninhados não dependem da pilha do Python. Subexpressões são
+    # passadas já como o gerador de self.expression (`yield
+    # self.expression(filho)`), que deixa o valor na pilha da máquina.
+    def compile(self, ast):
+        stack = [self.dispatch(ast)]
+        while stack:
+            try:
+                child = next(stack[-1])
+            except StopIteration:
+                stack.pop()
+                continue
+            stack.append(child if type(child) is GeneratorType else self.dispatch(child))
+        code = self.program.main
+        code.emit(HALT)
+        return self.program
+
+    def dispatch(self, node):
+        if node.line:
+            self.code.line = node.line
+        handler = self.handlers.get(node.type)
+        if handler is not None:
+            return handler(node)
+        handler = self.expressions.get(node.type)
+        if handler is None:
+            raise CompileError('Linha {}: nó {!r} não pode ser compilado.'.format(node.line, node.type))
+        # Expressão usada como statement: o valor é descartado
+        return self.discard(handler, node)
+
+    def discard(self, handler, node):
+        yield from handler(node)
+        self.code.emit(POP, 0, node.line)
+
+    def expression(self, node):
+        handler = self.expressions.get(node.type)
+        if handler is None:
+            raise CompileError('Linha {}: {!r} não é uma expressão.'.format(node.line, node.type))
+        return handler(node)
+
+    # Escopos
+    def declare(self, name, type):
+        slot = self.code.slot(name)
+        self.scopes[-1][name] = (slot, type)
+        return slot
+
+    def variable(self, name, line):
+        for scope in reversed(self.scopes[self.base:]):
+            entry = scope.get(name)
+            if entry is not None and not isinstance(entry, Code):
+                return entry
+        raise CompileError('Linha {}: variável {} não declarada.'.format(line, name))
+
+    def function(self, name, line):
+        for scope in reversed(self.scopes):
+            entry = scope.get(name)
+            if isinstance(entry, Code):
+                return entry
+        raise CompileError('Linha {}: função {} não declarada.'.format(line, name))
+
+    def block(self, node):
+        # Lista de statements num escopo novo
+        self.scopes.append({})
+        yield node
+        self.scopes.pop()
+
+    # Statements
+    def compile_statements(self, node):
+        for child in node.children:
+            yield child
+
+    def compile_block(self, node):
+        return self.block(node.children[0])
+
+    def compile_declaration(self, node):
+        # A expressão é compilada antes da declaração: em 'int x é x mais 1'
+        # o x da expressão é o de fora
+        yield self.expression(node.children[1])
+        self.code.store(self.declare(node.children[0], node.leaf), node.line)
+        if len(node.children) == 3:
+            # Declaração múltipla: as atribuições declaram variáveis do mesmo tipo
+            yield from self.assignments(node.children[2], node.leaf)
+
+    def assignments(self, node, type):
+        pending = [node]
+        while pending:
+            node = pending.pop()
+            if node.leaf == ',':
+                pending.extend(reversed(node.children))
+                continue
+            yield self.expression(node.children[1])
+            self.code.store(self.declare(node.children[0], type), node.line)
+
+    def compile_null_declaration(self, node):
+        names = [node.children[0]]
+        if len(node.children) == 2:
+            id_list = node.children[1]
+            while True:
+                names.append(id_list.children[0])
+                if id_list.leaf != ',':
+                    break
+                id_list = id_list.children[1]
+        for name in names:
+            slot = self.declare(name, node.leaf)
+            # Listas são criadas a cada execução da declaração
+            if node.leaf == 'lista':
+                self.code.emit(NEW_LIST, 0, node.line)
+            else:
+                self.code.emit(LOAD, self.code.constant(defaults[node.leaf]), node.line)
+            self.code.emit(STORE, slot, node.line)
+        return
+        yield
+
+    def compile_id_list(self, node):
+        raise CompileError('Linha {}: lista de nomes fora de uma declaração.'.format(node.line))
+
+    def compile_assignment(self, node):
+        if node.leaf == ',':
+            yield node.children[0]
+            yield node.children[1]
+            return
+        yield self.expression(node.children[1])
+        self.code.store(self.variable(node.children[0], node.line)[0], node.line)
+
+    def compile_if(self, node):
+        code = self.code
+        yield self.expression(node.children[0])
+        skip = code.jump_if(False, 0, node.line)
+        yield from self.block(node.children[1])
+        if node.leaf == 'if':
+            code.patch(skip)
+            return
+        end = code.emit(JUMP, 0, node.line)
+        code.patch(skip)
+        if node.leaf == 'if/else':
+            yield from self.block(node.children[2])
+        else:
+            yield node.children[2]
+        code.patch(end)
+
+    def compile_while(self, node):
+        # A condição fica depois do corpo: um desvio por volta em vez de dois
+        code = self.code
+        condition = code.emit(JUMP, 0, node.line)
+        body = len(code.ops)
+        yield from self.block(node.children[1])
+        code.patch(condition)
+        yield self.expression(node.children[0])
+        code.jump_if(True, body, node.line)
+
+    def compile_for(self, node):
+        code = self.code
+        yield self.expression(node.children[1])
+        code.emit(GET_ITER, 0, node.line)
+        self.scopes.append({})
+        # A variável do laço é int, como na verificação semântica
+        slot = self.declare(node.children[0], 'int')
+        start = code.emit(FOR_ITER, slot, node.line)
+        end = code.emit(JUMP, 0, node.line)
+        yield node.children[2]
+        code.emit(JUMP, start, node.line)
+        self.scopes.pop()
+        code.patch(end)
+
+    def compile_function(self, node):
+        function = Code(node.leaf, len(self.program.functions))
+        function.line = node.line
+        self.program.functions.append(function)
+        # Declarada antes do corpo, para as chamadas recursivas
+        self.scopes[-1][node.leaf] = function
+        outer = self.code, self.base
+        self.code = function
+        self.scopes.append({})
+        self.base = len(self.scopes) - 1
+        if len(node.children) == 2:
+            # Os parâmetros ocupam os primeiros slots, na ordem da declaração
+            yield node.children[0]
+            function.nparams = len(function.names)
+        yield node.children[-1]
+        function.emit(LOAD, function.constant(None), node.line)
+        function.emit(RETURN, 0, node.line)
+        self.scopes.pop()
+        self.code, self.base = outer
+
+    def compile_args(self, node):
+        if node.leaf == 'single_argument':
+            self.declare(node.children[0], node.children[1])
+        else:
+            yield node.children[0]
+            yield node.children[1]
+
+    def compile_return(self, node):
+        yield self.expression(node.children[0])
+        self.code.emit(RETURN, 0, node.line)
+
+    def compile_print(self, node):
+        values = parameters(node.children[0])
+        for value in values:
+            yield self.expression(value)
+        self.code.emit(PRINT, len(values), node.line)
+
+    def compile_read(self, node):
+        slot, type = self.variable(node.children[0], node.line)
+        if type not in read_types:
+            raise CompileError('Linha {}: variáveis do tipo {} não podem ser lidas.'.format(node.line, type))
+        self.code.emit(READ, read_types.index(type), node.line)
+        self.code.emit(STORE, slot, node.line)
+        return
+        yield
+
+    # Expressões
+    def compile_value(self, node):
+        code = self.code
+        value = node.children[0]
+        if node.leaf == 'id':
+            code.emit(LOAD, self.variable(value, node.line)[0], node.line)
+        elif node.leaf in constants:
+            code.emit(LOAD, code.constant(constants[node.leaf](value)), node.line)
+        elif node.leaf == 'increment':
+            code.emit(INC, self.variable(value, node.line)[0], node.line)
+        elif node.leaf == 'decrement':
+            code.emit(DEC, self.variable(value, node.line)[0], node.line)
+        else:
+            raise CompileError('Linha {}: valor {!r} desconhecido.'.format(node.line, node.leaf))
+        return
+        yield
+
+    def compile_operation(self, node):
+        name = ' '.join(node.leaf.split())
+        if name not in binary:
+            raise CompileError('Linha {}: operador desconhecido {!r}.'.format(node.line, name))
+        function = binary[name]
+        left, right = node.children
+        code = self.code
+        # Variáveis e constantes: uma operação só, sem a pilha
+        a, b = self.slot(left), self.slot(right)
+        if a is not None and b is not None:
+            code.emit(BINARY_SS, code.operand(function, a, b), node.line)
+            return
+        yield self.expression(left)
+        yield self.expression(right)
+        code.emit(BINARY, operator_names.index(name), node.line)
+
+    def slot(self, node):
+        # Slot de um nó que é uma variável ou um literal, ou None
+        if node.type != 'value':
+            return None
+        if node.leaf == 'id':
+            return self.variable(node.children[0], node.line)[0]
+        if node.leaf in constants:
+            return self.code.constant(constants[node.leaf](node.children[0]))
+        return None
+
+    def compile_call(self, node):
+        function = self.function(node.leaf, node.line)
+        arguments = parameters(node.children[0])
+        for argument in arguments:
+            yield self.expression(argument)
+        # Funções sem parâmetros ignoram os argumentos recebidos
+        if function.nparams == 0:
+            for _ in arguments:
+                self.code.emit(POP, 0, node.line)
+        elif len(arguments) != function.nparams:
+            raise CompileError('Linha {}: {} espera {} argumento(s).'.format(node.line, node.leaf, function.nparams))
+        self.code.emit(CALL, function.index, node.line)
+
+    def compile_index(self, node):
+        name, index = node.children
+        index = index[1:-1]
+        if index.isdigit():
+            self.code.emit(LOAD, self.code.constant(int(index)), node.line)
+        else:
+            self.code.emit(LOAD, self.variable(index, node.line)[0], node.line)
+        self.code.emit(INDEX, self.variable(name, node.line)[0], node.line)
+        return
+        yield
+
+    def compile_append(self, node):
+        yield self.expression(node.children[0])
+        self.code.emit(APPEND, self.variable(node.children[1], node.line)[0], node.line)
+
+    def compile_range(self, node):
+        first, last = node.children
+        self.code.emit(LOAD, self.code.constant(first), node.line)
+        self.code.emit(LOAD, self.code.constant(last), node.line)
+        self.code.emit(RANGE, 0, node.line)
+        return
+        yield
+
+
+# Valor de cada tipo de literal a partir do filho do nó 'value'
+constants = {
+    'int': lambda value: value,
+    'real': lambda value: value,
+    'texto': lambda value: value[1:-1],
+    'boolean': lambda value: value == 'verdadeiro',
+}
+
+
+def parameters(node):
+    # Expressões de uma árvore de parâmetros, da esquerda para a direita
+    expressions = []
+    pending = [node]
+    while pending:
+        node = pending.pop()
+        if node.leaf == 'parameters':
+            pending.extend(reversed(node.children))
+        else:
+            expressions.append(node.children[0])
+    return expressions
+
+
+def compile(ast):
+    return Compiler().compile(ast)
+
+
+def show(value):
+    # Valor como a linguagem escreve: vírgula decimal, verdadeiro/falso
+    if value is True:
+        return 'verdadeiro'
+    if value is False:
+        return 'falso'
+    if type(value) is float:
+        return repr(value).replace('.', ',')
+    if type(value) is list:
+        return '[{}]'.format(', '.join(show(item) for item in value))
+    return str(value)
+
+
+def read_value(type, text):
+    text = text.strip()
+    if type == 0:
+        return int(text)
+    if type == 1:
+        return float(text.replace(',', '.'))
+    return text
+
+
+def run(program, output=None, readline=None):
+    # Executa o programa. output recebe o que 'mostra' escreve (sys.stdout
+    # por padrão) e readline fornece as linhas lidas por 'leia'.
+    write = (output or sys.stdout).write
+    readline = readline or sys.stdin.readline
+    functions = program.functions
+    code = program.main
+    ops, operands = code.ops, code.operands
+    slots = code.frame()
+    stack = []
+    push = stack.append
+    pop = stack.pop
+    # Chamadas em andamento: (code, slots, pc, base da pilha)
+    frames = []
+    base = 0
+    pc = 0
+    try:
+        while True:
+            op = ops[pc]
+            arg = ops[pc + 1]
+            pc += 2
+            if op == LOAD:
+                push(slots[arg])
+            elif op == STORE:
+                slots[arg] = pop()
+            elif op == BINARY:
+                b = pop()
+                stack[-1] = operators[arg](stack[-1], b)
+            elif op == BINARY_SS:
+                function, a, b, target = operands[arg]
+                push(function(slots[a], slots[b]))
+            elif op == ASSIGN_SS:
+                function, a, b, target = operands[arg]
+                slots[target] = function(slots[a], slots[b])
+            elif op == JUMP_IF_SS:
+                function, a, b, target = operands[arg]
+                if function(slots[a], slots[b]):
+                    pc = target
+            elif op == JUMP_UNLESS_SS:
+                function, a, b, target = operands[arg]
+                if not function(slots[a], slots[b]):
+                    pc = target
+            elif op == JUMP_IF_TRUE:
+                if pop():
+                    pc = arg
+            elif op == JUMP_IF_FALSE:
+                if not pop():
+                    pc = arg
+            elif op == JUMP:
+                pc = arg
+            elif op == CALL:
+                function = functions[arg]
+                frames.append((code, slots, pc, base))
+                code = function
+                ops, operands = code.ops, code.operands
+                slots = code.frame()
+                if code.nparams:
+                    slots[:code.nparams] = stack[-code.nparams:]
+                    del stack[-code.nparams:]
+                base = len(stack)
+                pc = 0
+            elif op == RETURN:
+                value = pop()
+                if not frames:
+                    return
+                del stack[base:]
+                code, slots, pc, base = frames.pop()
+                ops, operands = code.ops, code.operands
+                push(value)
+            elif op == POP:
+                pop()
+            elif op == FOR_ITER:
+                for item in stack[-1]:
+                    slots[arg] = item
+                    pc += 2
+                    break
+                else:
+                    pop()
+            elif op == INDEX:
+                index = pop()
+                if type(index) is not int or index < 0:
+                    raise IndexError(index)
+                push(slots[arg][index])
+            elif op == INC:
+                slots[arg] += 1
+                push(slots[arg])
+            elif op == DEC:
+                slots[arg] -= 1
+                push(slots[arg])
+            elif op == APPEND:
+                slots[arg].append(pop())
+                push(slots[arg])
+            elif op == NEW_LIST:
+                push([])
+            elif op == RANGE:
+                last = pop()
+                stack[-1] = list(range(stack[-1], last + 1))
+            elif op == GET_ITER:
+                stack[-1] = iter(stack[-1])
+            elif op == PRINT:
+                values = stack[len(stack) - arg:]
+                del stack[len(stack) - arg:]
+                write(' '.join([show(value) for value in values]) + '\n')
+            elif op == READ:
+                push(read_value(arg, readline()))
+            elif op == HALT:
+                return
+            else:
+                raise ExecutionError(code.lines[pc // 2 - 1], 'operação inválida {}'.format(op))
+    except ZeroDivisionError:
+        raise ExecutionError(code.lines[pc // 2 - 1], 'divisão por zero') from None
+    except IndexError:
+        raise ExecutionError(code.lines[pc // 2 - 1], 'índice fora da lista') from None
+    except ValueError as error:
+        raise ExecutionError(code.lines[pc // 2 - 1], 'valor inválido ({})'.format(error)) from None
+    except TypeError as error:
+        raise ExecutionError(code.lines[pc // 2 - 1], 'tipos incompatíveis ({})'.format(error)) from None
+
+
+def operand(code, slot):
+    # Variável pelo nome, constante pelo valor
+    return repr(code.consts[-slot - 1]) if slot < 0 else code.names[slot]
+
+
+def disassemble(code, file=None):
+    file = file or sys.stdout
+    print('{} ({} parâmetros, {} variáveis)'.format(code.name, code.nparams, len(code.names)), file=file)
+    for pc in range(0, len(code.ops), 2):
+        op, arg = code.ops[pc], code.ops[pc + 1]
+        if op in (LOAD, STORE, INC, DEC, INDEX, APPEND, FOR_ITER):
+            detail = operand(code, arg)
+        elif op == BINARY:
+            detail = operator_names[arg]
+        elif op in (BINARY_SS, ASSIGN_SS, JUMP_IF_SS, JUMP_UNLESS_SS):
+            function, a, b, target = code.operands[arg]
+            name = operator_names[operators.index(function)]
+            detail = '{} {} {}'.format(operand(code, a), name, operand(code, b))
+            if target is not None:
+                detail += ' -> {}'.format(target)
+        else:
+            detail = arg
+        print('{:>6} {:>5} {:<16}{}'.format(pc, code.lines[pc // 2] or '', names[op], detail), file=file)
+
+
+if __name__ == '__main__':
+    from parser import parse_file, syntax_errors
+    import semantic
+
+    ast = parse_file(sys.argv[1])
+    if ast is None or syntax_errors():
+        raise SystemExit(1)
+    if '--optimize' in sys.argv:
+        from optimizer import optimize
+        ast, _ = optimize(ast)
+    diagnostics = semantic.check(ast)
+    for diagnostic in diagnostics:
+        print(diagnostic)
+    if any(diagnostic.fatal for diagnostic in diagnostics):
+        raise SystemExit(1)
+    program = compile(ast)
+    if '--dis' in sys.argv:
+        for code in [program.main] + program.functions:
+            disassemble(code)
+        raise SystemExit
+    try:
+        run(program)
+    except ExecutionError as error:
+        print(error)
+        raise SystemExit(1)